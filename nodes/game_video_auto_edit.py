@@ -1,5 +1,5 @@
 import os
-import glob
+import sys
 import cv2
 import numpy as np
 import tempfile
@@ -8,12 +8,120 @@ import uuid
 import shutil
 from pathlib import Path
 import ffmpeg
-import folder_paths
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import multiprocessing
+import pickle
+import threading
+import queue
+from collections import deque
+import json
+import time
+import sqlite3
+import hashlib
+import heapq
+import fnmatch
+import socket
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import folder_paths
+    HAS_FOLDER_PATHS = True
+except ImportError:
+    # 作为独立的共享队列工作进程运行时没有 ComfyUI 环境，只有节点入口需要它
+    folder_paths = None
+    HAS_FOLDER_PATHS = False
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+    HAS_INOTIFY = True
+except ImportError:
+    HAS_INOTIFY = False
 
 # 配置logger
 logger = logging.getLogger(__name__)
 
+# 运动分析使用的降采样分辨率
+ANALYSIS_WIDTH = 320
+ANALYSIS_HEIGHT = 240
+
+# 运动分析后端
+ANALYSIS_BACKENDS = ["opencv", "ffmpeg"]
+
+# 剪辑输出模式：encode=重新编码（逐帧精确），copy=按关键帧无损切割，smart=只重编码剪辑点所在的GOP
+EDIT_MODES = ["encode", "copy", "smart", "edl"]
+
+# 编码档位：balanced=默认质量与速度，throughput=批量出片优先速度，quality=优先画质
+ENCODE_PROFILES = {
+    "balanced": {"preset": "medium", "crf": 23},
+    "throughput": {"preset": "veryfast", "crf": 23},
+    "quality": {"preset": "slow", "crf": 20},
+}
+
+# 批处理顺序：longest_first=最长任务优先（缩短总耗时），quick_first=先处理最短的视频尽快看到第一个结果，
+# as_found=按扫描顺序
+BATCH_ORDERS = ["longest_first", "quick_first", "as_found"]
+
+# 常见视频扩展名（只用于提示被内容识别排除的文件，是否为视频以文件头为准）
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm', '.m4v', '.ts']
+
+# MP4/MOV 文件开头可能出现的顶层 box 类型
+MP4_BOX_TYPES = (b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot')
+
+# WMV/ASF 头对象 GUID
+ASF_HEADER_GUID = bytes.fromhex("3026b2758e66cf11a6d900aa0062ce6c")
+
+# 输入暂存方式：direct=直接按原路径处理，link=用硬链接/reflink 暂存（不复制数据）
+INPUT_STAGING_MODES = ["direct", "link"]
+
+# Linux FICLONE ioctl：在 btrfs、XFS 等文件系统上创建共享数据块的 reflink
+FICLONE = 0x40049409
+
+# 每个同时处理的视频至少分到的 CPU 核数
+MIN_CORES_PER_VIDEO = 4
+
+# smart 模式支持的源视频编码：codec_name -> (编码器, 转 Annex B 的 bitstream filter)
+SMART_RENDER_CODECS = {
+    'h264': ('libx264', 'h264_mp4toannexb'),
+    'hevc': ('libx265', 'hevc_mp4toannexb'),
+}
+
+# 运动分数缓存的默认容量上限
+SCORE_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# 关键帧索引缓存的默认容量上限
+KEYFRAME_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# 视频元数据缓存的默认条目上限（每条只有几百字节）
+PROBE_CACHE_MAX_ENTRIES = 100000
+
+# 容器帧数不准时，分数缓冲区每次扩容的帧数（60fps 下约 10 分钟）
+SCORE_BUFFER_GROW_FRAMES = 36000
+
+# 平滑运动分数时每块处理的帧数（原位平滑时每块只复制这么多原始分数）
+SMOOTH_BLOCK_FRAMES = 65536
+
+# 尾随剪辑时片段没有变化的情况下保存进度的间隔（秒）
+LIVE_STATE_INTERVAL = 5.0
+
+# 监视文件夹轮询时，目录修改时间距今超过该秒数才认为目录项没有新变化
+DIR_MTIME_GRACE_SECONDS = 2.0
+
+# 共享任务队列的租约时长（秒），工作者每三分之一租约心跳一次
+JOB_LEASE_SECONDS = 120.0
+
 def generate_unique_folder_name(prefix: str, output_dir: str) -> str:
     """生成唯一的文件夹名称"""
     unique_id = str(uuid.uuid4())[:8]
@@ -41,29 +149,418 @@ def resolve_path(path: str) -> str:
     except:
         return os.path.abspath(path)
 
-def create_sanitized_temp_folder(input_folder_path: str) -> tuple:
-    """创建临时文件夹处理文件名问题"""
-    temp_dir = tempfile.mkdtemp(prefix="sanitized_videos_")
-    filename_mapping = {}
+def sniff_video_container(file_path: str):
+    """根据文件头的魔数识别视频容器，返回容器名；不是可识别的视频文件时返回 None"""
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(192)
+    except OSError:
+        return None
+
+    if len(head) >= 8 and head[4:8] in MP4_BOX_TYPES:
+        return "mp4"
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        return "matroska"
+    if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return "avi"
+    if head[:3] == b'FLV':
+        return "flv"
+    if head[:16] == ASF_HEADER_GUID:
+        return "asf"
+    if len(head) > 188 and head[0] == 0x47 and head[188] == 0x47:
+        return "mpegts"
+    if head[:4] == b'\x00\x00\x01\xba':
+        return "mpeg"
+    return None
+
+def is_streamable_recording(file_path: str) -> bool:
+    """录制中也能顺序读取的容器：MKV/WebM、MPEG-TS，以及分片 MP4（moov 中带 mvex 或已出现 moof）"""
+    container = sniff_video_container(file_path)
+    if container in ("matroska", "mpegts"):
+        return True
+    if container != "mp4":
+        return False
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(1024 * 1024)
+    except OSError:
+        return False
+    return b'mvex' in head or b'moof' in head
+
+def _parse_pattern_list(text: str) -> list:
+    """解析逗号/分号/换行分隔的通配符列表（文件名可能含空格，不按空格拆分）"""
+    normalized = str(text or "").replace("，", ",").replace(";", ",").replace("\n", ",")
+    return [item.strip() for item in normalized.split(",") if item.strip()]
+
+def _matches_any(relative_path: str, name: str, patterns: list) -> bool:
+    """通配符同时匹配相对路径和文件名，如 "*.mp4"、"raw/*"、"*_edited*" """
+    return any(fnmatch.fnmatch(relative_path, pattern) or fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+def scan_video_files(input_folder_path: str, recursive: bool = False,
+                     include_patterns: list = None, exclude_patterns: list = None) -> list:
+    """一次 os.scandir 遍历收集输入视频，返回文件清单
+
+    是否为视频由文件头魔数决定而不是扩展名；隐藏文件和隐藏目录（含暂存目录）被跳过。
+    清单每项为 {path, relative_dir, size, mtime_ns, container}，后续阶段直接复用其中的文件大小和修改时间。
+    """
+    include_patterns = include_patterns or []
+    exclude_patterns = exclude_patterns or []
+    manifest = []
+    pending_dirs = [input_folder_path]
+
+    while pending_dirs:
+        current_dir = pending_dirs.pop()
+        try:
+            with os.scandir(current_dir) as entries:
+                entries = list(entries)
+        except OSError as e:
+            logger.warning(f"无法读取目录: {current_dir} | 错误: {e}")
+            continue
+
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            relative_path = os.path.relpath(entry.path, input_folder_path).replace(os.sep, '/')
+
+            if entry.is_dir(follow_symlinks=False):
+                if recursive and not _matches_any(relative_path, entry.name, exclude_patterns):
+                    pending_dirs.append(entry.path)
+                continue
+
+            if not entry.is_file():
+                continue
+            if include_patterns and not _matches_any(relative_path, entry.name, include_patterns):
+                continue
+            if _matches_any(relative_path, entry.name, exclude_patterns):
+                continue
+
+            stat = entry.stat()
+            if stat.st_size == 0:
+                continue
+            container = sniff_video_container(entry.path)
+            if container is None:
+                if os.path.splitext(entry.name)[1].lower() in VIDEO_EXTENSIONS:
+                    logger.warning(f"文件头不是可识别的视频容器，已跳过: {relative_path}")
+                continue
+
+            manifest.append({
+                'path': entry.path,
+                'relative_dir': os.path.dirname(relative_path),
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'container': container,
+            })
+
+    manifest.sort(key=lambda item: item['path'])
+    return manifest
 
-    video_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm', '.m4v']
+def _reflink_file(src: str, dst: str):
+    """用 FICLONE 创建 reflink（共享数据块，不复制数据），不支持时抛出 OSError"""
+    if not HAS_FCNTL or not sys.platform.startswith("linux"):
+        raise OSError("当前平台不支持 reflink")
+    with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+            return
+        except OSError:
+            pass
+    os.remove(dst)
+    raise OSError("文件系统不支持 reflink")
+
+def stage_input_files(manifest: list, staging_root: str) -> tuple:
+    """零拷贝暂存输入文件：先尝试硬链接，再尝试 reflink，任何情况下都不整文件复制
+
+    暂存目录建在 staging_root（通常是输入目录本身）下，保证与源文件在同一文件系统，子目录结构保持不变。
+    暂存清单的每一项用 source_path 记录源文件，大小和修改时间沿用源文件，缓存和处理清单都按源文件计算。
+    返回 (暂存目录, 暂存后的文件清单, 需要复制才能暂存的 [(文件, 原因)])，调用方应在后者非空时直接报错。
+    """
+    staging_dir = tempfile.mkdtemp(prefix=".yx_staging_", dir=staging_root)
+    staged_manifest = []
+    needs_copy = []
+
+    for item in manifest:
+        target_dir = os.path.join(staging_dir, item['relative_dir'])
+        os.makedirs(target_dir, exist_ok=True)
+        staged_path = os.path.join(target_dir, os.path.basename(item['path']))
+        try:
+            # 硬链接与源文件是同一个 inode，大小和修改时间不变
+            os.link(item['path'], staged_path)
+            staged_manifest.append(dict(item, path=staged_path, source_path=item['path']))
+            continue
+        except OSError as e:
+            link_error = e
+
+        try:
+            # reflink 是内容相同的新 inode，身份沿用源文件
+            _reflink_file(item['path'], staged_path)
+            staged_manifest.append(dict(item, path=staged_path, source_path=item['path']))
+        except OSError as e:
+            needs_copy.append((item['path'], f"硬链接: {link_error}; reflink: {e}"))
+
+    return staging_dir, staged_manifest, needs_copy
 
-    for filename in os.listdir(input_folder_path):
-        file_path = os.path.join(input_folder_path, filename)
+def manifest_key(item: dict) -> str:
+    """批处理清单中输入文件的键：相对输入目录的路径（直接处理和暂存处理时一致）"""
+    return "/".join(filter(None, [item['relative_dir'], os.path.basename(item['path'])]))
 
-        if os.path.isfile(file_path) and any(filename.lower().endswith(ext) for ext in video_extensions):
-            # 简单的文件名清理
-            sanitized_filename = filename
-            temp_file_path = os.path.join(temp_dir, sanitized_filename)
+def partial_output_path(output_path: str) -> str:
+    """输出文件的临时名：同目录下的隐藏文件，保留扩展名供 ffmpeg 识别格式"""
+    output_dir, filename = os.path.split(output_path)
+    stem, ext = os.path.splitext(filename)
+    return os.path.join(output_dir, f".{stem}.{uuid.uuid4().hex[:8]}.partial{ext}")
 
+def remove_stale_partial_outputs(output_dir: str) -> int:
+    """删除输出目录（含子目录）中上次中途崩溃留下的临时输出文件，返回删除的个数
+
+    只能在没有其他任务写入该目录时调用（续跑开始时），否则会删掉正在写的临时文件
+    """
+    removed = 0
+    for root, _, files in os.walk(output_dir):
+        for filename in fnmatch.filter(files, ".*.partial*"):
             try:
-                os.symlink(file_path, temp_file_path)
-            except:
-                shutil.copy2(file_path, temp_file_path)
+                os.remove(os.path.join(root, filename))
+                removed += 1
+            except OSError as e:
+                logger.warning(f"无法删除残留的临时输出: {filename} | {e}")
+    if removed:
+        logger.info(f"已删除 {removed} 个上次中断留下的临时输出文件")
+    return removed
+
+def commit_partial_output(partial_path: str, output_path: str, success: bool):
+    """成功时把临时文件原子替换为正式输出，失败时删除残留，中途崩溃也不会留下半个正式文件"""
+    if success and os.path.exists(partial_path):
+        os.replace(partial_path, output_path)
+    elif os.path.exists(partial_path):
+        os.remove(partial_path)
+
+def load_live_state(state_path: str, video_path: str, params: dict):
+    """读取尾随剪辑的进度文件；不属于该视频、参数不同、已结束或损坏时返回 None"""
+    if not os.path.exists(state_path):
+        return None
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"尾随剪辑进度文件损坏，将从头分析: {e}")
+        return None
+    if (state.get('source') != os.path.abspath(video_path) or state.get('params') != params
+            or state.get('status') not in ('recording', 'failed')):
+        return None
+    return state
+
+def write_live_state(state_path: str, state: dict):
+    """原子写入尾随剪辑的进度文件，读取方不会看到写了一半的 JSON"""
+    tmp_path = f"{state_path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, state_path)
+
+def batch_params_hash(idle_threshold, min_segment_duration, pixel_threshold, preserve_buffer,
+                      analysis_backend, analysis_fps, edit_mode, encode_profile) -> str:
+    """影响输出内容的参数哈希，参数变化后处理清单中的记录不再算作已完成"""
+    return hashlib.sha1(json.dumps({
+        'idle_threshold': idle_threshold, 'min_segment_duration': min_segment_duration,
+        'pixel_threshold': pixel_threshold, 'preserve_buffer': preserve_buffer,
+        'analysis_backend': analysis_backend, 'analysis_fps': analysis_fps,
+        'edit_mode': edit_mode, 'encode_profile': encode_profile,
+    }, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+class BatchManifest:
+    """
+    可续跑批处理的处理清单（输出目录下的 batch_manifest.json）
+    每个输入记录大小、修改时间、参数哈希、输出文件和状态；文件未变且参数相同的已完成输入在重跑时跳过
+    """
+
+    FILENAME = "batch_manifest.json"
 
-            filename_mapping[filename] = sanitized_filename
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, self.FILENAME)
+        self.lock = threading.Lock()
+        self.entries = {}
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get('files', {})
+            except (OSError, ValueError) as e:
+                logger.warning(f"处理清单损坏，将重新处理全部视频: {e}")
+
+    def is_done(self, item: dict, params_hash: str) -> bool:
+        """输入文件未变化、参数相同、状态为完成且输出文件都还在时返回 True"""
+        entry = self.entries.get(manifest_key(item))
+        return (
+            entry is not None
+            and entry.get('status') == 'done'
+            and entry.get('size') == item['size']
+            and entry.get('mtime_ns') == item['mtime_ns']
+            and entry.get('params_hash') == params_hash
+            and all(os.path.exists(os.path.join(self.output_dir, output)) for output in entry.get('outputs', []))
+        )
+
+    def record(self, item: dict, params_hash: str, status: str, output_paths: list, error: str = None):
+        """记录一个输入的处理结果并立即落盘（各编码线程并发调用）；失败时 error 记录失败原因"""
+        with self.lock:
+            self.entries[manifest_key(item)] = {
+                'size': item['size'],
+                'mtime_ns': item['mtime_ns'],
+                'params_hash': params_hash,
+                'outputs': [os.path.relpath(path, self.output_dir).replace(os.sep, '/') for path in output_paths],
+                'status': status,
+                'error': error,
+                'updated_at': time.time(),
+            }
+            self._save()
 
-    return temp_dir, str(filename_mapping)
+    def _save(self):
+        tmp_path = f"{self.path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'files': self.entries}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+class SharedJobQueue:
+    """
+    共享存储上的任务队列（输出目录下的 job_queue.sqlite），多台渲染机的工作进程共同领取
+    每个任务保存提交时的处理设置；工作者领取任务时获得租约，处理期间定期心跳续租；租约过期的任务视为工作者已退出，
+    由其他工作者重新领取，超过 max_attempts 次仍未完成的任务标记为失败。
+    只依赖 SQLite 文件锁，不需要额外服务；租约按各机器的系统时间计算，机器间时钟需大致同步。
+    """
+
+    FILENAME = "job_queue.sqlite"
+
+    def __init__(self, queue_dir: str, lease_seconds: float = JOB_LEASE_SECONDS, max_attempts: int = 3):
+        self.queue_dir = queue_dir
+        self.db_path = os.path.join(queue_dir, self.FILENAME)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(queue_dir, exist_ok=True)
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    key TEXT PRIMARY KEY,
+                    path TEXT,
+                    relative_dir TEXT,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    params_hash TEXT,
+                    settings TEXT,
+                    status TEXT,
+                    worker TEXT,
+                    lease_until REAL,
+                    attempts INTEGER,
+                    result TEXT,
+                    updated_at REAL
+                )
+            """)
+
+    def _connect(self):
+        # 共享存储上不使用 WAL（网络文件系统不支持共享内存），默认回滚日志 + 文件锁
+        return sqlite3.connect(self.db_path, timeout=60)
+
+    def enqueue(self, manifest: list, params_hash: str, settings: dict) -> tuple:
+        """加入扫描清单中的视频，返回 (新加入或因文件变化重新排队的任务数, 参数冲突的任务键列表)
+
+        多台机器可以重复提交同一批：已在队列中且文件和参数未变的任务保持原状态。
+        队列中已有同一文件但参数不同的任务时不覆盖它的设置，整批都不加入，由调用方报错
+        """
+        added = 0
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            existing = {}
+            for item in manifest:
+                key = manifest_key(item)
+                existing[key] = conn.execute(
+                    "SELECT size, mtime_ns, params_hash FROM jobs WHERE key = ?", (key,)
+                ).fetchone()
+            conflicts = [key for key, row in existing.items() if row is not None and row[2] != params_hash]
+            if conflicts:
+                return 0, conflicts
+
+            for item in manifest:
+                key = manifest_key(item)
+                if existing[key] == (item['size'], item['mtime_ns'], params_hash):
+                    continue
+                conn.execute(
+                    "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, 'pending', NULL, NULL, 0, NULL, ?)",
+                    (key, os.path.abspath(item['path']), item['relative_dir'], item['size'], item['mtime_ns'],
+                     params_hash, json.dumps(settings), now)
+                )
+                added += 1
+        return added, []
+
+    def claim(self, worker_id: str):
+        """领取一个待处理任务（先回收租约过期的任务），没有可领取的任务时返回 None"""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            expired = conn.execute(
+                "SELECT key, worker, attempts FROM jobs WHERE status = 'running' AND lease_until < ?", (now,)
+            ).fetchall()
+            for key, worker, attempts in expired:
+                status = 'failed' if attempts >= self.max_attempts else 'pending'
+                conn.execute("UPDATE jobs SET status = ?, worker = NULL, lease_until = NULL, updated_at = ? WHERE key = ?",
+                             (status, now, key))
+                logger.warning(f"任务租约过期: {key} (工作者 {worker})，"
+                               f"{'已达重试上限，标记为失败' if status == 'failed' else '重新排队'}")
+
+            row = conn.execute(
+                "SELECT key, path, relative_dir, size, mtime_ns, settings, attempts FROM jobs "
+                "WHERE status = 'pending' ORDER BY rowid LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE key = ?",
+                (worker_id, now + self.lease_seconds, now, row[0])
+            )
+        key, path, relative_dir, size, mtime_ns, settings, attempts = row
+        return {'key': key, 'path': path, 'relative_dir': relative_dir, 'size': size, 'mtime_ns': mtime_ns,
+                'settings': json.loads(settings), 'attempt': attempts + 1}
+
+    def heartbeat(self, key: str, worker_id: str) -> bool:
+        """续租；任务已被回收给其他工作者时返回 False"""
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE key = ? AND worker = ? AND status = 'running'",
+                (time.time() + self.lease_seconds, time.time(), key, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, key: str, worker_id: str, success: bool, result) -> bool:
+        """提交处理结果；租约已失效（任务被其他工作者接手）时不覆盖，返回 False"""
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, lease_until = NULL, result = ?, updated_at = ? "
+                "WHERE key = ? AND worker = ? AND status = 'running'",
+                ('done' if success else 'failed', json.dumps(result, default=_json_default) if result else None,
+                 time.time(), key, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def counts(self) -> dict:
+        """各状态的任务数"""
+        counts = {'pending': 0, 'running': 0, 'done': 0, 'failed': 0}
+        with closing(self._connect()) as conn:
+            for status, count in conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+                counts[status] = count
+        return counts
+
+    def results(self):
+        """所有工作者提交的分析结果，按提交顺序返回 [(状态, 分析结果), ...]"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT status, result FROM jobs WHERE result IS NOT NULL ORDER BY rowid"
+            ).fetchall()
+        return [(status, json.loads(result)) for status, result in rows]
+
+def _json_default(value):
+    """json.dumps 的兜底转换：numpy 标量转为 Python 数值"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
 
 def cleanup_temp_folder(temp_dir: str):
     """清理临时文件夹"""
@@ -72,6 +569,1375 @@ def cleanup_temp_folder(temp_dir: str):
     except:
         pass
 
+def get_cache_dir() -> str:
+    """获取插件的持久化缓存目录（可通过环境变量 YX_EASYUSE_CACHE_DIR 指定）"""
+    cache_dir = os.environ.get("YX_EASYUSE_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "comfyui-yx-easyuse"
+    )
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+# 本批扫描清单中的文件大小和修改时间：绝对路径 -> (size, mtime_ns)，批处理期间免去重复 stat
+_FILE_STATS = {}
+
+# 暂存文件对应的源文件：暂存路径 -> 源文件绝对路径，缓存键按源文件计算
+_SOURCE_PATHS = {}
+
+def remember_file_stats(manifest: list):
+    """登记扫描清单里的文件身份，批处理期间 file_identity 直接复用"""
+    for item in manifest:
+        path = os.path.abspath(item['path'])
+        _FILE_STATS[path] = (item['size'], item['mtime_ns'])
+        if 'source_path' in item:
+            _SOURCE_PATHS[path] = os.path.abspath(item['source_path'])
+
+def forget_file_stats(manifest: list):
+    """批处理结束后移除登记，之后的调用重新 stat，不会用到过期的身份"""
+    for item in manifest:
+        path = os.path.abspath(item['path'])
+        _FILE_STATS.pop(path, None)
+        _SOURCE_PATHS.pop(path, None)
+
+def cache_source_path(video_path: str) -> str:
+    """缓存使用的文件路径：暂存文件换成源文件路径，每次暂存目录不同也能命中缓存"""
+    path = os.path.abspath(video_path)
+    return _SOURCE_PATHS.get(path, path)
+
+def file_identity(video_path: str) -> tuple:
+    """返回文件的 (大小, 修改时间ns)：优先取扫描清单，未登记时 stat"""
+    identity = _FILE_STATS.get(os.path.abspath(video_path))
+    if identity is None:
+        stat = os.stat(video_path)
+        identity = (stat.st_size, stat.st_mtime_ns)
+    return identity
+
+def file_cache_key(video_path: str, params: dict) -> str:
+    """根据文件身份（路径、大小、修改时间）和分析参数生成缓存键"""
+    size, mtime_ns = file_identity(video_path)
+    identity = [cache_source_path(video_path), size, mtime_ns, params]
+    return hashlib.sha1(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+
+class MotionScoreCache:
+    """
+    运动分数磁盘缓存
+    原始逐帧分数保存为 .npy 文件，SQLite 记录索引和访问时间，总大小超过上限时按 LRU 淘汰
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = SCORE_CACHE_MAX_BYTES):
+        self.cache_dir = os.path.join(cache_dir or get_cache_dir(), "motion_scores")
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.db_path = os.path.join(self.cache_dir, "index.sqlite")
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS motion_scores (
+                    key TEXT PRIMARY KEY,
+                    video_path TEXT,
+                    file_size INTEGER,
+                    file_mtime_ns INTEGER,
+                    params TEXT,
+                    filename TEXT,
+                    nbytes INTEGER,
+                    last_access REAL
+                )
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, video_path: str, params: dict):
+        """读取缓存的分数，未命中返回 None"""
+        try:
+            key = file_cache_key(video_path, params)
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute("SELECT filename FROM motion_scores WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+
+                score_file = os.path.join(self.cache_dir, row[0])
+                if not os.path.exists(score_file):
+                    conn.execute("DELETE FROM motion_scores WHERE key = ?", (key,))
+                    return None
+
+                scores = np.load(score_file)
+                conn.execute("UPDATE motion_scores SET last_access = ? WHERE key = ?", (time.time(), key))
+                return scores
+        except Exception as e:
+            logger.warning(f"读取运动分数缓存失败: {e}")
+            return None
+
+    def put(self, video_path: str, params: dict, scores):
+        """写入分数缓存，并按 LRU 淘汰超出容量的条目"""
+        try:
+            size, mtime_ns = file_identity(video_path)
+            key = file_cache_key(video_path, params)
+            filename = f"{key}.npy"
+            score_file = os.path.join(self.cache_dir, filename)
+
+            # 先写临时文件再原子替换，避免并发读到半个文件
+            temp_file = f"{score_file}.{uuid.uuid4().hex[:8]}.tmp.npy"
+            np.save(temp_file, np.asarray(scores))
+            os.replace(temp_file, score_file)
+
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO motion_scores VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, cache_source_path(video_path), size, mtime_ns,
+                     json.dumps(params, sort_keys=True), filename, os.path.getsize(score_file), time.time())
+                )
+                self._evict(conn)
+        except Exception as e:
+            logger.warning(f"写入运动分数缓存失败: {e}")
+
+    def _evict(self, conn):
+        """总大小超过上限时，从最久未访问的条目开始删除"""
+        total_bytes = conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM motion_scores").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+
+        rows = conn.execute("SELECT key, filename, nbytes FROM motion_scores ORDER BY last_access ASC").fetchall()
+        for key, filename, nbytes in rows:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except OSError:
+                pass
+            conn.execute("DELETE FROM motion_scores WHERE key = ?", (key,))
+            total_bytes -= nbytes
+            logger.info(f"淘汰运动分数缓存: {filename}")
+
+class VideoProbeCache:
+    """
+    视频元数据磁盘缓存
+    每个文件一条 JSON 记录（按路径、大小、修改时间作键），流水线的分析子进程和编码线程共用。
+    同一路径写入新记录时删除该路径的旧记录（文件已变化，旧键不会再命中），条目数超过上限时按 LRU 淘汰
+    """
+
+    def __init__(self, cache_dir: str = None, max_entries: int = PROBE_CACHE_MAX_ENTRIES):
+        self.cache_dir = os.path.join(cache_dir or get_cache_dir(), "video_probe")
+        self.max_entries = max_entries
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.db_path = os.path.join(self.cache_dir, "index.sqlite")
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS video_probe (
+                    key TEXT PRIMARY KEY,
+                    video_path TEXT,
+                    data TEXT,
+                    last_access REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS video_probe_path ON video_probe (video_path)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, key: str):
+        """读取缓存的元数据，未命中返回 None"""
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute("SELECT data FROM video_probe WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE video_probe SET last_access = ? WHERE key = ?", (time.time(), key))
+                return json.loads(row[0])
+        except Exception as e:
+            logger.warning(f"读取视频元数据缓存失败: {e}")
+            return None
+
+    def put(self, key: str, video_path: str, info: dict):
+        """写入元数据缓存，删除同一路径的旧记录，并按 LRU 淘汰超出上限的条目"""
+        source_path = cache_source_path(video_path)
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("DELETE FROM video_probe WHERE video_path = ? AND key != ?", (source_path, key))
+                conn.execute(
+                    "INSERT OR REPLACE INTO video_probe VALUES (?, ?, ?, ?)",
+                    (key, source_path, json.dumps(info), time.time())
+                )
+                self._evict(conn)
+        except Exception as e:
+            logger.warning(f"写入视频元数据缓存失败: {e}")
+
+    def _evict(self, conn):
+        """条目数超过上限时，删除最久未访问的条目"""
+        excess = conn.execute("SELECT COUNT(*) FROM video_probe").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM video_probe WHERE key IN "
+                "(SELECT key FROM video_probe ORDER BY last_access ASC LIMIT ?)", (excess,)
+            )
+
+# 进程内元数据缓存：缓存键 -> probe_video 结果
+_PROBE_MEMO = {}
+_PROBE_MEMO_LOCK = threading.Lock()
+
+def _parse_rate(text) -> float:
+    """解析 ffprobe 的 "num/den" 帧率字符串"""
+    try:
+        num, den = str(text or '0/1').split('/')
+        return float(num) / float(den) if float(den) > 0 else 0.0
+    except ValueError:
+        return 0.0
+
+def parse_probe_info(probe: dict) -> dict:
+    """把 ffprobe 的 format/streams 输出整理成各阶段共用的元数据
+
+    可变帧率文件的 r_frame_rate 是最高帧率、容器帧数也常常不准，
+    因此时长取容器/流时长，fps 取 avg_frame_rate，帧数缺失时由两者推算。
+    """
+    streams = probe.get('streams', [])
+    video = next((st for st in streams if st.get('codec_type') == 'video'), None)
+    audio = next((st for st in streams if st.get('codec_type') == 'audio'), None)
+    if video is None:
+        raise ValueError("没有视频流")
+
+    fps = _parse_rate(video.get('avg_frame_rate')) or _parse_rate(video.get('r_frame_rate'))
+    duration = float(probe.get('format', {}).get('duration') or video.get('duration') or 0.0)
+    frame_count = int(video.get('nb_frames') or 0)
+    if frame_count <= 0 and duration > 0 and fps > 0:
+        frame_count = int(round(duration * fps))
+    if duration <= 0 and frame_count > 0 and fps > 0:
+        duration = frame_count / fps
+
+    time_base = video.get('time_base') or ''
+    return {
+        'source': 'ffprobe',
+        'fps': fps,
+        'frame_count': frame_count,
+        'duration': duration,
+        'width': video.get('width'),
+        'height': video.get('height'),
+        'has_audio': audio is not None,
+        'video_codec': video.get('codec_name'),
+        'audio_codec': audio.get('codec_name') if audio is not None else None,
+        'profile': video.get('profile'),
+        'pix_fmt': video.get('pix_fmt'),
+        'timescale': int(time_base.split('/')[1]) if '/' in time_base else None,
+    }
+
+def _probe_with_opencv(video_path):
+    """ffprobe 不可用时的降级探测：只能拿到容器报告的 fps 和帧数，按无音频处理"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    return {
+        'source': 'opencv',
+        'fps': fps,
+        'frame_count': frame_count,
+        'duration': frame_count / fps if fps > 0 else 0.0,
+        'width': width,
+        'height': height,
+        'has_audio': False,
+        'video_codec': None,
+        'audio_codec': None,
+        'profile': None,
+        'pix_fmt': None,
+        'timescale': None,
+    }
+
+def _probe_keyframes(video_path):
+    """读取视频流关键帧时间戳（只解析封装层的数据包标志，不解码），返回升序数组"""
+    probe = ffmpeg.probe(video_path, select_streams='v:0', show_entries='packet=pts_time,flags')
+    times = [
+        float(packet['pts_time'])
+        for packet in probe.get('packets', [])
+        if 'K' in packet.get('flags', '') and packet.get('pts_time') not in (None, 'N/A')
+    ]
+    return np.unique(np.asarray(times, dtype=np.float64))
+
+class KeyframeIndexCache:
+    """
+    关键帧索引磁盘缓存
+    每个文件一个 .npy（float64 升序时间戳），文件名由路径、大小、修改时间生成，源文件变化后自然失效；
+    SQLite 记录索引和访问时间，同一路径写入新索引时删除旧索引，总大小超过上限时按 LRU 淘汰
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = KEYFRAME_CACHE_MAX_BYTES):
+        self.cache_dir = os.path.join(cache_dir or get_cache_dir(), "keyframe_index")
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.db_path = os.path.join(self.cache_dir, "index.sqlite")
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS keyframe_index (
+                    key TEXT PRIMARY KEY,
+                    video_path TEXT,
+                    filename TEXT,
+                    nbytes INTEGER,
+                    last_access REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS keyframe_index_path ON keyframe_index (video_path)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _key(self, video_path):
+        return file_cache_key(video_path, {'keyframe_index': 1})
+
+    def get(self, video_path):
+        """读取关键帧索引，未命中返回 None"""
+        key = self._key(video_path)
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute("SELECT filename FROM keyframe_index WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+
+                entry_path = os.path.join(self.cache_dir, row[0])
+                if not os.path.exists(entry_path):
+                    conn.execute("DELETE FROM keyframe_index WHERE key = ?", (key,))
+                    return None
+
+                keyframe_times = np.load(entry_path)
+                conn.execute("UPDATE keyframe_index SET last_access = ? WHERE key = ?", (time.time(), key))
+                return keyframe_times
+        except Exception as e:
+            logger.warning(f"关键帧索引损坏，重新生成: {os.path.basename(video_path)} | 错误: {e}")
+            return None
+
+    def put(self, video_path, keyframe_times):
+        """写入关键帧索引（先写临时文件再原子替换，并行构建时不会读到半个文件），删除同一路径的旧索引并按 LRU 淘汰"""
+        key = self._key(video_path)
+        filename = f"{key}.npy"
+        entry_path = os.path.join(self.cache_dir, filename)
+        tmp_path = f"{entry_path}.{uuid.uuid4().hex}.tmp"
+        source_path = cache_source_path(video_path)
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.asarray(keyframe_times, dtype=np.float64))
+            os.replace(tmp_path, entry_path)
+
+            with closing(self._connect()) as conn, conn:
+                stale = conn.execute(
+                    "SELECT key, filename FROM keyframe_index WHERE video_path = ? AND key != ?", (source_path, key)
+                ).fetchall()
+                for stale_key, stale_filename in stale:
+                    self._remove_entry(conn, stale_key, stale_filename)
+                conn.execute(
+                    "INSERT OR REPLACE INTO keyframe_index VALUES (?, ?, ?, ?, ?)",
+                    (key, source_path, filename, os.path.getsize(entry_path), time.time())
+                )
+                self._evict(conn)
+        except Exception as e:
+            logger.warning(f"写入关键帧索引失败: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _remove_entry(self, conn, key, filename):
+        try:
+            os.remove(os.path.join(self.cache_dir, filename))
+        except OSError:
+            pass
+        conn.execute("DELETE FROM keyframe_index WHERE key = ?", (key,))
+
+    def _evict(self, conn):
+        """总大小超过上限时，从最久未访问的条目开始删除"""
+        total_bytes = conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM keyframe_index").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+
+        rows = conn.execute("SELECT key, filename, nbytes FROM keyframe_index ORDER BY last_access ASC").fetchall()
+        for key, filename, nbytes in rows:
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove_entry(conn, key, filename)
+            total_bytes -= nbytes
+            logger.info(f"淘汰关键帧索引缓存: {filename}")
+
+def load_keyframe_index(video_path, cache: KeyframeIndexCache = None):
+    """返回文件的关键帧时间戳数组：优先读取持久化索引，未命中时探测并写入索引；探测失败返回 None"""
+    cache = cache or KeyframeIndexCache()
+    keyframe_times = cache.get(video_path)
+    if keyframe_times is not None:
+        return keyframe_times
+
+    try:
+        keyframe_times = _probe_keyframes(video_path)
+    except Exception as e:
+        logger.warning(f"关键帧探测失败: {os.path.basename(video_path)} | 错误: {e}")
+        return None
+
+    cache.put(video_path, keyframe_times)
+    return keyframe_times
+
+def build_keyframe_indexes(video_files, max_workers=1):
+    """并行为一批文件建立关键帧索引（已有且未失效的直接跳过），返回 {路径: 关键帧数组或 None}
+
+    探测由 ffprobe 子进程完成，线程池即可并行。
+    """
+    cache = KeyframeIndexCache()
+    indexes = {}
+    with ThreadPoolExecutor(max_workers=max(1, int(max_workers))) as executor:
+        future_to_file = {executor.submit(load_keyframe_index, video_file, cache): video_file
+                          for video_file in video_files}
+        for future in as_completed(future_to_file):
+            indexes[future_to_file[future]] = future.result()
+
+    ready = sum(1 for times in indexes.values() if times is not None)
+    logger.info(f"关键帧索引: {ready}/{len(video_files)} 个文件就绪")
+    return indexes
+
+def probe_video(video_path):
+    """每个文件只探测一次的视频元数据：fps、帧数、时长、音频、编码参数
+
+    结果先查进程内缓存，再查磁盘缓存（文件大小或修改时间变化即失效），都未命中才调用 ffprobe。
+    ffprobe 不可用时降级为 OpenCV 读取（只缓存在进程内）。无法打开文件时返回 None。
+    """
+    try:
+        key = file_cache_key(video_path, {'video_probe': 1})
+    except OSError as e:
+        logger.error(f"无法读取视频文件: {video_path} | 错误: {e}")
+        return None
+
+    with _PROBE_MEMO_LOCK:
+        info = _PROBE_MEMO.get(key)
+    if info is not None:
+        return info
+
+    disk_cache = VideoProbeCache()
+    info = disk_cache.get(key)
+
+    if info is None:
+        try:
+            info = parse_probe_info(ffmpeg.probe(video_path))
+            disk_cache.put(key, video_path, info)
+        except Exception as e:
+            logger.warning(f"ffprobe 探测失败，改用 OpenCV 读取: {os.path.basename(video_path)} | 错误: {e}")
+            info = _probe_with_opencv(video_path)
+            if info is None:
+                logger.error(f"无法打开视频文件: {video_path}")
+                return None
+
+    with _PROBE_MEMO_LOCK:
+        _PROBE_MEMO[key] = info
+    return info
+
+def get_peak_rss_mb() -> float:
+    """获取进程启动以来的峰值常驻内存（MB），平台不支持时返回 0
+
+    这是整个进程生命周期的高水位，在 ComfyUI 常驻进程中会包含之前所有任务，不代表单个视频的占用
+    """
+    if not HAS_RESOURCE:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 单位为字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def get_current_rss_mb() -> float:
+    """获取当前进程此刻的常驻内存（MB），读取 /proc/self/statm，平台不支持时返回 0"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return 0.0
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+class ScoreBuffer:
+    """
+    预分配的 float32 运动分数缓冲区
+    按容器帧数一次性分配，帧数不准时按块扩容，避免逐帧 append Python 对象
+    """
+
+    def __init__(self, capacity: int, grow_frames: int = SCORE_BUFFER_GROW_FRAMES):
+        self._data = np.empty(max(1, int(capacity)), dtype=np.float32)
+        self._size = 0
+        self.grow_frames = grow_frames
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, extra: int):
+        required = self._size + extra
+        if required > len(self._data):
+            new_capacity = max(required, len(self._data) + self.grow_frames)
+            grown = np.empty(new_capacity, dtype=np.float32)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+
+    def append(self, value, count: int = 1):
+        """追加 count 个相同的分数（采样分析时一个帧差覆盖多帧）"""
+        self._reserve(count)
+        self._data[self._size:self._size + count] = value
+        self._size += count
+
+    def extend(self, values):
+        """追加一段分数数组"""
+        values = np.asarray(values, dtype=np.float32)
+        self._reserve(len(values))
+        self._data[self._size:self._size + len(values)] = values
+        self._size += len(values)
+
+    def pad_to(self, length: int):
+        """用最后一个分数把长度补齐到 length"""
+        if 0 < self._size < length:
+            self.append(self._data[self._size - 1], length - self._size)
+
+    def array(self):
+        """返回有效分数部分的视图（不复制）"""
+        return self._data[:self._size]
+
+class FrameDiffKernel:
+    """
+    无分配的逐帧帧差计算
+    两块灰度缓冲区轮换使用，缩放、转灰度、帧差和二值化都写入预分配的 dst，
+    用 cv2.countNonZero 统计显著变化的像素
+    """
+
+    def __init__(self, pixel_threshold, width=ANALYSIS_WIDTH, height=ANALYSIS_HEIGHT):
+        self.pixel_threshold = pixel_threshold
+        self.size = (width, height)
+        self.total_pixels = width * height
+        self.small = np.empty((height, width, 3), dtype=np.uint8)
+        self.grays = [np.empty((height, width), dtype=np.uint8), np.empty((height, width), dtype=np.uint8)]
+        self.diff = np.empty((height, width), dtype=np.uint8)
+        self.current = 0
+        self.has_prev = False
+
+    def next_gray(self):
+        """返回下一帧灰度图应写入的缓冲区（供 rawvideo 管道直接 readinto）"""
+        return self.grays[self.current]
+
+    def push_bgr(self, frame):
+        """输入一帧全分辨率 BGR 图像，返回与上一帧的变化比例（第一帧返回 None）"""
+        cv2.resize(frame, self.size, dst=self.small)
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY, dst=self.grays[self.current])
+        return self.push_gray()
+
+    def push_gray(self):
+        """next_gray() 缓冲区已写入新帧，返回与上一帧的变化比例（第一帧返回 None）"""
+        gray = self.grays[self.current]
+        prev_gray = self.grays[1 - self.current]
+
+        change_ratio = None
+        if self.has_prev:
+            # 计算帧差，并把大于阈值的像素置为 255
+            cv2.absdiff(prev_gray, gray, dst=self.diff)
+            cv2.threshold(self.diff, self.pixel_threshold, 255, cv2.THRESH_BINARY, dst=self.diff)
+            change_ratio = cv2.countNonZero(self.diff) / self.total_pixels
+
+        self.has_prev = True
+        self.current = 1 - self.current
+        return change_ratio
+
+def _motion_scores_opencv(video_path, pixel_threshold, stride=1, start_frame=0, end_frame=None, total_frames=0,
+                          log_progress=True, score_callback=None, decode_threads=0):
+    """OpenCV 后端：逐帧解码后缩放、转灰度并计算帧差
+
+    分析 [start_frame, end_frame] 闭区间内的帧（end_frame=None 表示读到文件末尾），
+    返回 (ScoreBuffer 运动分数, 读到的帧号上界)。分数 i 对应第 start_frame+i 帧与下一帧之间的变化。
+    score_callback(change_ratio, count) 在每次写入分数时调用，用于边分析边分段。
+    decode_threads > 0 时限制解码线程数（需要 OpenCV 支持 CAP_PROP_N_THREADS）。
+    """
+    if decode_threads > 0 and hasattr(cv2, 'CAP_PROP_N_THREADS'):
+        cap = cv2.VideoCapture(video_path, cv2.CAP_ANY, [cv2.CAP_PROP_N_THREADS, int(decode_threads)])
+    else:
+        cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        logger.error(f"无法打开视频文件: {video_path}")
+        return ScoreBuffer(0), start_frame
+
+    if start_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    kernel = FrameDiffKernel(pixel_threshold)
+    frame = None
+    prev_index = start_frame
+    expected_frames = (end_frame - start_frame) if end_frame is not None else (total_frames - start_frame)
+    motion_scores = ScoreBuffer(expected_frames)
+    frame_index = start_frame
+
+    # 处理进度显示间隔
+    progress_interval = max(1, total_frames // 20)
+
+    try:
+        while end_frame is None or frame_index <= end_frame:
+            if (frame_index - start_frame) % stride != 0:
+                # 跳过的帧只 grab，不做解码后的 retrieve
+                if not cap.grab():
+                    break
+            else:
+                # 复用上一帧的解码缓冲区
+                ret, frame = cap.read(frame)
+                if not ret:
+                    break
+
+                # 降采样加速处理
+                change_ratio = kernel.push_bgr(frame)
+                if change_ratio is not None:
+                    # 采样间隔内的每一帧都记为同一分数
+                    motion_scores.append(change_ratio, frame_index - prev_index)
+                    if score_callback is not None:
+                        score_callback(change_ratio, frame_index - prev_index)
+
+                prev_index = frame_index
+
+            frame_index += 1
+
+            # 显示进度
+            if log_progress and frame_index % progress_interval == 0:
+                progress = (frame_index / total_frames) * 100
+                logger.info(f"分析进度: {progress:.1f}% ({frame_index}/{total_frames})")
+    finally:
+        cap.release()
+
+    return motion_scores, frame_index
+
+def _motion_scores_ffmpeg(video_path, pixel_threshold, stride=1, start_frame=0, end_frame=None, total_frames=0,
+                          fps=0.0, log_progress=True, score_callback=None, decode_threads=0, follow_timeout=0.0):
+    """ffmpeg 后端：解码端缩放+灰度，通过 rawvideo 管道读取
+
+    参数与返回值同 _motion_scores_opencv；start_frame > 0 时按 fps 换算时间做输入端精确 seek。
+    follow_timeout > 0 时用 file 协议的 follow 模式跟读仍在写入的文件（分片 MP4/MKV/TS），
+    文件超过 follow_timeout 秒没有新数据才视为结束。
+    """
+    frame_size = ANALYSIS_WIDTH * ANALYSIS_HEIGHT
+    kernel = FrameDiffKernel(pixel_threshold)
+    expected_frames = (end_frame - start_frame) if end_frame is not None else (total_frames - start_frame)
+    motion_scores = ScoreBuffer(expected_frames)
+    frame_index = start_frame
+
+    # 处理进度显示间隔
+    progress_interval = max(1, total_frames // 20)
+
+    input_kwargs = {}
+    if start_frame > 0 and fps > 0:
+        # 偏移半帧，保证第一帧恰好是 start_frame
+        input_kwargs['ss'] = (start_frame - 0.5) / fps
+    if decode_threads > 0:
+        input_kwargs['threads'] = int(decode_threads)
+    input_name = video_path
+    if follow_timeout > 0:
+        input_name = f"file:{os.path.abspath(video_path)}"
+        input_kwargs['follow'] = 1
+        input_kwargs['rw_timeout'] = int(follow_timeout * 1000000)
+
+    stream = ffmpeg.input(input_name, **input_kwargs).video
+    if stride > 1:
+        # 只把采样帧送入缩放和管道
+        stream = stream.filter('select', f'not(mod(n,{stride}))')
+    stream = stream.filter('scale', ANALYSIS_WIDTH, ANALYSIS_HEIGHT, flags='bilinear')
+
+    output_kwargs = {}
+    if end_frame is not None:
+        output_kwargs['vframes'] = (end_frame - start_frame) // stride + 1
+
+    process = (
+        stream
+        .output('pipe:', format='rawvideo', pix_fmt='gray', vsync='passthrough', **output_kwargs)
+        .run_async(pipe_stdout=True, quiet=True)
+    )
+
+    try:
+        while True:
+            # 管道数据直接读入内核的灰度缓冲区
+            if process.stdout.readinto(memoryview(kernel.next_gray()).cast('B')) < frame_size:
+                break
+
+            change_ratio = kernel.push_gray()
+            if change_ratio is not None:
+                motion_scores.append(change_ratio, stride)
+                if score_callback is not None:
+                    score_callback(change_ratio, stride)
+
+            frame_index += stride
+
+            # 显示进度
+            if log_progress and frame_index % progress_interval < stride:
+                progress = min(100.0, (frame_index / total_frames) * 100)
+                logger.info(f"分析进度: {progress:.1f}% ({min(frame_index, total_frames)}/{total_frames})")
+    finally:
+        process.stdout.close()
+        process.wait()
+
+    if not kernel.has_prev:
+        return motion_scores, start_frame
+
+    # 管道中看不到被跳过的尾帧，用容器帧数估计；跟读时容器帧数未知，以实际读到的为准
+    frames_seen = frame_index if end_frame is not None or follow_timeout > 0 else min(total_frames, frame_index)
+    return motion_scores, max(frames_seen, start_frame + len(motion_scores) + 1)
+
+# 当前进程是否为分析进程池的工作进程（由进程池初始化函数设置）。
+# ProcessPoolExecutor 的工作进程不是 daemon 进程，不能靠 current_process().daemon 判断
+_IN_ANALYSIS_WORKER = False
+
+def _init_analysis_worker(cv_threads=0):
+    """分析进程池的初始化函数：标记为工作进程（不再嵌套创建进程池），并按预算设置 OpenCV 线程数"""
+    global _IN_ANALYSIS_WORKER
+    _IN_ANALYSIS_WORKER = True
+    if cv_threads > 0:
+        cv2.setNumThreads(cv_threads)
+
+def process_pool_context(func):
+    """返回运行 func 的进程池所用的 fork 上下文；平台不支持 fork 或 func 无法序列化时返回 None
+
+    ComfyUI 以带连字符的目录名加载插件，spawn 启动的子进程无法重新导入本模块，任务全部失败；
+    fork 的子进程直接继承已导入的模块，不需要重新导入
+    """
+    try:
+        context = multiprocessing.get_context("fork")
+        pickle.dumps(func)
+    except (ValueError, pickle.PicklingError, AttributeError, TypeError) as e:
+        logger.info(f"无法使用 fork 进程池，分析改用线程池: {e}")
+        return None
+    return context
+
+def analysis_executor(func, max_workers, cv_threads=0):
+    """运行分析任务 func 的执行器：能 fork 时用进程池绕开 GIL，否则退回线程池（OpenCV 解码时释放 GIL）"""
+    context = process_pool_context(func)
+    if context is None:
+        return ThreadPoolExecutor(max_workers=max_workers)
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                               initializer=_init_analysis_worker, initargs=(cv_threads,))
+
+def analyze_frame_range(video_path, pixel_threshold, analysis_backend="opencv", stride=1,
+                        start_frame=0, end_frame=None, total_frames=0, fps=0.0, log_progress=True,
+                        score_callback=None, decode_threads=0, follow_timeout=0.0):
+    """分析视频的一段帧区间，返回 (运动分数, 读到的帧号上界)
+
+    模块级函数，可直接提交到进程池。follow_timeout > 0（跟读增长中的文件）时总是使用 ffmpeg 后端
+    """
+    if analysis_backend == "ffmpeg" or follow_timeout > 0:
+        return _motion_scores_ffmpeg(video_path, pixel_threshold, stride, start_frame, end_frame,
+                                     total_frames, fps, log_progress, score_callback, decode_threads,
+                                     follow_timeout)
+    return _motion_scores_opencv(video_path, pixel_threshold, stride, start_frame, end_frame,
+                                 total_frames, log_progress, score_callback, decode_threads)
+
+def plan_analysis_chunks(total_frames, num_chunks, stride=1, min_chunk_frames=600):
+    """把 [0, total_frames) 划分为按采样间隔对齐的区间
+
+    返回 [(start_frame, end_frame), ...]，end_frame 为闭区间端点且与下一段的 start_frame 相同
+    （重叠一帧，保证段间帧差不丢失）；最后一段 end_frame=None 表示读到文件末尾
+    """
+    num_chunks = max(1, min(num_chunks, total_frames // max(1, min_chunk_frames)))
+    if num_chunks <= 1:
+        return [(0, None)]
+
+    # 区间长度取 stride 的整数倍，保证各段采样点与顺序分析一致
+    chunk_len = max(stride, (total_frames // num_chunks) // stride * stride)
+    chunks = []
+    start = 0
+    for i in range(num_chunks):
+        if i == num_chunks - 1 or start + chunk_len >= total_frames - 1:
+            chunks.append((start, None))
+            break
+        chunks.append((start, start + chunk_len))
+        start += chunk_len
+    return chunks
+
+def find_idle_runs(idle_mask):
+    """对无操作掩码做游程编码，返回每段连续 True 的 (起始下标, 结束下标) 数组，结束下标为开区间
+
+    idle_mask 为二维时按行独立编码，返回 (行号, 起始下标, 结束下标)
+    """
+    idle_mask = np.asarray(idle_mask, dtype=bool)
+
+    if idle_mask.ndim == 1:
+        # 一维时只在状态变化处取边界，避免整段的整数临时数组
+        change = np.flatnonzero(idle_mask[1:] != idle_mask[:-1]) + 1
+        boundaries = np.concatenate(([0], change, [len(idle_mask)]))
+        if len(idle_mask) == 0:
+            return boundaries[:0], boundaries[:0]
+        run_is_idle = idle_mask[boundaries[:-1]]
+        return boundaries[:-1][run_is_idle], boundaries[1:][run_is_idle]
+
+    pad_shape = idle_mask.shape[:-1] + (1,)
+    padding = np.zeros(pad_shape, dtype=np.int8)
+    edges = np.diff(np.concatenate([padding, idle_mask.astype(np.int8), padding], axis=-1), axis=-1)
+
+    start_rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return start_rows, starts, ends
+
+class OnlineSegmenter:
+    """
+    流式分段器
+    逐帧输入原始运动分数，按与 smooth_motion_scores / detect_idle_segments / create_active_segments
+    相同的规则分段。无操作区间一旦达到最小时长，它之前的精彩片段就已确定并立即输出，
+    不必等整段视频分析完成
+    """
+
+    def __init__(self, fps, idle_threshold, min_duration, preserve_buffer=1.0, window_size=3):
+        self.fps = fps
+        self.idle_threshold = idle_threshold
+        self.min_duration = min_duration
+        self.preserve_buffer = preserve_buffer
+        self.window_size = window_size
+        self.half = window_size // 2
+        # 只保留平滑窗口所需的最近原始分数
+        self.recent = deque(maxlen=2 * self.half + 1)
+        self.pushed = 0
+        self.smoothed_count = 0
+        self.idle_start = None
+        self.idle_confirmed = False
+        self.current_time = 0.0
+        self.idle_segments = []
+        self.active_segments = []
+        self.finished = False
+
+    def push(self, score, count=1):
+        """输入 count 帧相同的原始分数，返回新确定的精彩片段列表"""
+        emitted = []
+        for _ in range(count):
+            self.recent.append(float(score))
+            self.pushed += 1
+            # 第 i 帧的居中窗口需要后续 half 帧；帧数不足 window_size 时批量实现不做平滑，需等待
+            while self.pushed >= max(self.smoothed_count + self.half + 1, self.window_size):
+                self._feed(self.smoothed_count, self._smoothed_value(self.smoothed_count, None), emitted)
+                self.smoothed_count += 1
+        return emitted
+
+    def finish(self, total_duration=None):
+        """输入结束：处理末尾截断窗口和最后一个片段，返回新确定的精彩片段列表
+
+        只在第一次调用时生效，重复调用返回空列表，不会重复输出最后一个片段
+        """
+        emitted = []
+        if self.finished:
+            return emitted
+        self.finished = True
+        if total_duration is None:
+            total_duration = self.pushed / self.fps
+
+        while self.smoothed_count < self.pushed:
+            if self.pushed < self.window_size:
+                # 与 smooth_motion_scores 一致：帧数不足窗口时不平滑
+                value = self.recent[self.smoothed_count - (self.pushed - len(self.recent))]
+            else:
+                value = self._smoothed_value(self.smoothed_count, self.pushed)
+            self._feed(self.smoothed_count, value, emitted)
+            self.smoothed_count += 1
+
+        # 处理视频结尾的无操作片段
+        if self.idle_start is not None:
+            self._close_idle(self.pushed)
+
+        if not self.idle_segments:
+            # 没有无操作片段，整个视频都是精彩片段
+            self._emit(0, total_duration, emitted, force=True)
+        elif self.current_time < total_duration - 0.5:
+            self._emit(self.current_time, total_duration, emitted, force=True)
+
+        return emitted
+
+    def _smoothed_value(self, index, end):
+        """计算第 index 帧的平滑分数，end 为已知的总帧数（None 表示尚未结束）"""
+        offset = self.pushed - len(self.recent)
+        stop = self.pushed if end is None else end
+
+        # 与 smooth_motion_scores 相同的累加顺序，保证浮点结果一致
+        total = self.recent[index - offset]
+        count = 1
+        for k in range(1, self.half + 1):
+            if index + k < stop:
+                total += self.recent[index + k - offset]
+                count += 1
+            if index - k >= 0:
+                total += self.recent[index - k - offset]
+                count += 1
+        return total / count
+
+    def _feed(self, index, value, emitted):
+        is_idle = value < self.idle_threshold
+
+        if is_idle and self.idle_start is None:
+            self.idle_start = index
+            self.idle_confirmed = False
+        elif not is_idle and self.idle_start is not None:
+            self._close_idle(index)
+
+        if self.idle_start is not None and not self.idle_confirmed:
+            if (index + 1 - self.idle_start) / self.fps >= self.min_duration:
+                # 无操作区间已确定会保留，它之前的精彩片段可以输出
+                self.idle_confirmed = True
+                segment_end = max(self.current_time, self.idle_start / self.fps - self.preserve_buffer)
+                self._emit(self.current_time, segment_end, emitted)
+
+    def _close_idle(self, end_frame):
+        duration = (end_frame - self.idle_start) / self.fps
+        if duration >= self.min_duration:
+            self.idle_segments.append({
+                'start_frame': self.idle_start,
+                'end_frame': end_frame,
+                'start_time': self.idle_start / self.fps,
+                'end_time': end_frame / self.fps,
+                'duration': duration
+            })
+            # 跳过无操作片段，保留一点缓冲
+            self.current_time = end_frame / self.fps + self.preserve_buffer
+        self.idle_start = None
+        self.idle_confirmed = False
+
+    def _emit(self, start_time, end_time, emitted, force=False):
+        if force or end_time > start_time + 0.5:  # 至少0.5秒的片段
+            segment = {'start_time': start_time, 'end_time': end_time}
+            self.active_segments.append(segment)
+            emitted.append(segment)
+
+    def state_dict(self):
+        """可 JSON 序列化的完整状态（含平滑窗口），用于断点续分析"""
+        return {
+            'fps': self.fps,
+            'idle_threshold': self.idle_threshold,
+            'min_duration': self.min_duration,
+            'preserve_buffer': self.preserve_buffer,
+            'window_size': self.window_size,
+            'recent': list(self.recent),
+            'pushed': self.pushed,
+            'smoothed_count': self.smoothed_count,
+            'idle_start': self.idle_start,
+            'idle_confirmed': self.idle_confirmed,
+            'current_time': self.current_time,
+            'idle_segments': list(self.idle_segments),
+            'active_segments': list(self.active_segments),
+            'finished': self.finished,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """从 state_dict 恢复，继续 push 的结果与不中断时完全一致"""
+        segmenter = cls(state['fps'], state['idle_threshold'], state['min_duration'],
+                        state['preserve_buffer'], state['window_size'])
+        segmenter.recent.extend(state['recent'])
+        for key in ('pushed', 'smoothed_count', 'idle_start', 'idle_confirmed', 'current_time'):
+            setattr(segmenter, key, state[key])
+        segmenter.idle_segments = list(state['idle_segments'])
+        segmenter.active_segments = list(state['active_segments'])
+        segmenter.finished = state.get('finished', False)
+        return segmenter
+
+def concat_video_parts(part_paths, output_path):
+    """用 concat demuxer 无损拼接编码参数一致的分段文件"""
+    if len(part_paths) == 1:
+        shutil.move(part_paths[0], output_path)
+        return
+
+    list_path = f"{output_path}.concat.txt"
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for part_path in part_paths:
+            escaped = os.path.abspath(part_path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    try:
+        (
+            ffmpeg
+            .input(list_path, format='concat', safe=0)
+            .output(output_path, c='copy')
+            .run(overwrite_output=True, quiet=True)
+        )
+    finally:
+        os.remove(list_path)
+
+def build_segment_select_expr(segments):
+    """生成 select/aselect 表达式：时间戳落在任一片段 [start, end) 内的帧被保留"""
+    return '+'.join(
+        f"gte(t,{segment['start_time']:.6f})*lt(t,{segment['end_time']:.6f})"
+        for segment in segments
+    )
+
+def format_timecode(seconds, fps):
+    """把秒数转换为非丢帧时间码 HH:MM:SS:FF（按最接近的整数帧率计帧）"""
+    base = max(1, int(round(fps)))
+    frames = int(round(seconds * fps))
+    hours, frames = divmod(frames, 3600 * base)
+    minutes, frames = divmod(frames, 60 * base)
+    secs, frames = divmod(frames, base)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}:{frames:02d}"
+
+def write_edit_decision_list(video_path, active_segments, idle_segments, total_duration, fps, has_audio, output_dir):
+    """导出剪辑决策列表而不编码：JSON、CMX3600 EDL、ffmpeg concat 脚本各一份
+
+    - {stem}_edited.json: 源文件、时长、帧率以及精彩片段和无操作片段
+    - {stem}_edited.edl: CMX3600 格式，可导入剪辑软件继续精剪（非丢帧时间码，录制时间码从 00:00:00:00 开始）
+    - {stem}_edited.ffconcat: concat demuxer 脚本，用 inpoint/outpoint 引用源文件，可在其他机器上渲染
+    三个文件都先写临时文件，全部写完后才替换为正式文件名，中途中断不会留下被当作已完成的半个文件。
+    返回写出的文件路径列表
+    """
+    stem = Path(video_path).stem
+    source_path = os.path.abspath(video_path)
+    base_path = os.path.join(output_dir, f"{stem}_edited")
+    json_path, edl_path, concat_path = (f"{base_path}.json", f"{base_path}.edl", f"{base_path}.ffconcat")
+    partial_paths = {path: partial_output_path(path) for path in (json_path, edl_path, concat_path)}
+
+    success = False
+    try:
+        with open(partial_paths[json_path], 'w', encoding='utf-8') as f:
+            json.dump({
+                'source': source_path,
+                'total_duration': total_duration,
+                'fps': fps,
+                'output_duration': sum(seg['end_time'] - seg['start_time'] for seg in active_segments),
+                'active_segments': active_segments,
+                'idle_segments': idle_segments,
+            }, f, ensure_ascii=False, indent=2)
+
+        track = "B" if has_audio else "V"
+        record_time = 0.0
+        with open(partial_paths[edl_path], 'w', encoding='utf-8') as f:
+            f.write(f"TITLE: {stem}_edited\n")
+            f.write("FCM: NON-DROP FRAME\n\n")
+            for event, segment in enumerate(active_segments, start=1):
+                duration = segment['end_time'] - segment['start_time']
+                f.write(
+                    f"{event:03d}  AX       {track:<5} C        "
+                    f"{format_timecode(segment['start_time'], fps)} {format_timecode(segment['end_time'], fps)} "
+                    f"{format_timecode(record_time, fps)} {format_timecode(record_time + duration, fps)}\n"
+                )
+                f.write(f"* FROM CLIP NAME: {os.path.basename(video_path)}\n\n")
+                record_time += duration
+
+        escaped = source_path.replace("'", "'\\''")
+        with open(partial_paths[concat_path], 'w', encoding='utf-8') as f:
+            f.write("ffconcat version 1.0\n")
+            # 长 GOP 源文件的 inpoint 会从前一个关键帧开始读，需要 concatdec_select 按片段时间裁掉多余的帧
+            f.write(f"# 渲染: ffmpeg -f concat -safe 0 -segment_time_metadata 1 -i \"{os.path.basename(concat_path)}\" "
+                    f"-vf select=concatdec_select -af aselect=concatdec_select,aresample=async=1 "
+                    f"-c:v libx264 -c:a aac \"{stem}_edited.mp4\"\n")
+            for segment in active_segments:
+                f.write(f"file '{escaped}'\n")
+                f.write(f"inpoint {segment['start_time']:.6f}\n")
+                f.write(f"outpoint {segment['end_time']:.6f}\n")
+        success = True
+    finally:
+        for path, partial_path in partial_paths.items():
+            commit_partial_output(partial_path, path, success)
+
+    logger.info(f"已导出剪辑决策列表: {stem}_edited.json/.edl/.ffconcat ({len(active_segments)} 个片段)")
+    return [json_path, edl_path, concat_path]
+
+class ResourceScheduler:
+    """按 CPU 核数预算统一分配并发视频数、分析线程和编码线程，避免各层线程池叠加造成超额订阅
+
+    先确定同时处理的视频数（每个视频至少 MIN_CORES_PER_VIDEO 核），再把每个视频分到的核数
+    在分析进程 × OpenCV/解码线程、编码进程 × x264 线程之间切分。分析和编码在同一视频内先后进行，
+    所以两者各自用满该视频的核数预算。
+    """
+
+    def __init__(self, cpu_count: int = None):
+        self.cpu_count = max(1, int(cpu_count or os.cpu_count() or 1))
+
+    def plan(self, num_videos: int, analysis_workers: int = 1, encode_workers: int = 1,
+             encode_profile: str = "balanced") -> dict:
+        """返回本批任务的资源预算
+
+        encode_workers=0 表示按预算自动分配（每个编码进程单线程，x264 单线程效率最高）
+        """
+        video_workers = max(1, min(num_videos, self.cpu_count // MIN_CORES_PER_VIDEO))
+        cores_per_video = max(1, self.cpu_count // video_workers)
+
+        analysis_workers = max(1, min(int(analysis_workers), cores_per_video))
+        analysis_threads = max(1, cores_per_video // analysis_workers)
+
+        if encode_workers <= 0:
+            encode_workers = cores_per_video
+        encode_workers = max(1, min(int(encode_workers), cores_per_video))
+        encode_threads = max(1, cores_per_video // encode_workers)
+
+        encode_profile = self._check_profile(encode_profile)
+
+        return {
+            'cpu_count': self.cpu_count,
+            'video_workers': video_workers,
+            'cores_per_video': cores_per_video,
+            'analysis_workers': analysis_workers,
+            'analysis_threads': analysis_threads,
+            'encode_workers': encode_workers,
+            'encode_threads': encode_threads,
+            'encode_profile': encode_profile,
+            **ENCODE_PROFILES[encode_profile],
+        }
+
+    def plan_pipeline(self, num_videos: int, analysis_workers: int = 1, encode_workers: int = 1,
+                      encode_profile: str = "balanced") -> dict:
+        """返回两阶段流水线的资源预算
+
+        分析和编码同时进行，核数按 1:3 切分：解码+帧差远比 x264 轻，分析阶段分到四分之一的核。
+        分析进程池大小 = 分析核数 / 每个视频的分析进程数；编码池每个视频至少 MIN_CORES_PER_VIDEO 核。
+        队列容量等于编码池大小，保证每个编码线程都有一个待编码任务，又不会让分析结果无限堆积。
+        """
+        analysis_cores = max(1, self.cpu_count // 4)
+        encode_cores = max(1, self.cpu_count - analysis_cores)
+
+        analysis_workers = max(1, min(int(analysis_workers), analysis_cores))
+        analysis_pool = max(1, min(num_videos, analysis_cores // analysis_workers))
+        analysis_threads = max(1, analysis_cores // (analysis_pool * analysis_workers))
+
+        encode_pool = max(1, min(num_videos, encode_cores // MIN_CORES_PER_VIDEO))
+        cores_per_video = max(1, encode_cores // encode_pool)
+        if encode_workers <= 0:
+            encode_workers = cores_per_video
+        encode_workers = max(1, min(int(encode_workers), cores_per_video))
+        encode_threads = max(1, cores_per_video // encode_workers)
+
+        encode_profile = self._check_profile(encode_profile)
+
+        return {
+            'cpu_count': self.cpu_count,
+            'pipeline': True,
+            'analysis_cores': analysis_cores,
+            'encode_cores': encode_cores,
+            'analysis_pool': analysis_pool,
+            'encode_pool': encode_pool,
+            'queue_size': encode_pool,
+            'video_workers': encode_pool,
+            'cores_per_video': cores_per_video,
+            'analysis_workers': analysis_workers,
+            'analysis_threads': analysis_threads,
+            'encode_workers': encode_workers,
+            'encode_threads': encode_threads,
+            'encode_profile': encode_profile,
+            **ENCODE_PROFILES[encode_profile],
+        }
+
+    @staticmethod
+    def _check_profile(encode_profile):
+        if encode_profile not in ENCODE_PROFILES:
+            logger.warning(f"未知编码档位 {encode_profile}，使用 balanced")
+            return "balanced"
+        return encode_profile
+
+def plan_encode_units(active_segments, num_units, fps, min_unit_duration=10.0):
+    """把精彩片段按输出时长均分成 num_units 个工作单元
+
+    单元边界可以落在片段内部，切点对齐到两帧之间（帧中点），保证每一帧只属于一个单元。
+    每个单元至少 min_unit_duration 秒，总时长不足时减少单元数。返回每个单元的片段列表。
+    """
+    total = sum(seg['end_time'] - seg['start_time'] for seg in active_segments)
+    num_units = max(1, min(int(num_units), int(total // min_unit_duration)))
+    if num_units == 1:
+        return [[{'start_time': seg['start_time'], 'end_time': seg['end_time']} for seg in active_segments]]
+
+    cuts = [total * k / num_units for k in range(1, num_units)]
+    units = [[]]
+    offset = 0.0
+    cut_index = 0
+    for segment in active_segments:
+        start_time, end_time = segment['start_time'], segment['end_time']
+        duration = end_time - start_time
+        while cut_index < len(cuts) and cuts[cut_index] < offset + duration:
+            split_time = segment['start_time'] + (cuts[cut_index] - offset)
+            split_time = (np.floor(split_time * fps) + 0.5) / fps
+            if start_time < split_time < end_time:
+                units[-1].append({'start_time': start_time, 'end_time': float(split_time)})
+                start_time = float(split_time)
+            units.append([])
+            cut_index += 1
+        units[-1].append({'start_time': start_time, 'end_time': end_time})
+        offset += duration
+    return [unit for unit in units if unit]
+
+def probe_keyframe_times(video_path):
+    """读取视频流关键帧时间戳（走持久化关键帧索引）
+
+    返回升序的 numpy 数组，探测失败或没有关键帧时返回 None
+    """
+    times = load_keyframe_index(video_path)
+    if times is None or len(times) == 0:
+        logger.warning(f"未找到关键帧: {os.path.basename(video_path)}")
+        return None
+    return times
+
+def snap_segments_to_keyframes(active_segments, keyframe_times, total_duration):
+    """把精彩片段边界对齐到关键帧，供 -c copy 无损切割
+
+    起点向前对齐到不晚于它的关键帧，终点向后对齐到不早于它的关键帧（之后没有关键帧则延伸到视频结尾），
+    两端都向保留更多精彩内容的一侧取整。对齐后重叠或相接的片段合并为一段。
+    """
+    keyframe_times = np.asarray(keyframe_times, dtype=np.float64)
+    snapped = []
+    for segment in active_segments:
+        start_index = np.searchsorted(keyframe_times, segment['start_time'], side='right') - 1
+        start_time = float(keyframe_times[start_index]) if start_index >= 0 else 0.0
+
+        end_index = np.searchsorted(keyframe_times, segment['end_time'], side='left')
+        end_time = float(keyframe_times[end_index]) if end_index < len(keyframe_times) else float(total_duration)
+        end_time = max(end_time, segment['end_time'])
+
+        if snapped and start_time <= snapped[-1]['end_time']:
+            snapped[-1]['end_time'] = max(snapped[-1]['end_time'], end_time)
+        else:
+            snapped.append({'start_time': start_time, 'end_time': end_time})
+    return snapped
+
+def probe_video_codec(video_path):
+    """读取视频流的编码参数，供 smart 模式重编码边界 GOP 时与源视频保持一致
+
+    源编码不在 SMART_RENDER_CODECS 中或探测失败时返回 None
+    """
+    info = probe_video(video_path)
+    if info is None or info['source'] != 'ffprobe':
+        logger.warning(f"编码参数探测失败: {os.path.basename(video_path)}")
+        return None
+
+    codec_name = info['video_codec']
+    if codec_name not in SMART_RENDER_CODECS:
+        logger.warning(f"smart 模式不支持该编码: {codec_name}")
+        return None
+
+    encoder, bsf = SMART_RENDER_CODECS[codec_name]
+    profile = (info['profile'] or '').lower()
+    if codec_name == 'h264' and profile in ('baseline', 'constrained baseline', 'main', 'high'):
+        profile = 'baseline' if 'baseline' in profile else profile
+    else:
+        profile = None
+
+    return {
+        'codec_name': codec_name,
+        'encoder': encoder,
+        'bsf': bsf,
+        'profile': profile,
+        'pix_fmt': info['pix_fmt'],
+        'fps': info['fps'],
+        'timescale': info['timescale'],
+    }
+
+def plan_smart_render(active_segments, keyframe_times, fps):
+    """把精彩片段拆成 smart 模式的切割计划
+
+    每个片段内第一个关键帧之前和最后一个关键帧之后的不完整 GOP 重新编码，中间完整的 GOP 直接复制；
+    片段内不含两个关键帧时整段重新编码。返回 [{'start_time', 'end_time', 'mode': 'encode'|'copy'}]
+    """
+    keyframe_times = np.asarray(keyframe_times, dtype=np.float64)
+    tolerance = 0.5 / fps
+    pieces = []
+    for segment in active_segments:
+        start_time, end_time = segment['start_time'], segment['end_time']
+        first = np.searchsorted(keyframe_times, start_time - tolerance, side='left')
+        last = np.searchsorted(keyframe_times, end_time + tolerance, side='right') - 1
+
+        if first >= len(keyframe_times) or last < 0 or keyframe_times[first] >= keyframe_times[last]:
+            pieces.append({'start_time': start_time, 'end_time': end_time, 'mode': 'encode'})
+            continue
+
+        copy_start, copy_end = float(keyframe_times[first]), float(keyframe_times[last])
+        if copy_end >= end_time - tolerance:
+            copy_end = end_time
+        if copy_start - start_time > tolerance:
+            pieces.append({'start_time': start_time, 'end_time': copy_start, 'mode': 'encode'})
+        pieces.append({'start_time': copy_start, 'end_time': copy_end, 'mode': 'copy'})
+        if end_time - copy_end > tolerance:
+            pieces.append({'start_time': copy_end, 'end_time': end_time, 'mode': 'encode'})
+    return pieces
+
+def probe_batch_jobs(video_files):
+    """批处理前探测每个视频的时长和大小，作为任务耗时的估计
+
+    只读取容器头信息，不解码（结果进入 probe_video 缓存，后续阶段直接复用）。
+    读不到时长的文件按其他文件的平均码率由文件大小折算。
+    """
+    jobs = []
+    for video_path in video_files:
+        info = probe_video(video_path)
+        jobs.append({
+            'video_path': video_path,
+            'duration': info['duration'] if info is not None else 0.0,
+            'size': file_identity(video_path)[0],
+        })
+
+    known = [job for job in jobs if job['duration'] > 0]
+    bytes_per_second = (sum(job['size'] for job in known) / sum(job['duration'] for job in known)) if known else 0
+    for job in jobs:
+        if job['duration'] > 0:
+            job['cost'] = job['duration']
+        else:
+            job['cost'] = job['size'] / bytes_per_second if bytes_per_second > 0 else job['size'] / 1e6
+    return jobs
+
+def simulate_makespan(costs, num_workers):
+    """按提交顺序模拟贪心列表调度：每个任务交给当前最先空闲的工作者，返回总完成时间"""
+    loads = [0.0] * max(1, num_workers)
+    for cost in costs:
+        heapq.heapreplace(loads, loads[0] + cost)
+    return max(loads)
+
+def plan_batch_order(jobs, num_workers, batch_order="longest_first"):
+    """确定批处理的提交顺序，并给出计划 makespan（单位与任务耗时估计相同，即视频秒）
+
+    longest_first 即 LPT 调度，总完成时间不超过最优值的 4/3；
+    quick_first 先提交最短的一个视频，其余仍按最长优先。
+    计划值是视频秒，不能直接与实际耗时（墙钟秒）比较；schedule_efficiency 为下界/计划，衡量排序本身的好坏
+    """
+    if batch_order == "as_found":
+        ordered = list(jobs)
+    else:
+        ordered = sorted(jobs, key=lambda job: job['cost'], reverse=True)
+        if batch_order == "quick_first" and ordered:
+            ordered.insert(0, ordered.pop())
+
+    costs = [job['cost'] for job in ordered]
+    total_cost = sum(costs)
+    plan = {
+        'order': batch_order,
+        'num_workers': num_workers,
+        'total_cost': total_cost,
+        'planned_makespan': simulate_makespan(costs, num_workers),
+        'lower_bound': max(max(costs, default=0.0), total_cost / max(1, num_workers)),
+    }
+    plan['schedule_efficiency'] = plan['lower_bound'] / plan['planned_makespan'] if plan['planned_makespan'] > 0 else 1.0
+    return ordered, plan
+
+def _analyze_video_job(video_path, analysis_settings, budget):
+    """流水线分析阶段在子进程（不能 fork 时为线程池）中执行的任务：新建节点实例完成运动检测，返回编码任务（失败返回 None）"""
+    job_start = time.perf_counter()
+
+    # 子进程按随任务传入的清单项补上扫描登记；在主进程的线程池中运行时登记已存在，不能在结束时移除
+    manifest = [item for item in analysis_settings.get('manifest', []) if item['path'] == video_path]
+    if not _IN_ANALYSIS_WORKER:
+        manifest = []
+    remember_file_stats(manifest)
+
+    node = GameVideoAutoEditNode()
+    node.min_segment_duration = analysis_settings['min_segment_duration']
+    node.score_cache = MotionScoreCache() if analysis_settings['use_score_cache'] else None
+    node.resource_budget = budget
+
+    try:
+        job = node.analyze_video(
+            video_path,
+            analysis_settings['idle_threshold'],
+            analysis_settings['pixel_threshold'],
+            analysis_settings['preserve_buffer'],
+            analysis_settings['analysis_backend'],
+            analysis_settings['analysis_fps'],
+            budget['analysis_workers'],
+            analysis_settings.get('snap_to_keyframes', False),
+        )
+    finally:
+        forget_file_stats(manifest)
+    if job is not None:
+        job['analysis_seconds'] = time.perf_counter() - job_start
+    return job
+
+def _parse_float_list(text: str) -> list:
+    """解析逗号/空格分隔的数值列表"""
+    values = []
+    for item in str(text).replace("，", ",").replace(" ", ",").split(","):
+        item = item.strip()
+        if item:
+            values.append(float(item))
+    return values
+
+# 剪辑参数的输入定义，批量剪辑节点和监视文件夹节点共用，保证两边的取值范围一致
+EDIT_PARAM_INPUTS = {
+    "idle_threshold": ("FLOAT", {"default": 0.015, "min": 0.005, "max": 0.1, "step": 0.005, "tooltip": "无操作检测阈值 (0.005-0.1，值越小越敏感)"}),
+    "min_segment_duration": ("FLOAT", {"default": 3.0, "min": 1.0, "max": 30.0, "step": 0.5, "tooltip": "最小无操作片段时长（秒），短于此时长的片段将被保留"}),
+    "pixel_threshold": ("INT", {"default": 40, "min": 20, "max": 100, "step": 5, "tooltip": "像素差异阈值 (20-100，用于过滤鼠标移动等微小变化)"}),
+    "preserve_buffer": ("FLOAT", {"default": 1.0, "min": 0.0, "max": 5.0, "step": 0.5, "tooltip": "保留缓冲时间（秒），在无操作片段前后保留的时间"}),
+    "analysis_fps": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 60.0, "step": 1.0, "tooltip": "分析采样帧率（0=逐帧分析）。60fps录像按5-10fps采样可大幅加快分析"}),
+    "edit_mode": (EDIT_MODES, {"default": "encode", "tooltip": "剪辑模式：encode=重新编码，剪辑点逐帧精确；copy=按关键帧无损切割，不重新编码，速度主要取决于磁盘；smart=只重编码剪辑点所在的GOP，逐帧精确且接近copy速度；edl=不编码，只导出JSON/EDL/ffmpeg concat剪辑列表"}),
+}
+
 class GameVideoAutoEditNode:
     """
     游戏视频自动剪辑节点
@@ -85,12 +1951,27 @@ class GameVideoAutoEditNode:
             "required": {
                 "input_folder": ("STRING", {"default": "", "tooltip": "输入视频文件夹路径（支持相对路径和绝对路径）"}),
                 "output_folder_prefix": ("STRING", {"default": "game_auto_edit", "tooltip": "输出文件夹前缀"}),
-                "idle_threshold": ("FLOAT", {"default": 0.015, "min": 0.005, "max": 0.1, "step": 0.005, "tooltip": "无操作检测阈值 (0.005-0.1，值越小越敏感)"}),
-                "min_segment_duration": ("FLOAT", {"default": 3.0, "min": 1.0, "max": 30.0, "step": 0.5, "tooltip": "最小无操作片段时长（秒），短于此时长的片段将被保留"}),
-                "pixel_threshold": ("INT", {"default": 40, "min": 20, "max": 100, "step": 5, "tooltip": "像素差异阈值 (20-100，用于过滤鼠标移动等微小变化)"}),
+                "idle_threshold": EDIT_PARAM_INPUTS["idle_threshold"],
+                "min_segment_duration": EDIT_PARAM_INPUTS["min_segment_duration"],
+                "pixel_threshold": EDIT_PARAM_INPUTS["pixel_threshold"],
             },
             "optional": {
-                "preserve_buffer": ("FLOAT", {"default": 1.0, "min": 0.0, "max": 5.0, "step": 0.5, "tooltip": "保留缓冲时间（秒），在无操作片段前后保留的时间"}),
+                "preserve_buffer": EDIT_PARAM_INPUTS["preserve_buffer"],
+                "analysis_backend": (ANALYSIS_BACKENDS, {"default": "opencv", "tooltip": "运动分析后端：opencv=全分辨率解码后缩放；ffmpeg=解码端直接输出小尺寸灰度帧（高分辨率视频更快）"}),
+                "analysis_fps": EDIT_PARAM_INPUTS["analysis_fps"],
+                "analysis_workers": ("INT", {"default": 1, "min": 1, "max": 32, "step": 1, "tooltip": "单个视频的并行分析进程数（1=顺序分析）。长视频按时间切分后多进程分析，结果与顺序分析一致"}),
+                "use_score_cache": ("BOOLEAN", {"default": True, "tooltip": "缓存每个视频的原始运动分数。只调整 idle_threshold / min_segment_duration / preserve_buffer 时无需重新解码"}),
+                "streaming_edit": ("BOOLEAN", {"default": False, "tooltip": "边分析边剪辑：确定一个精彩片段就开始编码，分析结束后无损拼接"}),
+                "encode_workers": ("INT", {"default": 1, "min": 0, "max": 32, "step": 1, "tooltip": "encode模式下单个视频的并行编码进程数（1=单进程，0=按CPU预算自动分配）。精彩片段按时长均分后各自编码再无损拼接"}),
+                "encode_profile": (list(ENCODE_PROFILES), {"default": "balanced", "tooltip": "编码档位：balanced=medium预设；throughput=veryfast预设，批量出片优先速度；quality=slow预设，优先画质"}),
+                "batch_order": (BATCH_ORDERS, {"default": "longest_first", "tooltip": "批处理顺序：longest_first=最长的视频先处理，缩短整批耗时；quick_first=先处理最短的视频，尽快检查参数效果；as_found=按扫描顺序"}),
+                "edit_mode": EDIT_PARAM_INPUTS["edit_mode"],
+                "recursive": ("BOOLEAN", {"default": False, "tooltip": "是否扫描子文件夹，输出目录保持相同的子文件夹结构"}),
+                "include_patterns": ("STRING", {"default": "", "tooltip": "只处理匹配的文件，逗号分隔的通配符，匹配文件名或相对路径，如 *.mp4, 2024*/*。留空处理全部视频"}),
+                "exclude_patterns": ("STRING", {"default": "", "tooltip": "跳过匹配的文件或子文件夹，逗号分隔的通配符，如 *_edited*, backup"}),
+                "resume_batch": ("BOOLEAN", {"default": False, "tooltip": "可续跑批处理：输出到固定目录（输出前缀同名文件夹）并记录处理清单，重跑时跳过文件未变且参数相同的已完成视频"}),
+                "input_staging": (INPUT_STAGING_MODES, {"default": "direct", "tooltip": "输入暂存方式：direct=直接按原路径处理；link=在输入目录内用硬链接/reflink暂存，处理期间源文件被移动、删除或被重命名替换也不受影响（硬链接共享数据，原地覆盖写入仍会影响）。无法零拷贝暂存时直接报错，不会复制文件"}),
+                "shared_queue_dir": ("STRING", {"default": "", "tooltip": "多机分布式处理：填写各渲染机都能访问的共享目录，输出和任务队列放在 共享目录/输出前缀 下。各机器运行同一工作流即可共同领取任务，最后返回合并报告。留空=单机处理"}),
             }
         }
 
@@ -103,129 +1984,233 @@ class GameVideoAutoEditNode:
         self.processed_count = 0
         self.total_idle_time_removed = 0.0
         self.analysis_results = []
+        self.score_cache = None
+        self.resource_budget = None
+        self.pipeline_stats = None
+        self.batch_plan = None
+        self.output_subdirs = {}
+        self.batch_manifest = None
+        self.batch_params_hash = None
+        self.batch_items = {}
+        self.skipped_count = 0
+        self.queue_stats = None
+
+    def encode_settings(self, threads=None):
+        """当前资源预算下的 x264 编码参数；未设置预算时保持 ffmpeg 默认线程数"""
+        budget = self.resource_budget or {}
+        settings = dict(ENCODE_PROFILES[budget.get('encode_profile', 'balanced')])
+        threads = threads or budget.get('encode_threads')
+        if threads:
+            settings['threads'] = threads
+        return settings
+
+    def analysis_threads(self):
+        """当前资源预算下每个分析进程的解码线程数，0 表示不限制"""
+        return (self.resource_budget or {}).get('analysis_threads', 0)
+
+    def detect_motion_simple(self, video_path, idle_threshold=0.015, pixel_threshold=40, analysis_backend="opencv",
+                             analysis_fps=0.0, analysis_workers=1):
+        """简化的运动检测算法
+
+        analysis_backend:
+            - "opencv": cv2.VideoCapture 全分辨率解码后在 Python 中缩放、转灰度
+            - "ffmpeg": 由 ffmpeg 在解码端完成缩放和灰度转换，通过 rawvideo 管道读取小尺寸灰度帧
+        analysis_fps:
+            分析采样帧率，0 表示逐帧分析。跳过的帧只 grab() 不解码，
+            采样帧之间的帧差会展开回逐帧分数，保证时间戳与逐帧分析一致
+        analysis_workers:
+            单个视频的分析进程数。大于 1 时把视频按帧区间切分，在进程池中并行分析后拼接，
+            结果与顺序分析完全一致
+        """
+        motion_scores, fps = self.compute_motion_scores(
+            video_path, pixel_threshold, analysis_backend, analysis_fps, analysis_workers
+        )
+        if motion_scores is None:
+            return None, None
 
-    def detect_motion_simple(self, video_path, idle_threshold=0.015, pixel_threshold=40):
-        """简化的运动检测算法"""
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            logger.error(f"无法打开视频文件: {video_path}")
+        # 原位平滑：原始分数已写入缓存，不再需要，平滑结果直接覆盖同一个缓冲区
+        smoothed_scores = self.smooth_motion_scores(motion_scores, out=motion_scores)
+
+        # 检测无操作片段
+        idle_segments = self.detect_idle_segments(smoothed_scores, fps, idle_threshold, self.min_segment_duration)
+
+        return smoothed_scores, idle_segments
+
+    def compute_motion_scores(self, video_path, pixel_threshold=40, analysis_backend="opencv",
+                              analysis_fps=0.0, analysis_workers=1):
+        """计算逐帧原始运动分数（未平滑），返回 (分数数组, fps)
+
+        启用 self.score_cache 时，相同文件和分析参数的结果直接从磁盘缓存读取
+        """
+        info = probe_video(video_path)
+        if info is None:
             return None, None
 
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = info['fps']
+        total_frames = info['frame_count']
 
         if fps <= 0 or total_frames <= 0:
             logger.error(f"视频参数异常: fps={fps}, frames={total_frames}")
-            cap.release()
             return None, None
 
-        logger.info(f"开始分析视频: {os.path.basename(video_path)} (FPS:{fps:.1f}, 帧数:{total_frames})")
+        stride = self.analysis_stride(fps, analysis_fps)
 
-        prev_frame = None
-        motion_scores = []
-        frame_count = 0
-
-        # 处理进度显示间隔
-        progress_interval = max(1, total_frames // 20)
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        cache_params = self.score_cache_params(pixel_threshold, analysis_backend, stride)
+        if self.score_cache is not None:
+            cached_scores = self.score_cache.get(video_path, cache_params)
+            if cached_scores is not None:
+                logger.info(f"命中运动分数缓存: {os.path.basename(video_path)} ({len(cached_scores)} 帧)")
+                return cached_scores.astype(np.float32, copy=False), fps
 
-            # 降采样加速处理
-            small_frame = cv2.resize(frame, (320, 240))
-            gray = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
+        logger.info(f"开始分析视频: {os.path.basename(video_path)} (FPS:{fps:.1f}, 帧数:{total_frames}, 后端:{analysis_backend}, 采样间隔:{stride}帧)")
 
-            if prev_frame is not None:
-                # 计算帧差
-                diff = cv2.absdiff(prev_frame, gray)
+        chunks = plan_analysis_chunks(total_frames, analysis_workers, stride)
+        if len(chunks) > 1 and not _IN_ANALYSIS_WORKER:
+            motion_scores, frames_seen = self._motion_scores_parallel(
+                video_path, pixel_threshold, analysis_backend, stride, total_frames, fps, chunks
+            )
+        else:
+            motion_scores, frames_seen = analyze_frame_range(
+                video_path, pixel_threshold, analysis_backend, stride, total_frames=total_frames, fps=fps,
+                decode_threads=self.analysis_threads()
+            )
 
-                # 统计显著变化的像素
-                changed_pixels = np.sum(diff > pixel_threshold)
-                total_pixels = gray.shape[0] * gray.shape[1]
-                change_ratio = changed_pixels / total_pixels
+        if len(motion_scores) == 0:
+            logger.error("未能提取运动分数")
+            return None, None
 
-                # 记录运动分数
-                motion_scores.append(change_ratio)
+        # 末尾不足一个采样间隔的帧沿用最后一个分数
+        motion_scores.pad_to(frames_seen - 1)
+        motion_scores = motion_scores.array()
 
-            prev_frame = gray.copy()
-            frame_count += 1
+        logger.info(f"运动检测完成，共分析 {len(motion_scores)} 帧")
 
-            # 显示进度
-            if frame_count % progress_interval == 0:
-                progress = (frame_count / total_frames) * 100
-                logger.info(f"分析进度: {progress:.1f}% ({frame_count}/{total_frames})")
+        if self.score_cache is not None:
+            self.score_cache.put(video_path, cache_params, motion_scores)
 
-        cap.release()
+        return motion_scores, fps
 
-        if not motion_scores:
-            logger.error("未能提取运动分数")
-            return None, None
+    @staticmethod
+    def score_cache_params(pixel_threshold, analysis_backend, stride):
+        """影响原始运动分数的分析参数（作为分数缓存键的一部分）"""
+        return {
+            'pixel_threshold': int(pixel_threshold),
+            'analysis_size': [ANALYSIS_WIDTH, ANALYSIS_HEIGHT],
+            'analysis_backend': analysis_backend,
+            'stride': stride,
+        }
 
-        logger.info(f"运动检测完成，共分析 {len(motion_scores)} 帧")
+    @staticmethod
+    def analysis_stride(fps, analysis_fps):
+        """根据视频帧率和分析采样帧率计算采样间隔（帧）"""
+        if not analysis_fps or analysis_fps <= 0 or analysis_fps >= fps:
+            return 1
+        return max(1, int(round(fps / analysis_fps)))
 
-        # 应用平滑
-        smoothed_scores = self.smooth_motion_scores(motion_scores)
+    def _motion_scores_parallel(self, video_path, pixel_threshold, analysis_backend, stride, total_frames, fps, chunks):
+        """在进程池（不能 fork 时为线程池）中并行分析各帧区间，并按顺序拼接分数；进程池崩溃时回退到顺序分析"""
+        logger.info(f"并行分析: {len(chunks)} 个区间")
 
-        # 检测无操作片段
-        idle_segments = self.detect_idle_segments(smoothed_scores, fps, idle_threshold, self.min_segment_duration)
+        decode_threads = self.analysis_threads()
 
-        return smoothed_scores, idle_segments
+        # 每个分析进程的 OpenCV 线程池也按预算限制
+        try:
+            with analysis_executor(analyze_frame_range, len(chunks), decode_threads) as executor:
+                futures = [
+                    executor.submit(
+                        analyze_frame_range, video_path, pixel_threshold, analysis_backend, stride,
+                        start_frame, end_frame, total_frames, fps, False, decode_threads=decode_threads
+                    )
+                    for start_frame, end_frame in chunks
+                ]
+                results = [future.result() for future in futures]
+        except BrokenProcessPool as e:
+            logger.warning(f"分析进程池异常退出，回退到顺序分析: {e}")
+            return analyze_frame_range(
+                video_path, pixel_threshold, analysis_backend, stride, total_frames=total_frames, fps=fps,
+                decode_threads=decode_threads
+            )
 
-    def smooth_motion_scores(self, scores, window_size=3):
-        """平滑运动分数"""
+        motion_scores = ScoreBuffer(total_frames)
+        frames_seen = 0
+        for (start_frame, end_frame), (chunk_scores, chunk_frames_seen) in zip(chunks, results):
+            if end_frame is not None and len(chunk_scores) != end_frame - start_frame:
+                # 容器帧数不可信（提前到达文件末尾或 seek 不准），回退到顺序分析
+                logger.warning(f"区间 {start_frame}-{end_frame} 分析结果不完整，回退到顺序分析")
+                return analyze_frame_range(
+                    video_path, pixel_threshold, analysis_backend, stride, total_frames=total_frames, fps=fps,
+                    decode_threads=decode_threads
+                )
+            motion_scores.extend(chunk_scores.array())
+            frames_seen = chunk_frames_seen
+
+        return motion_scores, frames_seen
+
+    def smooth_motion_scores(self, scores, window_size=3, out=None, block_frames=SMOOTH_BLOCK_FRAMES):
+        """平滑运动分数
+
+        居中滑动平均，边缘处窗口截断为实际可用的帧数。
+        结果写入 out（默认新建一个同类型数组）；out 可以就是 scores 本身，原位平滑不再分配第二份整段数组。
+        按 block_frames 分块计算，每块只复制本块及两侧 window_size//2 帧的原始分数
+        """
         if len(scores) < window_size:
             return scores
 
-        smoothed = []
-        for i in range(len(scores)):
-            start = max(0, i - window_size // 2)
-            end = min(len(scores), i + window_size // 2 + 1)
-            avg_score = np.mean(scores[start:end])
-            smoothed.append(avg_score)
-
-        return smoothed
+        scores = np.asarray(scores)
+        if out is None:
+            out = np.empty_like(scores)
+        n = len(scores)
+        half = window_size // 2
+        block_frames = max(block_frames, half)
+
+        # carry 保存当前块左侧 half 帧的原始分数（原位计算时它们已被上一块覆盖）
+        carry = scores[:0].copy()
+        for start in range(0, n, block_frames):
+            stop = min(n, start + block_frames)
+            window = np.concatenate((carry, scores[start:min(n, stop + half)]))
+            lo = start - len(carry)
+            carry = window[max(lo, stop - half) - lo:stop - lo].copy()
+
+            # 错位累加求窗口和（与整段计算的累加顺序相同，浮点结果一致）
+            block = window[start - lo:stop - lo].copy()
+            for k in range(1, half + 1):
+                right_stop = min(stop, n - k)
+                block[:right_stop - start] += window[start + k - lo:right_stop + k - lo]
+                left_start = max(start, k)
+                block[left_start - start:] += window[left_start - k - lo:stop - k - lo]
+            out[start:stop] = block
+
+        # 中间部分窗口完整，边缘部分除以实际参与平均的帧数
+        out[half:n - half] /= 2 * half + 1
+        for i in list(range(min(half, n))) + list(range(max(half, n - half), n)):
+            out[i] /= min(n, i + half + 1) - max(0, i - half)
+
+        return out
 
     def detect_idle_segments(self, motion_scores, fps, idle_threshold, min_duration):
         """检测无操作片段"""
-        segments = []
-        start_frame = None
-
-        for i, score in enumerate(motion_scores):
-            is_idle = score < idle_threshold
-
-            if is_idle and start_frame is None:
-                start_frame = i
-            elif not is_idle and start_frame is not None:
-                # 计算片段时长
-                duration = (i - start_frame) / fps
-                if duration >= min_duration:
-                    segments.append({
-                        'start_frame': start_frame,
-                        'end_frame': i,
-                        'start_time': start_frame / fps,
-                        'end_time': i / fps,
-                        'duration': duration
-                    })
-                start_frame = None
+        # 游程编码得到所有连续无操作区间，只保留时长达标的
+        starts, ends = find_idle_runs(np.asarray(motion_scores) < idle_threshold)
+        durations = (ends - starts) / fps
+        keep = durations >= min_duration
 
-        # 处理视频结尾的无操作片段
-        if start_frame is not None:
-            duration = (len(motion_scores) - start_frame) / fps
-            if duration >= min_duration:
-                segments.append({
-                    'start_frame': start_frame,
-                    'end_frame': len(motion_scores),
-                    'start_time': start_frame / fps,
-                    'end_time': len(motion_scores) / fps,
-                    'duration': duration
-                })
+        segments = []
+        for start_frame, end_frame, duration in zip(starts[keep].tolist(), ends[keep].tolist(), durations[keep].tolist()):
+            segments.append({
+                'start_frame': start_frame,
+                'end_frame': end_frame,
+                'start_time': start_frame / fps,
+                'end_time': end_frame / fps,
+                'duration': duration
+            })
 
         return segments
 
-    def create_active_segments(self, idle_segments, total_duration, preserve_buffer=1.0):
-        """根据无操作片段创建精彩片段列表"""
+    def create_active_segments(self, idle_segments, total_duration, preserve_buffer=1.0, keyframe_times=None):
+        """根据无操作片段创建精彩片段列表
+
+        传入 keyframe_times（关键帧索引）时，片段边界向外对齐到关键帧，可直接用于 -c copy 切割
+        """
         active_segments = []
 
         if not idle_segments:
@@ -255,169 +2240,970 @@ class GameVideoAutoEditNode:
                 'end_time': total_duration
             })
 
+        if keyframe_times is not None and len(keyframe_times) > 0:
+            active_segments = snap_segments_to_keyframes(active_segments, keyframe_times, total_duration)
+
         return active_segments
 
-    def edit_video_segments(self, video_path, active_segments, output_path):
+    def sweep_segmentation_params(self, motion_scores, fps, total_duration,
+                                  idle_thresholds, min_durations, preserve_buffers):
+        """对一组原始运动分数批量评估多组剪辑参数
+
+        对分数数组只做一次平滑和一次按阈值广播的游程编码，每组参数的统计结果
+        与 detect_idle_segments + create_active_segments 的逻辑一致。
+        返回每组参数的统计字典列表。
+        """
+        smoothed = np.asarray(self.smooth_motion_scores(motion_scores), dtype=np.float64)
+        thresholds = np.asarray(idle_thresholds, dtype=np.float64)
+
+        # (阈值数, 帧数) 的无操作掩码，一次游程编码得到所有阈值下的无操作片段
+        run_rows, run_starts, run_ends = find_idle_runs(smoothed[None, :] < thresholds[:, None])
+        run_start_times = run_starts / fps
+        run_end_times = run_ends / fps
+        run_durations = (run_ends - run_starts) / fps
+
+        results = []
+        for row, idle_threshold in enumerate(thresholds):
+            in_row = run_rows == row
+            row_start_times = run_start_times[in_row]
+            row_end_times = run_end_times[in_row]
+            row_durations = run_durations[in_row]
+
+            for min_duration in min_durations:
+                keep = row_durations >= min_duration
+                idle_starts = row_start_times[keep]
+                idle_ends = row_end_times[keep]
+                total_idle_time = float(row_durations[keep].sum())
+                active_time = total_duration - total_idle_time
+
+                for preserve_buffer in preserve_buffers:
+                    active_count, output_duration = self._sweep_active_segments(
+                        idle_starts, idle_ends, total_duration, preserve_buffer
+                    )
+                    results.append({
+                        'idle_threshold': float(idle_threshold),
+                        'min_segment_duration': float(min_duration),
+                        'preserve_buffer': float(preserve_buffer),
+                        'idle_segments_count': int(keep.sum()),
+                        'total_idle_time': total_idle_time,
+                        'active_time': active_time,
+                        'compression_ratio': (active_time / total_duration * 100) if total_duration > 0 else 0,
+                        'active_segments_count': active_count,
+                        'output_duration': output_duration,
+                    })
+
+        return results
+
+    @staticmethod
+    def _sweep_active_segments(idle_starts, idle_ends, total_duration, preserve_buffer):
+        """create_active_segments 的向量化版本，只返回 (精彩片段数, 精彩片段总时长)"""
+        if len(idle_starts) == 0:
+            return 1, float(total_duration)
+
+        # 每个无操作片段之前的精彩片段起点：上一个无操作片段结束 + 缓冲
+        current_times = np.empty(len(idle_starts), dtype=np.float64)
+        current_times[0] = 0
+        current_times[1:] = np.minimum(total_duration, idle_ends[:-1] + preserve_buffer)
+        segment_ends = np.maximum(current_times, idle_starts - preserve_buffer)
+        keep = segment_ends > current_times + 0.5  # 至少0.5秒的片段
+
+        active_count = int(keep.sum())
+        output_duration = float((segment_ends[keep] - current_times[keep]).sum())
+
+        # 最后一个精彩片段
+        last_start = min(total_duration, idle_ends[-1] + preserve_buffer)
+        if last_start < total_duration - 0.5:
+            active_count += 1
+            output_duration += total_duration - last_start
+
+        return active_count, output_duration
+
+    def edit_video_segments(self, video_path, active_segments, output_path, edit_mode="encode", total_duration=None,
+                            encode_workers=1):
         """根据精彩片段剪辑视频"""
         if not active_segments:
             logger.warning(f"没有精彩片段，跳过: {os.path.basename(video_path)}")
             return False
 
+        if edit_mode == "copy":
+            if total_duration is None:
+                total_duration = active_segments[-1]['end_time']
+            keyframe_times = probe_keyframe_times(video_path)
+            if keyframe_times is not None:
+                snapped_segments = snap_segments_to_keyframes(active_segments, keyframe_times, total_duration)
+                kept = sum(seg['end_time'] - seg['start_time'] for seg in active_segments)
+                snapped_kept = sum(seg['end_time'] - seg['start_time'] for seg in snapped_segments)
+                logger.info(f"关键帧对齐: {len(active_segments)} -> {len(snapped_segments)} 个片段, 保留时长 {kept:.1f}s -> {snapped_kept:.1f}s")
+                fps = probe_video(video_path)['fps']
+                if self.copy_video_segments(video_path, snapped_segments, output_path, fps if fps > 0 else None):
+                    return True
+            logger.warning(f"无损切割不可用，改为重新编码: {os.path.basename(video_path)}")
+
+        elif edit_mode == "smart":
+            keyframe_times = probe_keyframe_times(video_path)
+            codec_info = probe_video_codec(video_path) if keyframe_times is not None else None
+            if codec_info is not None and codec_info['fps'] > 0:
+                has_audio = self.detect_audio(video_path)
+                if self.smart_render_segments(video_path, active_segments, output_path,
+                                              keyframe_times, codec_info, has_audio):
+                    return True
+            logger.warning(f"smart 模式不可用，改为重新编码: {os.path.basename(video_path)}")
+
         try:
             logger.info(f"开始剪辑: {os.path.basename(video_path)} -> {os.path.basename(output_path)}")
             logger.info(f"精彩片段数: {len(active_segments)}")
 
             # 检测音频
-            has_audio = False
-            try:
-                probe = ffmpeg.probe(video_path)
-                audio_streams = [s for s in probe['streams'] if s.get('codec_type') == 'audio']
-                has_audio = len(audio_streams) > 0
-                logger.info(f"音频检测: {'有音频' if has_audio else '无音频'}")
-            except:
-                logger.warning("音频检测失败，按无音频处理")
+            has_audio = self.detect_audio(video_path)
+
+            if encode_workers > 1:
+                fps = probe_video(video_path)['fps']
+                if fps > 0 and len(plan_encode_units(active_segments, encode_workers, fps)) > 1:
+                    return self.encode_segments_parallel(video_path, active_segments, output_path,
+                                                         has_audio, encode_workers, fps)
 
             # 如果只有一个片段，直接剪辑
             if len(active_segments) == 1:
-                segment = active_segments[0]
-                duration = segment['end_time'] - segment['start_time']
+                self.encode_segment(video_path, active_segments[0], output_path, has_audio)
 
-                input_stream = ffmpeg.input(video_path, ss=segment['start_time'], t=duration)
+            else:
+                # 多个片段：只打开一次输入，用 select/aselect 表达式挑出所有片段再重排时间戳，
+                # 解码器和文件句柄数量不随片段数增长；重排后的时间戳已连续，passthrough 避免按帧率补帧/丢帧
+                select_expr = build_segment_select_expr(active_segments)
+                input_stream = ffmpeg.input(video_path)
+                joined_video = (
+                    input_stream.video
+                    .filter('select', select_expr)
+                    .filter('setpts', 'N/FRAME_RATE/TB')
+                )
 
                 if has_audio:
-                    video_stream = input_stream.video
-                    audio_stream = input_stream.audio
+                    joined_audio = (
+                        input_stream.audio
+                        .filter('aselect', select_expr)
+                        .filter('asetpts', 'N/SR/TB')
+                    )
                     output_stream = ffmpeg.output(
-                        video_stream, audio_stream, output_path,
-                        vcodec='libx264', acodec='aac',
-                        preset='medium', crf=23
+                        joined_video, joined_audio, output_path,
+                        vcodec='libx264', acodec='aac', vsync='passthrough',
+                        **self.encode_settings()
                     )
                 else:
-                    video_stream = input_stream.video
                     output_stream = ffmpeg.output(
-                        video_stream, output_path,
-                        vcodec='libx264', preset='medium', crf=23
+                        joined_video, output_path,
+                        vcodec='libx264', vsync='passthrough', **self.encode_settings()
                     )
 
                 ffmpeg.run(output_stream, overwrite_output=True, quiet=True)
 
-            else:
-                # 多个片段需要合并
-                input_streams = []
+            logger.info(f"剪辑完成: {os.path.basename(output_path)}")
+            return True
+
+        except Exception as e:
+            logger.error(f"剪辑失败: {os.path.basename(video_path)} | 错误: {e}")
+            return False
 
-                # 为每个片段创建输入流
-                for i, segment in enumerate(active_segments):
-                    duration = segment['end_time'] - segment['start_time']
-                    input_stream = ffmpeg.input(video_path, ss=segment['start_time'], t=duration)
-                    input_streams.append(input_stream)
+    def copy_video_segments(self, video_path, segments, output_path, fps=None):
+        """按已对齐关键帧的片段用 -c copy 切割，再用 concat demuxer 拼接，全程不重新编码
 
-                # 合并所有片段
-                if has_audio:
-                    # 提取视频和音频流
-                    video_streams = [stream.video for stream in input_streams]
-                    audio_streams = [stream.audio for stream in input_streams]
+        有 B 帧时仅按 -t 截断会多带出几帧引用下一个 GOP 的帧，已知 fps 时再按帧数限制视频流。
+        """
+        logger.info(f"开始无损切割: {os.path.basename(video_path)} -> {os.path.basename(output_path)}")
 
-                    # 连接流
-                    joined_video = ffmpeg.filter(video_streams, 'concat', n=len(video_streams), v=1, a=0)
-                    joined_audio = ffmpeg.filter(audio_streams, 'concat', n=len(audio_streams), v=0, a=1)
+        parts_dir = tempfile.mkdtemp(prefix=".copy_parts_", dir=os.path.dirname(output_path) or None)
+        try:
+            part_paths = []
+            for i, segment in enumerate(segments):
+                part_path = os.path.join(parts_dir, f"part_{i:05d}.mp4")
+                duration = segment['end_time'] - segment['start_time']
+                output_kwargs = {'c': 'copy', 'avoid_negative_ts': 'make_zero'}
+                if fps:
+                    output_kwargs['frames:v'] = int(round(duration * fps))
+                (
+                    ffmpeg
+                    .input(video_path, ss=segment['start_time'], t=duration)
+                    .output(part_path, **output_kwargs)
+                    .run(overwrite_output=True, quiet=True)
+                )
+                part_paths.append(part_path)
+
+            concat_video_parts(part_paths, output_path)
+            logger.info(f"剪辑完成: {os.path.basename(output_path)}")
+            return True
 
-                    output_stream = ffmpeg.output(
-                        joined_video, joined_audio, output_path,
-                        vcodec='libx264', acodec='aac',
-                        preset='medium', crf=23
-                    )
+        except Exception as e:
+            logger.error(f"无损切割失败: {os.path.basename(video_path)} | 错误: {e}")
+            return False
+
+        finally:
+            cleanup_temp_folder(parts_dir)
+
+    def smart_render_segments(self, video_path, active_segments, output_path, keyframe_times, codec_info, has_audio):
+        """只重新编码剪辑点所在的不完整 GOP，中间完整的 GOP 直接复制
+
+        视频分片都转成带内嵌参数集的 Annex B 码流，重编码分片使用与源视频相同的编码器、profile、
+        像素格式和时间基，拼接后剪辑点逐帧精确。音频只有重编码成本很低，按精彩片段整体裁剪后编码一次再封装。
+        """
+        fps = codec_info['fps']
+        pieces = plan_smart_render(active_segments, keyframe_times, fps)
+        encoded = sum(p['end_time'] - p['start_time'] for p in pieces if p['mode'] == 'encode')
+        total = sum(p['end_time'] - p['start_time'] for p in pieces)
+        logger.info(f"开始smart剪辑: {os.path.basename(video_path)} -> {os.path.basename(output_path)} | "
+                    f"分片数: {len(pieces)}, 重编码时长: {encoded:.1f}s / {total:.1f}s")
+
+        parts_dir = tempfile.mkdtemp(prefix=".smart_parts_", dir=os.path.dirname(output_path) or None)
+        try:
+            part_paths = []
+            for i, piece in enumerate(pieces):
+                part_path = os.path.join(parts_dir, f"part_{i:05d}.mp4")
+                duration = piece['end_time'] - piece['start_time']
+                output_kwargs = {
+                    'an': None,
+                    'frames:v': int(round(piece['end_time'] * fps)) - int(round(piece['start_time'] * fps)),
+                    'bsf:v': codec_info['bsf'],
+                }
+                if codec_info['timescale']:
+                    output_kwargs['video_track_timescale'] = codec_info['timescale']
+
+                if piece['mode'] == 'copy':
+                    output_kwargs['vcodec'] = 'copy'
                 else:
-                    # 只有视频流
-                    video_streams = [stream.video for stream in input_streams]
-                    joined_video = ffmpeg.filter(video_streams, 'concat', n=len(video_streams))
+                    # 边界 GOP 要与直接复制的源码流画质接近，crf 固定取较高质量
+                    output_kwargs.update(vcodec=codec_info['encoder'], **self.encode_settings())
+                    output_kwargs['crf'] = 18
+                    if codec_info['pix_fmt']:
+                        output_kwargs['pix_fmt'] = codec_info['pix_fmt']
+                    if codec_info['profile']:
+                        output_kwargs['profile:v'] = codec_info['profile']
+
+                (
+                    ffmpeg
+                    .input(video_path, ss=piece['start_time'], t=duration)
+                    .output(part_path, **output_kwargs)
+                    .run(overwrite_output=True, quiet=True)
+                )
+                part_paths.append(part_path)
+
+            self.join_video_parts(video_path, part_paths, active_segments, output_path, has_audio, parts_dir)
 
-                    output_stream = ffmpeg.output(
-                        joined_video, output_path,
-                        vcodec='libx264', preset='medium', crf=23
-                    )
+            logger.info(f"剪辑完成: {os.path.basename(output_path)}")
+            return True
 
-                ffmpeg.run(output_stream, overwrite_output=True, quiet=True)
+        except Exception as e:
+            logger.error(f"smart剪辑失败: {os.path.basename(video_path)} | 错误: {e}")
+            return False
+
+        finally:
+            cleanup_temp_folder(parts_dir)
+
+    def encode_segments_parallel(self, video_path, active_segments, output_path, has_audio, encode_workers, fps):
+        """把精彩片段按时长均分成若干工作单元，每个单元由独立的 ffmpeg 进程用相同参数编码，
+        再用 concat demuxer 无损拼接；音频按片段裁剪后统一编码一次，避免分段处的 AAC 帧间隙
+        """
+        units = plan_encode_units(active_segments, encode_workers, fps)
+        budget = self.resource_budget or {}
+        threads = max(1, budget.get('cores_per_video', os.cpu_count() or 1) // len(units))
+        logger.info(f"并行编码: {os.path.basename(video_path)} | 工作单元: {len(units)}, 每进程线程数: {threads}")
+
+        parts_dir = tempfile.mkdtemp(prefix=".encode_parts_", dir=os.path.dirname(output_path) or None)
+        try:
+            part_paths = [os.path.join(parts_dir, f"part_{i:05d}.mp4") for i in range(len(units))]
+
+            def encode_unit(unit, part_path):
+                # 往前多解码 1 秒并保留原始时间戳（copyts），select 表达式与单进程路径使用同一时间轴
+                seek_time = max(0.0, unit[0]['start_time'] - 1.0)
+                input_stream = ffmpeg.input(video_path, ss=seek_time, t=unit[-1]['end_time'] - seek_time + 1.0)
+                video_stream = (
+                    input_stream.video
+                    .filter('select', build_segment_select_expr(unit))
+                    .filter('setpts', 'N/FRAME_RATE/TB')
+                )
+                (
+                    ffmpeg
+                    .output(video_stream, part_path, vcodec='libx264', copyts=None, vsync='passthrough',
+                            **self.encode_settings(threads))
+                    .run(overwrite_output=True, quiet=True)
+                )
+
+            with ThreadPoolExecutor(max_workers=len(units)) as executor:
+                futures = [executor.submit(encode_unit, unit, part_path) for unit, part_path in zip(units, part_paths)]
+                for future in futures:
+                    future.result()
+
+            self.join_video_parts(video_path, part_paths, active_segments, output_path, has_audio, parts_dir)
 
             logger.info(f"剪辑完成: {os.path.basename(output_path)}")
             return True
 
         except Exception as e:
-            logger.error(f"剪辑失败: {os.path.basename(video_path)} | 错误: {e}")
+            logger.error(f"并行编码失败: {os.path.basename(video_path)} | 错误: {e}")
+            return False
+
+        finally:
+            cleanup_temp_folder(parts_dir)
+
+    def join_video_parts(self, video_path, part_paths, active_segments, output_path, has_audio, work_dir):
+        """无损拼接只含视频的分段；有音频时按精彩片段裁剪源音频统一编码一次再封装
+
+        每个分段各带一条 AAC 流再拼接时，每个分段边界都会多出编码器的起始/填充间隙，片段多时音画逐渐不同步
+        """
+        if not has_audio:
+            concat_video_parts(part_paths, output_path)
+            return
+        video_only_path = os.path.join(work_dir, "video_only.mp4")
+        concat_video_parts(part_paths, video_only_path)
+        self.mux_trimmed_audio(video_path, video_only_path, active_segments, output_path)
+
+    def mux_trimmed_audio(self, video_path, video_only_path, active_segments, output_path):
+        """按精彩片段裁剪源音频并编码为 AAC，与已拼接好的视频流一起封装"""
+        source_audio = ffmpeg.input(video_path).audio
+        audio_streams = [
+            source_audio
+            .filter('atrim', start=segment['start_time'], end=segment['end_time'])
+            .filter('asetpts', 'PTS-STARTPTS')
+            for segment in active_segments
+        ]
+        joined_audio = ffmpeg.concat(*audio_streams, v=0, a=1)
+        (
+            ffmpeg
+            .output(ffmpeg.input(video_only_path).video, joined_audio, output_path,
+                    vcodec='copy', acodec='aac')
+            .run(overwrite_output=True, quiet=True)
+        )
+
+    def detect_audio(self, video_path):
+        """检测视频是否包含音频流（复用 probe_video 的缓存），检测失败按无音频处理"""
+        info = probe_video(video_path)
+        if info is None or info['source'] != 'ffprobe':
+            logger.warning("音频检测失败，按无音频处理")
             return False
+        logger.info(f"音频检测: {'有音频' if info['has_audio'] else '无音频'}")
+        return info['has_audio']
+
+    def encode_segment(self, video_path, segment, output_path, has_audio):
+        """把单个精彩片段重新编码为独立文件
+
+        视频帧数固定为 片段时长 x fps：毫秒时间基的容器（MKV）按 -t 截取时会多出末尾一帧，
+        多个分段拼接后视频比按片段裁剪的音频越来越长
+        """
+        duration = segment['end_time'] - segment['start_time']
+
+        input_stream = ffmpeg.input(video_path, ss=segment['start_time'], t=duration)
+        output_kwargs = dict(self.encode_settings())
+        info = probe_video(video_path)
+        if info is not None and info['fps'] > 0:
+            output_kwargs['frames:v'] = max(1, int(round(duration * info['fps'])))
+
+        if has_audio:
+            video_stream = input_stream.video
+            audio_stream = input_stream.audio
+            output_stream = ffmpeg.output(
+                video_stream, audio_stream, output_path,
+                vcodec='libx264', acodec='aac',
+                **output_kwargs
+            )
+        else:
+            video_stream = input_stream.video
+            output_stream = ffmpeg.output(
+                video_stream, output_path,
+                vcodec='libx264', **output_kwargs
+            )
+
+        ffmpeg.run(output_stream, overwrite_output=True, quiet=True)
+
+    def stream_edit_video(self, video_path, output_path, idle_threshold, pixel_threshold, preserve_buffer,
+                          analysis_backend="opencv", analysis_fps=0.0):
+        """边分析边剪辑
+
+        分析线程把分数逐帧送入 OnlineSegmenter，每确定一个精彩片段就放入队列，
+        编码线程同时把片段编码为独立文件，分析结束后用 concat demuxer 无损拼接。
+        单个视频的耗时接近 max(分析, 编码) 而不是两者之和。
+        分段只编码视频，音频在拼接后按全部精彩片段统一编码一次。
+
+        返回 (idle_segments, active_segments, total_duration, 分数帧数, 是否剪辑成功)，无法分析时返回 None
+        """
+        info = probe_video(video_path)
+        if info is None:
+            return None
+
+        fps = info['fps']
+        total_frames = info['frame_count']
+
+        if fps <= 0 or total_frames <= 0:
+            logger.error(f"视频参数异常: fps={fps}, frames={total_frames}")
+            return None
+
+        stride = self.analysis_stride(fps, analysis_fps)
+        total_duration = info['duration']
+        has_audio = self.detect_audio(video_path)
+
+        logger.info(f"流式剪辑: {os.path.basename(video_path)} (FPS:{fps:.1f}, 帧数:{total_frames}, 采样间隔:{stride}帧)")
+
+        segmenter = OnlineSegmenter(fps, idle_threshold, self.min_segment_duration, preserve_buffer)
+        segment_queue = queue.Queue()
+        parts_dir = tempfile.mkdtemp(prefix=".stream_parts_", dir=os.path.dirname(output_path) or None)
+        part_paths = []
+        encode_errors = []
+
+        def encode_worker():
+            while True:
+                segment = segment_queue.get()
+                if segment is None:
+                    break
+                if encode_errors:
+                    continue
+                part_path = os.path.join(parts_dir, f"part_{len(part_paths):05d}.mp4")
+                try:
+                    self.encode_segment(video_path, segment, part_path, False)
+                    part_paths.append(part_path)
+                    logger.info(f"片段编码完成: {segment['start_time']:.1f}s-{segment['end_time']:.1f}s")
+                except Exception as e:
+                    encode_errors.append(e)
+
+        encoder = threading.Thread(target=encode_worker, daemon=True)
+        encoder.start()
+
+        def on_scores(change_ratio, count):
+            for segment in segmenter.push(change_ratio, count):
+                segment_queue.put(segment)
+
+        try:
+            motion_scores, frames_seen = analyze_frame_range(
+                video_path, pixel_threshold, analysis_backend, stride,
+                total_frames=total_frames, fps=fps, score_callback=on_scores
+            )
+
+            if len(motion_scores) > 0:
+                # 末尾不足一个采样间隔的帧沿用最后一个分数
+                padding = frames_seen - 1 - len(motion_scores)
+                if padding > 0:
+                    on_scores(motion_scores.array()[-1], padding)
+                    motion_scores.pad_to(frames_seen - 1)
+
+                if self.score_cache is not None:
+                    self.score_cache.put(video_path, self.score_cache_params(pixel_threshold, analysis_backend, stride),
+                                         motion_scores.array())
+
+                for segment in segmenter.finish(total_duration):
+                    segment_queue.put(segment)
+        finally:
+            segment_queue.put(None)
+            encoder.join()
+
+        try:
+            if len(motion_scores) == 0:
+                logger.error("未能提取运动分数")
+                return None
+
+            if encode_errors:
+                logger.error(f"剪辑失败: {os.path.basename(video_path)} | 错误: {encode_errors[0]}")
+                return segmenter.idle_segments, segmenter.active_segments, total_duration, len(motion_scores), False
+
+            if not part_paths:
+                logger.warning(f"没有精彩片段，跳过: {os.path.basename(video_path)}")
+                return segmenter.idle_segments, segmenter.active_segments, total_duration, len(motion_scores), False
+
+            self.join_video_parts(video_path, part_paths, segmenter.active_segments, output_path, has_audio, parts_dir)
+            logger.info(f"剪辑完成: {os.path.basename(output_path)}")
+            return segmenter.idle_segments, segmenter.active_segments, total_duration, len(motion_scores), True
+
+        except Exception as e:
+            logger.error(f"剪辑失败: {os.path.basename(video_path)} | 错误: {e}")
+            return segmenter.idle_segments, segmenter.active_segments, total_duration, len(motion_scores), False
+
+        finally:
+            cleanup_temp_folder(parts_dir)
+
+    def tail_edit_video(self, video_path, output_path, idle_threshold, pixel_threshold, preserve_buffer,
+                        analysis_fps=0.0, follow_timeout=30.0):
+        """尾随剪辑仍在录制的视频（分片 MP4/MKV/TS）
+
+        用 ffmpeg follow 模式持续读取新写入的帧，已确定的精彩片段边录边编码；
+        输出目录中的 {文件名}_live.json 随分析推进原子更新，发布已确定的无操作/精彩片段，
+        并保存分析位置、平滑窗口与已编码分段。中断后再次调用会从保存的位置继续，
+        录制结束（超过 follow_timeout 秒无新数据）后只剩最后一段需要处理。
+        分段只编码视频，音频在录制结束拼接时按全部精彩片段统一编码一次。
+
+        返回值同 stream_edit_video
+        """
+        info = probe_video(video_path)
+        if info is None:
+            return None
+
+        fps = info['fps']
+        if fps <= 0:
+            logger.error(f"视频参数异常: fps={fps}")
+            return None
+
+        stride = self.analysis_stride(fps, analysis_fps)
+        has_audio = self.detect_audio(video_path)
+        output_dir = os.path.dirname(output_path) or "."
+        stem = Path(video_path).stem
+        state_path = os.path.join(output_dir, f"{stem}_live.json")
+        parts_dir = os.path.join(output_dir, f".{stem}_live_parts")
+        params = {
+            'idle_threshold': idle_threshold,
+            'min_segment_duration': self.min_segment_duration,
+            'pixel_threshold': pixel_threshold,
+            'preserve_buffer': preserve_buffer,
+            'stride': stride,
+            'fps': fps,
+            # 旧版进度文件的分段带有各自的音频流，不能与只含视频的分段混合拼接
+            'video_only_parts': True,
+        }
+
+        state = load_live_state(state_path, video_path, params)
+        if state is not None and state['segmenter'].get('finished', False):
+            # 旧版进度文件保存的是结束后的状态，末尾已按截断窗口平滑过，不能接着分析
+            logger.warning(f"尾随剪辑进度文件已处于结束状态，将从头分析: {os.path.basename(video_path)}")
+            state = None
+        if state is not None:
+            segmenter = OnlineSegmenter.from_state(state['segmenter'])
+            part_paths = [path for path in state['parts'] if os.path.exists(path)]
+            if len(part_paths) != len(state['parts']):
+                part_paths = []
+            logger.info(f"尾随剪辑续分析: {os.path.basename(video_path)} 从 {segmenter.pushed / fps:.1f}s 继续")
+        else:
+            segmenter = OnlineSegmenter(fps, idle_threshold, self.min_segment_duration, preserve_buffer)
+            part_paths = []
+            cleanup_temp_folder(parts_dir)
+            logger.info(f"尾随剪辑: {os.path.basename(video_path)} (FPS:{fps:.1f}, 采样间隔:{stride}帧, 等待超时:{follow_timeout:.1f}s)")
+        os.makedirs(parts_dir, exist_ok=True)
+
+        segment_queue = queue.Queue()
+        encode_errors = []
+        lock = threading.Lock()
+        published = {'count': None, 'at': 0.0}
+        # 输入结束前的分段器状态：结束时的尾部补齐和截断平滑不写入续分析状态，
+        # 续分析总是从这里继续读取新数据并重新结束
+        resume_point = {'segmenter': None}
+
+        def save_state(status):
+            segmenter_state = resume_point['segmenter'] or segmenter.state_dict()
+            with lock:
+                # 只保留续分析状态中已确定片段对应的分段，结束后才确定的片段续分析时重新编码
+                parts = part_paths[:len(segmenter_state['active_segments'])]
+            write_live_state(state_path, {
+                'source': os.path.abspath(video_path),
+                'params': params,
+                'status': status,
+                'analyzed_seconds': segmenter.pushed / fps,
+                'idle_segments': list(segmenter.idle_segments),
+                'active_segments': list(segmenter.active_segments),
+                'parts': parts,
+                'segmenter': segmenter_state,
+                'updated_at': time.time(),
+            })
+            published['count'] = (len(segmenter.idle_segments), len(segmenter.active_segments), len(parts))
+            published['at'] = time.monotonic()
+
+        def encode_worker():
+            while True:
+                item = segment_queue.get()
+                if item is None:
+                    break
+                if encode_errors:
+                    continue
+                index, segment = item
+                part_path = os.path.join(parts_dir, f"part_{index:05d}.mp4")
+                try:
+                    self.encode_segment(video_path, segment, part_path, False)
+                    with lock:
+                        part_paths.append(part_path)
+                    logger.info(f"片段编码完成: {segment['start_time']:.1f}s-{segment['end_time']:.1f}s")
+                except Exception as e:
+                    encode_errors.append(e)
+
+        encoder = threading.Thread(target=encode_worker, daemon=True)
+        encoder.start()
+
+        # 续分析时补上已确定但尚未编码的片段（编码线程按顺序完成，已编码分段总是前缀）
+        for index in range(len(part_paths), len(segmenter.active_segments)):
+            segment_queue.put((index, segmenter.active_segments[index]))
+
+        def on_scores(change_ratio, count):
+            for segment in segmenter.push(change_ratio, count):
+                segment_queue.put((len(segmenter.active_segments) - 1, segment))
+            # 片段有变化立即发布，否则定期保存进度
+            with lock:
+                counts = (len(segmenter.idle_segments), len(segmenter.active_segments), len(part_paths))
+            if counts != published['count'] or time.monotonic() - published['at'] >= LIVE_STATE_INTERVAL:
+                save_state('recording')
+
+        start_frame = segmenter.pushed
+        total_duration = 0.0
+        try:
+            _, frames_seen = analyze_frame_range(
+                video_path, pixel_threshold, "ffmpeg", stride, start_frame=start_frame,
+                fps=fps, log_progress=False, score_callback=on_scores, follow_timeout=follow_timeout
+            )
+
+            if segmenter.pushed > 0:
+                resume_point['segmenter'] = segmenter.state_dict()
+                # 末尾不足一个采样间隔的帧沿用最后一个分数
+                padding = frames_seen - 1 - segmenter.pushed
+                if padding > 0:
+                    on_scores(segmenter.recent[-1], padding)
+
+                total_duration = max(frames_seen, segmenter.pushed + 1) / fps
+                for segment in segmenter.finish(total_duration):
+                    segment_queue.put((len(segmenter.active_segments) - 1, segment))
+        finally:
+            segment_queue.put(None)
+            encoder.join()
+
+        num_scores = segmenter.pushed
+        if num_scores == 0:
+            logger.error("未能提取运动分数")
+            return None
 
-    def process_single_video(self, video_path, output_dir, idle_threshold, pixel_threshold, preserve_buffer, enable_preview):
-        """处理单个视频文件"""
+        success = False
+        try:
+            if encode_errors:
+                logger.error(f"剪辑失败: {os.path.basename(video_path)} | 错误: {encode_errors[0]}")
+            elif not part_paths:
+                logger.warning(f"没有精彩片段，跳过: {os.path.basename(video_path)}")
+            else:
+                self.join_video_parts(video_path, part_paths, segmenter.active_segments, output_path,
+                                      has_audio, parts_dir)
+                success = True
+                logger.info(f"剪辑完成: {os.path.basename(output_path)}")
+        except Exception as e:
+            logger.error(f"剪辑失败: {os.path.basename(video_path)} | 错误: {e}")
+
+        if encode_errors:
+            # 保留进度与已编码分段，下次从断点继续
+            save_state('failed')
+        else:
+            save_state('finished' if success else 'empty')
+            cleanup_temp_folder(parts_dir)
+        return segmenter.idle_segments, segmenter.active_segments, total_duration, num_scores, success
+
+    def process_single_video(self, video_path, output_dir, idle_threshold, pixel_threshold, preserve_buffer, enable_preview=False,
+                             analysis_backend="opencv", analysis_fps=0.0, analysis_workers=1, streaming_edit=False,
+                             edit_mode="encode", encode_workers=1, tail_timeout=0.0):
+        """处理单个视频文件
+
+        tail_timeout > 0 时按尾随模式处理仍在录制的视频，文件超过该秒数无新数据视为录制结束
+        """
         try:
             filename = Path(video_path).stem
             output_filename = f"{filename}_edited.mp4"
-            output_path = os.path.join(output_dir, output_filename)
+            output_path = os.path.join(self.output_dir_for(video_path, output_dir), output_filename)
 
             logger.info(f"处理视频: {os.path.basename(video_path)}")
 
-            # 运动检测
-            motion_scores, idle_segments = self.detect_motion_simple(
-                video_path, idle_threshold, pixel_threshold
+            if (streaming_edit or tail_timeout > 0) and edit_mode == "encode":
+                partial_path = partial_output_path(output_path)
+                success, analysis_result = self._process_single_video_streaming(
+                    video_path, partial_path, idle_threshold, pixel_threshold, preserve_buffer,
+                    analysis_backend, analysis_fps, tail_timeout
+                )
+                commit_partial_output(partial_path, output_path, success)
+                if tail_timeout > 0 and video_path in self.batch_items:
+                    # 录制期间文件不断变化，按结束时的大小和修改时间记入处理清单
+                    stat = os.stat(video_path)
+                    self.batch_items[video_path] = dict(self.batch_items[video_path],
+                                                        size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                self.record_batch_result(video_path, success, [output_path],
+                                         None if success else ("运动检测失败" if analysis_result is None else "剪辑失败"))
+                return success, analysis_result
+
+            job = self.analyze_video(
+                video_path, idle_threshold, pixel_threshold, preserve_buffer,
+                analysis_backend, analysis_fps, analysis_workers, snap_to_keyframes=edit_mode == "copy"
             )
-
-            if motion_scores is None:
-                logger.error(f"运动检测失败: {os.path.basename(video_path)}")
+            if job is None:
+                self.record_batch_result(video_path, False, [], "运动检测失败")
                 return False, None
 
-            # 获取视频总时长
-            cap = cv2.VideoCapture(video_path)
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            total_duration = total_frames / fps if fps > 0 else 0
-            cap.release()
+            return self.encode_video_job(job, output_dir, edit_mode, encode_workers)
 
-            # 分析结果
-            total_idle_time = sum([seg['duration'] for seg in idle_segments])
-            active_time = total_duration - total_idle_time
-            compression_ratio = (active_time / total_duration * 100) if total_duration > 0 else 0
+        except Exception as e:
+            logger.error(f"处理视频失败: {os.path.basename(video_path)} | 错误: {e}")
+            self.record_batch_result(video_path, False, [], str(e))
+            return False, None
 
-            analysis_result = {
-                'filename': os.path.basename(video_path),
-                'total_duration': total_duration,
-                'idle_segments_count': len(idle_segments),
-                'total_idle_time': total_idle_time,
-                'active_time': active_time,
-                'compression_ratio': compression_ratio,
-                'idle_segments': idle_segments
-            }
+    def analyze_video(self, video_path, idle_threshold, pixel_threshold, preserve_buffer,
+                      analysis_backend="opencv", analysis_fps=0.0, analysis_workers=1, snap_to_keyframes=False):
+        """分析阶段：运动检测并生成精彩片段，返回交给编码阶段的任务；运动检测失败返回 None
+
+        snap_to_keyframes 为真时按关键帧索引对齐片段边界（copy 模式）
+        """
+        rss_before_mb = get_current_rss_mb()
+
+        # 运动检测
+        motion_scores, idle_segments = self.detect_motion_simple(
+            video_path, idle_threshold, pixel_threshold, analysis_backend, analysis_fps, analysis_workers
+        )
+
+        if motion_scores is None:
+            logger.error(f"运动检测失败: {os.path.basename(video_path)}")
+            return None
 
-            logger.info(f"分析结果: 总时长={total_duration:.1f}s, 无操作={total_idle_time:.1f}s, 压缩率={compression_ratio:.1f}%")
+        # 获取视频总时长（容器时长，可变帧率文件不会因帧数/fps 估算失真）
+        total_duration = probe_video(video_path)['duration']
 
+        # 分析结果
+        analysis_result = self.build_analysis_result(
+            video_path, idle_segments, total_duration, len(motion_scores), rss_before_mb
+        )
 
-            # 创建精彩片段
-            active_segments = self.create_active_segments(idle_segments, total_duration, preserve_buffer)
+        # 创建精彩片段
+        keyframe_times = load_keyframe_index(video_path) if snap_to_keyframes else None
+        active_segments = self.create_active_segments(idle_segments, total_duration, preserve_buffer, keyframe_times)
 
-            if not active_segments:
-                logger.warning(f"没有精彩片段: {os.path.basename(video_path)}")
-                return False, analysis_result
+        return {
+            'video_path': video_path,
+            'analysis_result': analysis_result,
+            'active_segments': active_segments,
+            'total_duration': total_duration,
+        }
 
-            # 剪辑视频
-            success = self.edit_video_segments(video_path, active_segments, output_path)
+    def output_dir_for(self, video_path, output_dir):
+        """递归扫描时输出按输入的子文件夹结构存放，避免不同子文件夹中的同名视频互相覆盖"""
+        relative_dir = self.output_subdirs.get(video_path)
+        if not relative_dir:
+            return output_dir
+        target_dir = os.path.join(output_dir, relative_dir)
+        os.makedirs(target_dir, exist_ok=True)
+        return target_dir
+
+    def encode_video_job(self, job, output_dir, edit_mode="encode", encode_workers=1):
+        """编码阶段：按分析阶段给出的精彩片段剪辑视频，返回 (是否成功, 分析结果)"""
+        video_path = job['video_path']
+        analysis_result = job['analysis_result']
+        output_dir = self.output_dir_for(video_path, output_dir)
+        output_path = os.path.join(output_dir, f"{Path(video_path).stem}_edited.mp4")
+
+        if not job['active_segments']:
+            logger.warning(f"没有精彩片段: {os.path.basename(video_path)}")
+            self.record_batch_result(video_path, False, [], "没有精彩片段")
+            return False, analysis_result
 
-            if success:
-                self.total_idle_time_removed += total_idle_time
+        try:
+            if edit_mode == "edl":
+                # 只导出剪辑决策列表，不编码
+                info = probe_video(video_path)
+                output_paths = write_edit_decision_list(
+                    video_path, job['active_segments'], analysis_result['idle_segments'],
+                    job['total_duration'], info['fps'], info['has_audio'], output_dir
+                )
+                self.total_idle_time_removed += analysis_result['total_idle_time']
+                self.record_batch_result(video_path, True, output_paths)
                 return True, analysis_result
-            else:
-                return False, analysis_result
 
+            # 剪辑视频：先写临时文件，成功后原子替换为正式输出
+            partial_path = partial_output_path(output_path)
+            success = False
+            try:
+                success = self.edit_video_segments(video_path, job['active_segments'], partial_path, edit_mode,
+                                                   job['total_duration'], encode_workers)
+            finally:
+                commit_partial_output(partial_path, output_path, success)
         except Exception as e:
             logger.error(f"处理视频失败: {os.path.basename(video_path)} | 错误: {e}")
+            self.record_batch_result(video_path, False, [], str(e))
+            return False, analysis_result
+
+        self.record_batch_result(video_path, success, [output_path], None if success else "剪辑失败")
+        if success:
+            self.total_idle_time_removed += analysis_result['total_idle_time']
+            return True, analysis_result
+        else:
+            return False, analysis_result
+
+    def record_batch_result(self, video_path, success, output_paths, error=None):
+        """可续跑批处理时把单个输入的处理结果写入处理清单；失败时 error 为失败原因"""
+        if self.batch_manifest is None or video_path not in self.batch_items:
+            return
+        if success:
+            self.batch_manifest.record(self.batch_items[video_path], self.batch_params_hash, 'done', output_paths)
+        else:
+            self.batch_manifest.record(self.batch_items[video_path], self.batch_params_hash, 'failed', [],
+                                       error or "处理失败")
+
+    def run_pipeline(self, video_files, output_dir, analysis_settings, edit_mode, budget):
+        """两阶段流水线：分析进程池 -> 有界队列 -> 编码线程池
+
+        分析在独立进程中运行，绕开 Python 帧循环的 GIL；平台不支持 fork 时分析改在线程池中运行。
+        编码线程只负责调度 ffmpeg 子进程。
+        同时在分析或排队中的视频数不超过 分析池大小 + 队列容量，编码跟不上时分析自动暂停。
+        返回各阶段的忙碌/空闲时长统计。
+        """
+        analysis_pool = budget['analysis_pool']
+        encode_pool = budget['encode_pool']
+        job_queue = queue.Queue(maxsize=analysis_pool + budget['queue_size'])
+        slots = threading.Semaphore(analysis_pool + budget['queue_size'])
+        lock = threading.Lock()
+
+        start = time.perf_counter()
+        stats = {
+            'analysis_busy': 0.0, 'encode_busy': 0.0, 'analysis_stall': 0.0,
+            'analysis_end': start, 'encode_end': start,
+        }
+
+        def encode_worker():
+            while True:
+                job = job_queue.get()
+                if job is None:
+                    break
+                slots.release()
+
+                job_start = time.perf_counter()
+                success, analysis_result = self.encode_video_job(job, output_dir, edit_mode, budget['encode_workers'])
+                job_end = time.perf_counter()
+
+                analysis_result['analysis_seconds'] = job['analysis_seconds']
+                analysis_result['encode_seconds'] = job_end - job_start
+                with lock:
+                    stats['encode_busy'] += job_end - job_start
+                    stats['encode_end'] = max(stats['encode_end'], job_end)
+                    if success:
+                        self.processed_count += 1
+                    self.analysis_results.append(analysis_result)
+
+        def on_analyzed(future, video_file):
+            try:
+                job = future.result()
+                error = "运动检测失败"
+            except Exception as e:
+                logger.error(f"处理异常: {os.path.basename(video_file)} | 错误: {e}")
+                job = None
+                error = str(e)
+            if job is None:
+                self.record_batch_result(video_file, False, [], error)
+
+            with lock:
+                stats['analysis_end'] = max(stats['analysis_end'], time.perf_counter())
+                if job is not None:
+                    stats['analysis_busy'] += job['analysis_seconds']
+
+            if job is None:
+                slots.release()
+            else:
+                job_queue.put(job)
+
+        encoders = [threading.Thread(target=encode_worker, daemon=True) for _ in range(encode_pool)]
+        for encoder in encoders:
+            encoder.start()
+
+        executor = analysis_executor(_analyze_video_job, analysis_pool, budget['analysis_threads'])
+        # 线程池中的分析共用本进程的 OpenCV 线程池设置，结束后恢复
+        previous_cv_threads = cv2.getNumThreads()
+        if isinstance(executor, ThreadPoolExecutor):
+            cv2.setNumThreads(budget['analysis_threads'])
+        try:
+            with executor:
+                for video_file in video_files:
+                    wait_start = time.perf_counter()
+                    slots.acquire()
+                    stats['analysis_stall'] += time.perf_counter() - wait_start
+
+                    future = executor.submit(_analyze_video_job, video_file, analysis_settings, budget)
+                    future.add_done_callback(lambda f, video_file=video_file: on_analyzed(f, video_file))
+        finally:
+            for _ in encoders:
+                job_queue.put(None)
+            for encoder in encoders:
+                encoder.join()
+            cv2.setNumThreads(previous_cv_threads)
+
+        end = time.perf_counter()
+        analysis_span = stats['analysis_end'] - start
+        encode_span = stats['encode_end'] - start
+        pipeline_stats = {
+            'wall_seconds': end - start,
+            'analysis_pool': analysis_pool,
+            'encode_pool': encode_pool,
+            'analysis_busy_seconds': stats['analysis_busy'],
+            'analysis_idle_seconds': max(0.0, analysis_pool * analysis_span - stats['analysis_busy']),
+            'analysis_stall_seconds': stats['analysis_stall'],
+            'encode_busy_seconds': stats['encode_busy'],
+            'encode_idle_seconds': max(0.0, encode_pool * encode_span - stats['encode_busy']),
+        }
+        logger.info(f"流水线完成: 总耗时 {pipeline_stats['wall_seconds']:.1f}s | "
+                    f"分析 忙{pipeline_stats['analysis_busy_seconds']:.1f}s/空闲{pipeline_stats['analysis_idle_seconds']:.1f}s | "
+                    f"编码 忙{pipeline_stats['encode_busy_seconds']:.1f}s/空闲{pipeline_stats['encode_idle_seconds']:.1f}s")
+        return pipeline_stats
+
+    def _process_single_video_streaming(self, video_path, output_path, idle_threshold, pixel_threshold,
+                                        preserve_buffer, analysis_backend, analysis_fps, tail_timeout=0.0):
+        """流式处理单个视频：分析与编码同时进行；tail_timeout > 0 时尾随仍在录制的文件"""
+        rss_before_mb = get_current_rss_mb()
+        if tail_timeout > 0:
+            stream_result = self.tail_edit_video(
+                video_path, output_path, idle_threshold, pixel_threshold, preserve_buffer,
+                analysis_fps, tail_timeout
+            )
+        else:
+            stream_result = self.stream_edit_video(
+                video_path, output_path, idle_threshold, pixel_threshold, preserve_buffer,
+                analysis_backend, analysis_fps
+            )
+        if stream_result is None:
+            logger.error(f"运动检测失败: {os.path.basename(video_path)}")
             return False, None
 
+        idle_segments, active_segments, total_duration, num_scores, success = stream_result
+        analysis_result = self.build_analysis_result(
+            video_path, idle_segments, total_duration, num_scores, rss_before_mb
+        )
+
+        if success:
+            self.total_idle_time_removed += analysis_result['total_idle_time']
+        return success, analysis_result
+
+    def build_analysis_result(self, video_path, idle_segments, total_duration, num_scores, rss_before_mb=0.0):
+        """汇总单个视频的分析结果
+
+        rss_before_mb 为开始处理该视频前的当前 RSS，用来计算该视频处理期间的内存增量
+        """
+        total_idle_time = sum([seg['duration'] for seg in idle_segments])
+        active_time = total_duration - total_idle_time
+        compression_ratio = (active_time / total_duration * 100) if total_duration > 0 else 0
+
+        analysis_result = {
+            'filename': os.path.basename(video_path),
+            'total_duration': total_duration,
+            'idle_segments_count': len(idle_segments),
+            'total_idle_time': total_idle_time,
+            'active_time': active_time,
+            'compression_ratio': compression_ratio,
+            'idle_segments': idle_segments,
+            # 原位平滑，原始分数和平滑分数共用一份 float32 缓冲区
+            'score_memory_mb': num_scores * np.dtype(np.float32).itemsize / (1024 * 1024),
+            # 该视频处理前后当前 RSS 的差值；峰值是进程生命周期的高水位，两者分开记录
+            'rss_growth_mb': max(0.0, get_current_rss_mb() - rss_before_mb) if rss_before_mb else 0.0,
+            'peak_rss_mb': get_peak_rss_mb(),
+            # 记录该任务实际分到的资源预算
+            'resource_budget': dict(self.resource_budget) if self.resource_budget else None
+        }
+
+        logger.info(f"分析结果: 总时长={total_duration:.1f}s, 无操作={total_idle_time:.1f}s, 压缩率={compression_ratio:.1f}%")
+        logger.info(f"内存: 分数缓冲区={analysis_result['score_memory_mb']:.1f}MB, "
+                    f"本视频RSS增量={analysis_result['rss_growth_mb']:.1f}MB, 进程启动以来峰值RSS={analysis_result['peak_rss_mb']:.1f}MB")
+
+        return analysis_result
+
     def auto_edit_videos(self, input_folder: str, output_folder_prefix: str,
                         idle_threshold: float, min_segment_duration: float,
-                        pixel_threshold: int, preserve_buffer: float = 1.0):
+                        pixel_threshold: int, preserve_buffer: float = 1.0,
+                        analysis_backend: str = "opencv", analysis_fps: float = 0.0,
+                        analysis_workers: int = 1, use_score_cache: bool = True,
+                        streaming_edit: bool = False, edit_mode: str = "encode", encode_workers: int = 1,
+                        encode_profile: str = "balanced", batch_order: str = "longest_first",
+                        input_staging: str = "direct", recursive: bool = False,
+                        include_patterns: str = "", exclude_patterns: str = "", resume_batch: bool = False,
+                        shared_queue_dir: str = ""):
         """自动剪辑视频的主函数"""
 
         self.min_segment_duration = min_segment_duration  # 存储为实例变量
+        self.score_cache = MotionScoreCache() if use_score_cache else None
 
         try:
             logger.info(f"[GameVideoAutoEdit] 开始自动剪辑 | input_folder={input_folder} | output_prefix={output_folder_prefix}")
-            logger.info(f"参数: idle_threshold={idle_threshold}, min_duration={min_segment_duration}s, pixel_threshold={pixel_threshold}")
+            logger.info(f"参数: idle_threshold={idle_threshold}, min_duration={min_segment_duration}s, pixel_threshold={pixel_threshold}, backend={analysis_backend}, analysis_fps={analysis_fps}, analysis_workers={analysis_workers}, edit_mode={edit_mode}")
 
             # 解析输入路径
             input_folder_path = resolve_path(input_folder)
@@ -427,28 +3213,81 @@ class GameVideoAutoEditNode:
                 logger.warning(f"输入路径不存在: {input_folder_path}")
                 return ("", "输入路径不存在")
 
-            # 创建输出目录
+            # 创建输出目录（可续跑批处理使用固定目录，便于重跑时找回处理清单）
             output_dir = folder_paths.get_output_directory()
-            unique_folder_name = generate_unique_folder_name(output_folder_prefix, output_dir)
-            output_path = os.path.join(output_dir, unique_folder_name)
+            if shared_queue_dir:
+                # 共享队列：输出和队列文件都放在各渲染机共用的存储上
+                output_path = os.path.join(resolve_path(shared_queue_dir), output_folder_prefix)
+            elif resume_batch:
+                output_path = os.path.join(output_dir, output_folder_prefix)
+            else:
+                unique_folder_name = generate_unique_folder_name(output_folder_prefix, output_dir)
+                output_path = os.path.join(output_dir, unique_folder_name)
             os.makedirs(output_path, exist_ok=True)
+            self.output_path = output_path
             logger.info(f"输出目录: {output_path}")
 
-            # 创建临时文件夹（处理文件名问题）
-            temp_dir, filename_mapping = create_sanitized_temp_folder(input_folder_path)
-            logger.info(f"临时目录: {temp_dir}")
+            # 扫描视频文件：一次 scandir 遍历，按文件头识别，清单按原路径交给各工作进程
+            manifest = scan_video_files(input_folder_path, recursive,
+                                        _parse_pattern_list(include_patterns), _parse_pattern_list(exclude_patterns))
+            if not manifest:
+                logger.warning("未找到视频文件")
+                return ("", "未找到视频文件")
+
+            if shared_queue_dir:
+                # 队列按文件大小、修改时间和参数哈希去重，已完成的视频不会重复处理
+                queue_settings = {
+                    'min_segment_duration': min_segment_duration,
+                    'use_score_cache': use_score_cache,
+                    'analysis_workers': analysis_workers,
+                    'encode_workers': encode_workers,
+                    'encode_profile': encode_profile,
+                    'process_kwargs': {
+                        'idle_threshold': idle_threshold, 'pixel_threshold': pixel_threshold,
+                        'preserve_buffer': preserve_buffer, 'analysis_backend': analysis_backend,
+                        'analysis_fps': analysis_fps, 'streaming_edit': streaming_edit, 'edit_mode': edit_mode,
+                    },
+                }
+                params_hash = batch_params_hash(idle_threshold, min_segment_duration, pixel_threshold, preserve_buffer,
+                                                analysis_backend, analysis_fps, edit_mode, encode_profile)
+                return self._run_shared_queue(output_path, manifest, queue_settings, params_hash, input_staging)
+
+            # 可续跑批处理：跳过文件未变且参数相同的已完成输入
+            self.skipped_count = 0
+            self.batch_manifest = BatchManifest(output_path) if resume_batch else None
+            if self.batch_manifest is not None:
+                remove_stale_partial_outputs(output_path)
+                self.batch_params_hash = batch_params_hash(
+                    idle_threshold, min_segment_duration, pixel_threshold, preserve_buffer,
+                    analysis_backend, analysis_fps, edit_mode, encode_profile
+                )
+                pending = [item for item in manifest if not self.batch_manifest.is_done(item, self.batch_params_hash)]
+                self.skipped_count = len(manifest) - len(pending)
+                manifest = pending
+                logger.info(f"处理清单: 跳过 {self.skipped_count} 个已完成的视频，待处理 {len(manifest)} 个")
+                if not manifest:
+                    return (output_path, f"全部 {self.skipped_count} 个视频已处理完成，无需重新处理")
+
+            temp_dir = None
+            if input_staging == "link":
+                try:
+                    temp_dir, manifest, needs_copy = stage_input_files(manifest, input_folder_path)
+                except OSError as e:
+                    logger.error(f"无法创建暂存目录: {e}")
+                    return ("", f"输入暂存失败: {e}")
+                if needs_copy:
+                    cleanup_temp_folder(temp_dir)
+                    for video_file, reason in needs_copy:
+                        logger.error(f"无法零拷贝暂存: {os.path.basename(video_file)} | {reason}")
+                    return ("", f"输入暂存失败: {len(needs_copy)} 个文件无法硬链接或reflink，需要复制，已中止（可改用 input_staging=direct）")
+                logger.info(f"暂存目录: {temp_dir}")
+
+            video_files = [item['path'] for item in manifest]
+            self.output_subdirs = {item['path']: item['relative_dir'] for item in manifest}
+            self.batch_items = {item['path']: item for item in manifest}
+            remember_file_stats(manifest)
 
             try:
-                # 收集视频文件
-                video_extensions = ['*.mp4', '*.avi', '*.mov', '*.mkv', '*.wmv', '*.flv', '*.webm']
-                video_files = []
-                for ext in video_extensions:
-                    video_files.extend(glob.glob(os.path.join(temp_dir, ext)))
-
-                if not video_files:
-                    logger.warning("未找到视频文件")
-                    return ("", "未找到视频文件")
-
                 logger.info(f"找到 {len(video_files)} 个视频文件")
 
                 # 重置统计信息
@@ -456,48 +3295,222 @@ class GameVideoAutoEditNode:
                 self.total_idle_time_removed = 0.0
                 self.analysis_results = []
 
-                # 并发处理视频
-                max_workers = max(1, min(4, os.cpu_count() // 2))  # 限制并发数避免内存压力
-                logger.info(f"使用 {max_workers} 个线程处理")
-
-                with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                    future_to_file = {
-                        executor.submit(
-                            self.process_single_video,
-                            video_file, output_path, idle_threshold,
-                            pixel_threshold, preserve_buffer, enable_preview
-                        ): video_file
-                        for video_file in video_files
-                    }
-
-                    for future in as_completed(future_to_file):
-                        video_file = future_to_file[future]
-                        try:
-                            success, analysis_result = future.result()
-                            if success:
-                                self.processed_count += 1
-                            if analysis_result:
-                                self.analysis_results.append(analysis_result)
-                        except Exception as e:
-                            logger.error(f"处理异常: {os.path.basename(video_file)} | 错误: {e}")
-
-                # 生成分析报告
-                analysis_summary = self.generate_analysis_summary()
+                self.pipeline_stats = None
+                self.batch_plan = None
 
-                if self.processed_count == 0:
-                    return ("", "未成功处理任何视频")
-
-                logger.info(f"处理完成: {self.processed_count}/{len(video_files)} 个视频")
-                return (output_path, analysis_summary)
+                if not streaming_edit:
+                    # 分析与编码分成两个独立的工作池，流水线并行
+                    budget = ResourceScheduler().plan_pipeline(
+                        len(video_files), analysis_workers, encode_workers, encode_profile
+                    )
+                    self.resource_budget = budget
+                    logger.info(f"资源预算: {budget['cpu_count']}核, 分析池 {budget['analysis_pool']}进程 "
+                                f"(每视频 {budget['analysis_workers']}进程x{budget['analysis_threads']}线程), "
+                                f"编码池 {budget['encode_pool']} (每视频 {budget['encode_workers']}进程x{budget['encode_threads']}线程, "
+                                f"{budget['encode_profile']})")
+
+                    analysis_settings = {
+                        'idle_threshold': idle_threshold,
+                        'min_segment_duration': min_segment_duration,
+                        'pixel_threshold': pixel_threshold,
+                        'preserve_buffer': preserve_buffer,
+                        'analysis_backend': analysis_backend,
+                        'analysis_fps': analysis_fps,
+                        'use_score_cache': use_score_cache,
+                        'snap_to_keyframes': edit_mode == "copy",
+                        'manifest': manifest,
+                    }
+                    video_files = self._order_batch(video_files, budget['encode_pool'], batch_order)
+                    if edit_mode in ("copy", "smart"):
+                        build_keyframe_indexes(video_files, budget['cpu_count'])
+                    self.pipeline_stats = self.run_pipeline(
+                        video_files, output_path, analysis_settings, edit_mode, budget
+                    )
+                    return self._finish_batch(output_path, len(video_files))
+
+                # 流式剪辑时分析和编码在同一视频内同时进行，按视频并发
+                budget = ResourceScheduler().plan(len(video_files), analysis_workers, encode_workers, encode_profile)
+                self.resource_budget = budget
+                max_workers = budget['video_workers']
+                logger.info(f"资源预算: {budget['cpu_count']}核, 并发视频 {max_workers}, "
+                            f"分析 {budget['analysis_workers']}进程x{budget['analysis_threads']}线程, "
+                            f"编码 {budget['encode_workers']}进程x{budget['encode_threads']}线程 ({budget['encode_profile']})")
+
+                video_files = self._order_batch(video_files, max_workers, batch_order)
+                if edit_mode in ("copy", "smart"):
+                    build_keyframe_indexes(video_files, budget['cpu_count'])
+
+                # OpenCV 线程池是进程级设置，批处理结束后恢复
+                previous_cv_threads = cv2.getNumThreads()
+                cv2.setNumThreads(budget['analysis_threads'])
+
+                try:
+                    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                        future_to_file = {
+                            executor.submit(
+                                self.process_single_video,
+                                video_file, output_path, idle_threshold,
+                                pixel_threshold, preserve_buffer,
+                                analysis_backend=analysis_backend, analysis_fps=analysis_fps,
+                                analysis_workers=budget['analysis_workers'], streaming_edit=streaming_edit,
+                                edit_mode=edit_mode, encode_workers=budget['encode_workers']
+                            ): video_file
+                            for video_file in video_files
+                        }
+
+                        for future in as_completed(future_to_file):
+                            video_file = future_to_file[future]
+                            try:
+                                success, analysis_result = future.result()
+                                if success:
+                                    self.processed_count += 1
+                                if analysis_result:
+                                    self.analysis_results.append(analysis_result)
+                            except Exception as e:
+                                logger.error(f"处理异常: {os.path.basename(video_file)} | 错误: {e}")
+                finally:
+                    cv2.setNumThreads(previous_cv_threads)
+
+                return self._finish_batch(output_path, len(video_files))
 
             finally:
-                # 清理临时目录
-                cleanup_temp_folder(temp_dir)
+                forget_file_stats(manifest)
+                # 清理暂存目录（只删除链接，不影响源文件）
+                if temp_dir:
+                    cleanup_temp_folder(temp_dir)
 
         except Exception as e:
             logger.error(f"自动剪辑失败: {e}")
             return ("", f"处理失败: {str(e)}")
 
+    def run_queue_worker(self, job_queue, worker_id, poll_interval=2.0):
+        """作为共享任务队列的工作者循环领取并处理任务，直到队列中没有待处理和处理中的任务
+
+        处理期间后台线程每三分之一租约心跳一次；其他工作者仍在处理时继续等待，
+        它们退出后租约过期的任务由本工作者接手。返回本工作者提交的 {'done': 成功数, 'failed': 失败数}
+        """
+        handled = {'done': 0, 'failed': 0}
+        heartbeat_interval = job_queue.lease_seconds / 3
+
+        def keep_alive(key, stop_event):
+            while not stop_event.wait(heartbeat_interval):
+                if not job_queue.heartbeat(key, worker_id):
+                    logger.warning(f"[{worker_id}] 任务租约已失效，结果将不会提交: {key}")
+                    return
+
+        logger.info(f"[{worker_id}] 开始领取任务: {job_queue.db_path}")
+        previous_cv_threads = cv2.getNumThreads()
+        try:
+            while True:
+                job = job_queue.claim(worker_id)
+                if job is None:
+                    counts = job_queue.counts()
+                    if counts['pending'] + counts['running'] == 0:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                logger.info(f"[{worker_id}] 领取任务: {job['key']} (第{job['attempt']}次)")
+                process_kwargs = self._configure_queue_job(job['settings'])
+                stop_event = threading.Event()
+                heartbeat = threading.Thread(target=keep_alive, args=(job['key'], stop_event), daemon=True)
+                heartbeat.start()
+                self.output_subdirs[job['path']] = job['relative_dir']
+                try:
+                    success, analysis_result = self.process_single_video(
+                        job['path'], job_queue.queue_dir, **process_kwargs
+                    )
+                finally:
+                    stop_event.set()
+                    heartbeat.join()
+
+                if analysis_result:
+                    analysis_result['worker'] = worker_id
+                if job_queue.complete(job['key'], worker_id, success, analysis_result):
+                    handled['done' if success else 'failed'] += 1
+                else:
+                    logger.warning(f"[{worker_id}] 任务已被其他工作者接手，丢弃本次结果: {job['key']}")
+        finally:
+            cv2.setNumThreads(previous_cv_threads)
+
+        logger.info(f"[{worker_id}] 队列已处理完: 成功 {handled['done']}, 失败 {handled['failed']}")
+        return handled
+
+    def _configure_queue_job(self, settings):
+        """按任务提交时的设置配置本节点，返回 process_single_video 的参数"""
+        self.min_segment_duration = settings['min_segment_duration']
+        if not settings['use_score_cache']:
+            self.score_cache = None
+        elif self.score_cache is None:
+            self.score_cache = MotionScoreCache()
+        # 每个工作者同一时间处理一个视频，整机资源都分给它
+        budget = ResourceScheduler().plan(1, settings['analysis_workers'], settings['encode_workers'],
+                                          settings['encode_profile'])
+        self.resource_budget = budget
+        cv2.setNumThreads(budget['analysis_threads'])
+        return dict(settings['process_kwargs'], analysis_workers=budget['analysis_workers'],
+                    encode_workers=budget['encode_workers'])
+
+    def summarize_job_queue(self, job_queue):
+        """把所有工作者提交的结果合并为一份分析报告"""
+        results = job_queue.results()
+        counts = job_queue.counts()
+        self.analysis_results = [result for _, result in results]
+        self.processed_count = counts['done']
+        self.output_path = job_queue.queue_dir
+        self.queue_stats = {
+            'done': counts['done'],
+            'failed': counts['failed'],
+            'workers': len({result.get('worker') for result in self.analysis_results}),
+        }
+        return self.generate_analysis_summary()
+
+    def _run_shared_queue(self, output_path, manifest, settings, params_hash, input_staging):
+        """共享队列模式：提交本批视频，本机作为工作者一起处理，队列处理完后返回合并报告"""
+        if input_staging != "direct":
+            logger.warning("共享队列模式按原路径处理，忽略 input_staging")
+
+        job_queue = SharedJobQueue(output_path)
+        added, conflicts = job_queue.enqueue(manifest, params_hash, settings)
+        if conflicts:
+            logger.error(f"共享任务队列中已有 {len(conflicts)} 个视频使用不同参数提交，例如: {conflicts[0]}")
+            return ("", f"共享队列 {output_path} 中已有使用不同参数的任务，请使用相同参数或更换输出前缀")
+        logger.info(f"共享任务队列: 新加入 {added} 个视频，队列状态 {job_queue.counts()}")
+
+        worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.run_queue_worker(job_queue, worker_id)
+
+        analysis_summary = self.summarize_job_queue(job_queue)
+        if self.processed_count == 0:
+            return ("", "未成功处理任何视频")
+        return (output_path, analysis_summary)
+
+    def _order_batch(self, video_files, num_workers, batch_order):
+        """探测时长后确定提交顺序，记录计划 makespan，返回排好序的文件列表"""
+        ordered_jobs, plan = plan_batch_order(probe_batch_jobs(video_files), num_workers, batch_order)
+        plan['started_at'] = time.perf_counter()
+        self.batch_plan = plan
+        logger.info(f"批处理顺序: {batch_order} | 计划 makespan {plan['planned_makespan']:.1f} 视频秒 "
+                    f"(下界 {plan['lower_bound']:.1f} 视频秒, 调度效率 {plan['schedule_efficiency'] * 100:.0f}%, "
+                    f"{num_workers} 个工作者)")
+        return [job['video_path'] for job in ordered_jobs]
+
+    def _finish_batch(self, output_path, num_videos):
+        """生成分析报告并返回节点输出"""
+        if self.batch_plan:
+            # 实际耗时是墙钟秒；换算成处理速度（每墙钟秒处理的视频秒）后才与视频时长有可比性
+            plan = self.batch_plan
+            plan['actual_makespan'] = time.perf_counter() - plan['started_at']
+            plan['throughput'] = plan['total_cost'] / plan['actual_makespan'] if plan['actual_makespan'] > 0 else 0.0
+
+        analysis_summary = self.generate_analysis_summary()
+
+        if self.processed_count == 0:
+            return ("", "未成功处理任何视频")
+
+        logger.info(f"处理完成: {self.processed_count}/{num_videos} 个视频")
+        return (output_path, analysis_summary)
+
     def generate_analysis_summary(self):
         """生成分析报告"""
         if not self.analysis_results:
@@ -511,16 +3524,42 @@ class GameVideoAutoEditNode:
         total_idle_time = sum([r['total_idle_time'] for r in self.analysis_results])
         total_active_time = sum([r['active_time'] for r in self.analysis_results])
         avg_compression = total_active_time / total_original_duration * 100 if total_original_duration > 0 else 0
+        skipped_text = f" (另有 {self.skipped_count} 个已完成，本次跳过)" if self.skipped_count else ""
 
         summary = f"""🎮 游戏视频自动剪辑分析报告 ({mode_text})
 
 📊 总体统计:
 - 处理视频数量: {total_videos}
-- 成功处理: {self.processed_count}
+- 成功处理: {self.processed_count}{skipped_text}
 - 原始总时长: {total_original_duration:.1f}秒 ({total_original_duration/60:.1f}分钟)
 - 无操作总时长: {total_idle_time:.1f}秒 ({total_idle_time/60:.1f}分钟)
 - 精彩内容时长: {total_active_time:.1f}秒 ({total_active_time/60:.1f}分钟)
-- 平均压缩率: {avg_compression:.1f}%
+- 平均压缩率: {avg_compression:.1f}%"""
+
+        if self.resource_budget:
+            budget = self.resource_budget
+            summary += f"""
+- 资源预算: {budget['cpu_count']}核, 并发视频 {budget['video_workers']}, 编码档位 {budget['encode_profile']}"""
+
+        if self.batch_plan and 'actual_makespan' in self.batch_plan:
+            plan = self.batch_plan
+            summary += f"""
+- 批处理顺序: {plan['order']}, 计划 makespan {plan['planned_makespan']:.1f} 视频秒 (下界 {plan['lower_bound']:.1f} 视频秒, 调度效率 {plan['schedule_efficiency'] * 100:.0f}%)
+- 实际耗时: {plan['actual_makespan']:.1f} 秒 (处理速度 {plan['throughput']:.1f}x，即每秒处理的视频秒数)"""
+
+        if self.queue_stats:
+            stats = self.queue_stats
+            summary += f"""
+- 共享队列: {stats['workers']} 个工作者, 完成 {stats['done']}, 失败 {stats['failed']}"""
+
+        if self.pipeline_stats:
+            stats = self.pipeline_stats
+            summary += f"""
+- 流水线: 总耗时 {stats['wall_seconds']:.1f}s
+  - 分析阶段 ({stats['analysis_pool']}进程): 忙碌 {stats['analysis_busy_seconds']:.1f}s, 空闲 {stats['analysis_idle_seconds']:.1f}s (等待编码队列 {stats['analysis_stall_seconds']:.1f}s)
+  - 编码阶段 ({stats['encode_pool']}线程): 忙碌 {stats['encode_busy_seconds']:.1f}s, 空闲 {stats['encode_idle_seconds']:.1f}s"""
+
+        summary += """
 
 📋 详细分析:"""
 
@@ -529,7 +3568,15 @@ class GameVideoAutoEditNode:
 {i}. {result['filename']}
    - 原时长: {result['total_duration']:.1f}s
    - 无操作片段: {result['idle_segments_count']}个, {result['total_idle_time']:.1f}s
-   - 压缩率: {result['compression_ratio']:.1f}%"""
+   - 压缩率: {result['compression_ratio']:.1f}%
+   - 内存: 分数缓冲区 {result.get('score_memory_mb', 0):.1f}MB, RSS增量 {result.get('rss_growth_mb', 0):.1f}MB, 进程启动以来峰值RSS {result.get('peak_rss_mb', 0):.1f}MB"""
+            if result.get('worker'):
+                summary += f"""
+   - 工作者: {result['worker']}"""
+            budget = result.get('resource_budget')
+            if budget:
+                summary += f"""
+   - 预算: 分析 {budget['analysis_workers']}进程x{budget['analysis_threads']}线程, 编码 {budget['encode_workers']}进程x{budget['encode_threads']}线程"""
 
         if len(self.analysis_results) > 10:
             summary += f"\n   ... 还有 {len(self.analysis_results) - 10} 个视频"
@@ -540,11 +3587,442 @@ class GameVideoAutoEditNode:
         return summary
 
 
+class GameVideoParamSweepNode:
+    """
+    剪辑参数扫描节点
+    只做运动分析（可复用分数缓存），对多组 idle_threshold / min_segment_duration / preserve_buffer
+    批量计算剪辑统计，不做任何编码，用于快速调参
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "video_path": ("STRING", {"default": "", "tooltip": "要分析的视频文件路径（支持相对路径和绝对路径）"}),
+                "pixel_threshold": EDIT_PARAM_INPUTS["pixel_threshold"],
+                "idle_thresholds": ("STRING", {"default": "0.010,0.015,0.020,0.025", "tooltip": "要评估的无操作检测阈值列表（逗号分隔）"}),
+                "min_segment_durations": ("STRING", {"default": "2.0,3.0,5.0", "tooltip": "要评估的最小无操作片段时长列表（秒，逗号分隔）"}),
+                "preserve_buffers": ("STRING", {"default": "0.5,1.0", "tooltip": "要评估的保留缓冲时间列表（秒，逗号分隔）"}),
+            },
+            "optional": {
+                "analysis_backend": (ANALYSIS_BACKENDS, {"default": "opencv", "tooltip": "运动分析后端"}),
+                "analysis_fps": EDIT_PARAM_INPUTS["analysis_fps"],
+                "use_score_cache": ("BOOLEAN", {"default": True, "tooltip": "复用/写入运动分数缓存"}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("sweep_report",)
+    FUNCTION = "sweep_params"
+    CATEGORY = "YX剪辑"
+
+    def sweep_params(self, video_path: str, pixel_threshold: int, idle_thresholds: str,
+                     min_segment_durations: str, preserve_buffers: str, analysis_backend: str = "opencv",
+                     analysis_fps: float = 0.0, use_score_cache: bool = True):
+        """分析一次视频，输出所有参数组合的剪辑统计"""
+        try:
+            resolved_path = resolve_path(video_path)
+            if not os.path.isfile(resolved_path):
+                return (f"视频文件不存在: {resolved_path}",)
+
+            thresholds = _parse_float_list(idle_thresholds)
+            durations = _parse_float_list(min_segment_durations)
+            buffers = _parse_float_list(preserve_buffers)
+            if not thresholds or not durations or not buffers:
+                return ("参数列表不能为空",)
+
+            editor = GameVideoAutoEditNode()
+            editor.score_cache = MotionScoreCache() if use_score_cache else None
+
+            motion_scores, fps = editor.compute_motion_scores(
+                resolved_path, pixel_threshold, analysis_backend, analysis_fps
+            )
+            if motion_scores is None:
+                return (f"运动检测失败: {os.path.basename(resolved_path)}",)
+
+            total_duration = probe_video(resolved_path)['duration']
+
+            results = editor.sweep_segmentation_params(
+                motion_scores, fps, total_duration, thresholds, durations, buffers
+            )
+            return (self.format_sweep_report(os.path.basename(resolved_path), total_duration, results),)
+
+        except Exception as e:
+            logger.error(f"参数扫描失败: {e}")
+            return (f"参数扫描失败: {str(e)}",)
+
+    @staticmethod
+    def format_sweep_report(filename, total_duration, results):
+        """生成参数扫描报告"""
+        report = f"""🔍 剪辑参数扫描报告
+
+🎬 视频: {filename}
+⏱️ 原时长: {total_duration:.1f}s
+🧮 参数组合: {len(results)} 组
+
+idle_threshold | min_duration | buffer | 无操作片段 | 无操作时长 | 精彩片段 | 输出时长 | 压缩率"""
+
+        for r in results:
+            report += (
+                f"\n{r['idle_threshold']:.3f} | {r['min_segment_duration']:.1f}s | {r['preserve_buffer']:.1f}s"
+                f" | {r['idle_segments_count']}个 | {r['total_idle_time']:.1f}s"
+                f" | {r['active_segments_count']}个 | {r['output_duration']:.1f}s | {r['compression_ratio']:.1f}%"
+            )
+
+        return report
+
+
+class VideoFolderWatcher:
+    """
+    监视文件夹，持续处理新落地的录像
+    Linux 上安装了 inotify_simple 时由文件事件驱动；否则轮询目录的修改时间，只有目录项变化时才重新列目录，
+    并且只对新出现的文件名做 stat。每个周期只 stat 尚未稳定的候选文件，
+    文件大小和修改时间在 stable_seconds 内不再变化才视为写入完成。
+    稳定的文件交给有界线程池调用 process_single_video，结果记入输出目录的处理清单，重启后不会重复处理。
+    live_mode 为真时（仅 encode 模式），可边录边读的容器（MKV、TS、分片 MP4）一出现就按尾随模式处理，
+    录制结束后只需处理最后一段。
+    """
+
+    def __init__(self, node, watch_folder, output_dir, process_kwargs, params_hash,
+                 max_workers=1, stable_seconds=10.0, poll_interval=2.0, use_inotify=True, live_mode=False):
+        self.node = node
+        self.watch_folder = watch_folder
+        self.output_dir = output_dir
+        self.process_kwargs = process_kwargs
+        self.params_hash = params_hash
+        self.stable_seconds = stable_seconds
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify and HAS_INOTIFY
+        self.live_mode = live_mode and process_kwargs.get('edit_mode', 'encode') == 'encode'
+
+        self.manifest = BatchManifest(output_dir)
+        remove_stale_partial_outputs(output_dir)
+        node.batch_manifest = self.manifest
+        node.batch_params_hash = params_hash
+
+        # 候选文件：路径 -> (大小, 修改时间ns, 最近一次变化的时刻)
+        self.candidates = {}
+        # 已提交或已判定跳过的文件身份：路径 -> (大小, 修改时间ns)，文件再次变化（轮询模式下为被替换或重新创建）后重新成为候选
+        self.handled = {}
+        # 正在处理的文件（尾随处理期间文件仍在变化，不能再次成为候选）
+        self.in_progress = set()
+        # 轮询模式：上次列目录时的目录修改时间和目录项（文件名 -> inode）
+        self.dir_mtime_ns = None
+        self.known_entries = {}
+        self.lock = threading.Lock()
+        self.stats = {'processed': 0, 'failed': 0, 'skipped': 0, 'in_flight': 0}
+
+        # 同时在处理或排队的文件数不超过 2 倍线程数，线程池满时暂停提交
+        self.executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)))
+        self.slots = threading.Semaphore(max(1, int(max_workers)) * 2)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """在后台线程中开始监视"""
+        self.thread = threading.Thread(target=self.run_forever, name="yx-watch-folder", daemon=True)
+        self.thread.start()
+
+    def stop(self, wait=True):
+        """停止监视；wait 为真时等待已提交的视频处理完"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.executor.shutdown(wait=wait)
+
+    def run_forever(self):
+        """监视主循环：启动时登记已有文件，之后只跟踪新事件或目录变化"""
+        logger.info(f"开始监视文件夹: {self.watch_folder} ({'inotify' if self.use_inotify else '轮询'}, "
+                    f"稳定等待 {self.stable_seconds}s)")
+        inotify = None
+        if self.use_inotify:
+            inotify = INotify()
+            inotify.add_watch(self.watch_folder, inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO |
+                              inotify_flags.CREATE | inotify_flags.MODIFY)
+
+        self._scan_directory()
+        try:
+            while not self.stop_event.is_set():
+                if inotify is not None:
+                    for event in inotify.read(timeout=int(self.poll_interval * 1000)):
+                        if event.name:
+                            self._touch_candidate(os.path.join(self.watch_folder, event.name))
+                else:
+                    self.stop_event.wait(self.poll_interval)
+                    self._scan_directory()
+                self._check_candidates()
+        finally:
+            if inotify is not None:
+                inotify.close()
+            logger.info(f"停止监视文件夹: {self.watch_folder}")
+
+    def _scan_directory(self):
+        """轮询目录：目录修改时间未变时不列目录；否则与上次的文件名集合比较，只 stat 新出现的文件
+
+        目录修改时间只反映文件的增删改名；已在写入的文件由候选集合跟踪，不依赖这里。
+        修改时间距今不足 DIR_MTIME_GRACE_SECONDS 时不信任它（粗粒度时间戳的文件系统上同一刻可能发生多次变化）
+        """
+        try:
+            dir_mtime_ns = os.stat(self.watch_folder).st_mtime_ns
+            settled = time.time_ns() - dir_mtime_ns > DIR_MTIME_GRACE_SECONDS * 1e9
+            if dir_mtime_ns == self.dir_mtime_ns and settled:
+                return
+
+            names = {}
+            with os.scandir(self.watch_folder) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    # inode 来自目录项本身，不需要 stat；同名文件被替换时 inode 变化，按新文件处理
+                    names[entry.name] = entry.inode()
+                    if self.known_entries.get(entry.name) == names[entry.name] or entry.path in self.candidates:
+                        continue
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    if self.handled.get(entry.path) != (stat.st_size, stat.st_mtime_ns):
+                        self.candidates[entry.path] = (stat.st_size, stat.st_mtime_ns, time.monotonic())
+
+            for name in self.known_entries.keys() - names.keys():
+                path = os.path.join(self.watch_folder, name)
+                self.candidates.pop(path, None)
+                self.handled.pop(path, None)
+            self.known_entries = names
+            self.dir_mtime_ns = dir_mtime_ns if settled else None
+        except OSError as e:
+            logger.warning(f"无法读取监视目录: {e}")
+
+    def _touch_candidate(self, path):
+        """inotify 事件：文件有写入，重新开始稳定计时"""
+        if os.path.basename(path).startswith('.'):
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.candidates.pop(path, None)
+            return
+        self.candidates[path] = (stat.st_size, stat.st_mtime_ns, time.monotonic())
+
+    def _check_candidates(self):
+        """stat 候选文件，大小和修改时间保持不变超过 stable_seconds 的提交处理"""
+        now = time.monotonic()
+        for path, (size, mtime_ns, since) in list(self.candidates.items()):
+            with self.lock:
+                processing = path in self.in_progress
+            if processing:
+                del self.candidates[path]
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                self.candidates.pop(path)
+                continue
+
+            if self.handled.get(path) == (stat.st_size, stat.st_mtime_ns):
+                del self.candidates[path]
+                continue
+            if self.live_mode and stat.st_size > 0 and is_streamable_recording(path):
+                # 录制中即可开始尾随处理，不等文件稳定
+                del self.candidates[path]
+                item = {'path': path, 'relative_dir': '', 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+                self.handled[path] = (stat.st_size, stat.st_mtime_ns)
+                if self.manifest.is_done(item, self.params_hash):
+                    with self.lock:
+                        self.stats['skipped'] += 1
+                    continue
+                self._submit(item, live=True)
+                continue
+
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                self.candidates[path] = (stat.st_size, stat.st_mtime_ns, now)
+                continue
+            if now - since < self.stable_seconds or stat.st_size == 0:
+                continue
+
+            del self.candidates[path]
+            self.handled[path] = (size, mtime_ns)
+            item = {'path': path, 'relative_dir': '', 'size': size, 'mtime_ns': mtime_ns}
+
+            if sniff_video_container(path) is None:
+                continue
+            if self.manifest.is_done(item, self.params_hash):
+                with self.lock:
+                    self.stats['skipped'] += 1
+                continue
+            self._submit(item)
+
+    def _submit(self, item, live=False):
+        """等到有空闲名额后提交处理（线程池满时监视循环在此等待）"""
+        while not self.slots.acquire(timeout=self.poll_interval):
+            if self.stop_event.is_set():
+                return
+        with self.lock:
+            self.stats['in_flight'] += 1
+            self.in_progress.add(item['path'])
+        self.node.batch_items[item['path']] = item
+        self.executor.submit(self._process, item, live)
+
+    def _process(self, item, live=False):
+        """线程池任务：处理一个稳定的新录像，live 为真时尾随仍在录制的文件"""
+        process_kwargs = dict(self.process_kwargs, tail_timeout=self.stable_seconds) if live else self.process_kwargs
+        try:
+            logger.info(f"监视文件夹: 开始{'尾随' if live else ''}处理 {os.path.basename(item['path'])}")
+            success, _ = self.node.process_single_video(item['path'], self.output_dir, **process_kwargs)
+        except Exception as e:
+            logger.error(f"监视文件夹: 处理异常 {os.path.basename(item['path'])} | 错误: {e}")
+            success = False
+        finally:
+            self.slots.release()
+
+        if live:
+            # 以录制结束后的文件身份登记，避免处理完后又被当作新文件
+            try:
+                stat = os.stat(item['path'])
+                self.handled[item['path']] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                pass
+
+        with self.lock:
+            self.in_progress.discard(item['path'])
+            self.stats['in_flight'] -= 1
+            self.stats['processed' if success else 'failed'] += 1
+
+    def status(self):
+        """当前状态的一行文字说明"""
+        with self.lock:
+            stats = dict(self.stats)
+        running = self.thread is not None and self.thread.is_alive()
+        return (f"{'运行中' if running else '已停止'} | 监视 {self.watch_folder} -> {self.output_dir} | "
+                f"完成 {stats['processed']}, 失败 {stats['failed']}, 跳过 {stats['skipped']}, "
+                f"处理中 {stats['in_flight']}, 等待稳定 {len(self.candidates)}")
+
+def run_job_queue_worker(queue_dir: str, worker_id: str = None, lease_seconds: float = JOB_LEASE_SECONDS,
+                         poll_interval: float = 2.0) -> dict:
+    """独立工作进程入口：领取 queue_dir 下共享任务队列中的任务直到处理完，返回成功/失败数
+
+    用于在没有运行工作流的渲染机上直接启动工作者，处理参数取自提交方写入队列的设置
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    job_queue = SharedJobQueue(queue_dir, lease_seconds)
+    return GameVideoAutoEditNode().run_queue_worker(job_queue, worker_id, poll_interval)
+
+# 正在运行的监视器：监视目录绝对路径 -> VideoFolderWatcher
+_WATCHERS = {}
+_WATCHERS_LOCK = threading.Lock()
+
+class GameVideoWatchFolderNode:
+    """
+    监视文件夹节点
+    在后台持续监视录像目录，新文件写入完成后自动剪辑；执行节点只负责启动/停止/查询，不会阻塞队列
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "watch_folder": ("STRING", {"default": "", "tooltip": "要监视的录像文件夹（支持相对路径和绝对路径）"}),
+                "output_folder_prefix": ("STRING", {"default": "game_auto_edit_watch", "tooltip": "输出文件夹名，位于ComfyUI输出目录下，固定不变以便重启后跳过已处理的录像"}),
+                "action": (["start", "stop", "status"], {"default": "start", "tooltip": "start=开始监视；stop=停止监视（等待处理中的视频完成）；status=查看状态"}),
+                "idle_threshold": EDIT_PARAM_INPUTS["idle_threshold"],
+                "min_segment_duration": EDIT_PARAM_INPUTS["min_segment_duration"],
+                "pixel_threshold": EDIT_PARAM_INPUTS["pixel_threshold"],
+            },
+            "optional": {
+                "preserve_buffer": EDIT_PARAM_INPUTS["preserve_buffer"],
+                "analysis_fps": EDIT_PARAM_INPUTS["analysis_fps"],
+                "edit_mode": EDIT_PARAM_INPUTS["edit_mode"],
+                "max_workers": ("INT", {"default": 1, "min": 1, "max": 16, "step": 1, "tooltip": "同时处理的录像数"}),
+                "stable_seconds": ("FLOAT", {"default": 10.0, "min": 1.0, "max": 600.0, "step": 1.0, "tooltip": "文件大小和修改时间保持不变多少秒后才认为录制完成"}),
+                "poll_interval": ("FLOAT", {"default": 2.0, "min": 0.5, "max": 60.0, "step": 0.5, "tooltip": "检查间隔（秒）。没有inotify时也是目录轮询间隔"}),
+                "live_recordings": ("BOOLEAN", {"default": False, "tooltip": "边录边剪（仅encode模式）：MKV/TS/分片MP4一出现就尾随分析并编码已确定的片段，超过稳定等待时间无新数据视为录制结束"}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("watch_status",)
+    FUNCTION = "watch_folder"
+    CATEGORY = "YX剪辑"
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        """监视器状态随时间变化，每次执行都要重新运行，不能复用 ComfyUI 缓存的上次输出（NaN 与任何值都不相等）"""
+        return float("nan")
+
+    def watch_folder(self, watch_folder: str, output_folder_prefix: str, action: str, idle_threshold: float,
+                     min_segment_duration: float, pixel_threshold: int, preserve_buffer: float = 1.0,
+                     analysis_fps: float = 0.0, edit_mode: str = "encode", max_workers: int = 1,
+                     stable_seconds: float = 10.0, poll_interval: float = 2.0, live_recordings: bool = False):
+        """启动、停止或查询监视器"""
+        watch_path = resolve_path(watch_folder)
+
+        with _WATCHERS_LOCK:
+            watcher = _WATCHERS.get(watch_path)
+
+            if action == "status":
+                return (watcher.status() if watcher else f"未在监视: {watch_path}",)
+
+            if action == "stop":
+                _WATCHERS.pop(watch_path, None)
+            else:
+                if watcher is not None:
+                    return (f"已在监视，如需修改参数请先停止 | {watcher.status()}",)
+                if not os.path.isdir(watch_path):
+                    logger.warning(f"监视目录不存在: {watch_path}")
+                    return (f"监视目录不存在: {watch_path}",)
+
+                output_dir = os.path.join(folder_paths.get_output_directory(), output_folder_prefix)
+                os.makedirs(output_dir, exist_ok=True)
+
+                editor = GameVideoAutoEditNode()
+                editor.min_segment_duration = min_segment_duration
+                editor.score_cache = MotionScoreCache()
+                process_kwargs = {
+                    'idle_threshold': idle_threshold, 'pixel_threshold': pixel_threshold,
+                    'preserve_buffer': preserve_buffer, 'analysis_fps': analysis_fps, 'edit_mode': edit_mode,
+                }
+                params_hash = batch_params_hash(idle_threshold, min_segment_duration, pixel_threshold, preserve_buffer,
+                                                "opencv", analysis_fps, edit_mode, "balanced")
+
+                watcher = VideoFolderWatcher(editor, watch_path, output_dir, process_kwargs, params_hash,
+                                             max_workers, stable_seconds, poll_interval, live_mode=live_recordings)
+                watcher.start()
+                _WATCHERS[watch_path] = watcher
+                return (watcher.status(),)
+
+        # stop：等待处理中的视频完成可能很久，在锁外等待，不阻塞其他监视节点的调用
+        if watcher is None:
+            return (f"未在监视: {watch_path}",)
+        watcher.stop()
+        return (watcher.status(),)
+
+
 # 节点映射
 NODE_CLASS_MAPPINGS = {
-    "GameVideoAutoEditNode": GameVideoAutoEditNode
+    "GameVideoAutoEditNode": GameVideoAutoEditNode,
+    "GameVideoParamSweepNode": GameVideoParamSweepNode,
+    "GameVideoWatchFolderNode": GameVideoWatchFolderNode
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
-    "GameVideoAutoEditNode": "批量视频精彩时刻剪辑"
-}
\ No newline at end of file
+    "GameVideoAutoEditNode": "批量视频精彩时刻剪辑",
+    "GameVideoParamSweepNode": "视频剪辑参数扫描",
+    "GameVideoWatchFolderNode": "监视文件夹自动剪辑"
+}
+
+if __name__ == "__main__":
+    # 独立的共享队列工作进程，不需要 ComfyUI：python nodes/game_video_auto_edit.py <队列目录>
+    import argparse
+
+    parser = argparse.ArgumentParser(description="领取共享任务队列中的视频剪辑任务，直到队列处理完")
+    parser.add_argument("queue_dir", help="job_queue.sqlite 所在目录，即 共享目录/<输出前缀>")
+    parser.add_argument("--worker-id", default=None, help="工作者名称，默认 主机名-进程号")
+    parser.add_argument("--lease-seconds", type=float, default=JOB_LEASE_SECONDS, help="任务租约时长（秒）")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="等待其他工作者时的检查间隔（秒）")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.queue_dir, SharedJobQueue.FILENAME)):
+        parser.error(f"找不到任务队列: {os.path.join(args.queue_dir, SharedJobQueue.FILENAME)}")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    handled = run_job_queue_worker(args.queue_dir, args.worker_id, args.lease_seconds, args.poll_interval)
+    sys.exit(1 if handled['failed'] else 0)
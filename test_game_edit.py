@@ -30,6 +30,29 @@ class MockFolderPaths:
 # 替换导入
 sys.modules['folder_paths'] = MockFolderPaths()
 
+# 测试使用独立的缓存目录
+os.environ.setdefault('YX_EASYUSE_CACHE_DIR', tempfile.mkdtemp(prefix="game_test_cache_"))
+
+def add_test_audio(video_path, output_path, duration):
+    """给测试视频配上正弦波音轨（AAC），视频流直接复制"""
+    import ffmpeg
+    audio = ffmpeg.input(f'sine=frequency=440:sample_rate=48000:duration={duration}', f='lavfi').audio
+    (
+        ffmpeg
+        .output(ffmpeg.input(video_path).video, audio, output_path, vcodec='copy', acodec='aac')
+        .run(overwrite_output=True, quiet=True)
+    )
+
+def audio_video_gap(path, fps):
+    """输出文件音轨时长与视频时长之差（秒），解码出 PCM 计算音频时长"""
+    import subprocess
+    pcm = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", path, "-map", "0:a", "-f", "s16le", "-ac", "1", "-ar", "48000", "-"],
+        capture_output=True, check=True
+    ).stdout
+    frames = cv2.VideoCapture(path).get(cv2.CAP_PROP_FRAME_COUNT)
+    return len(pcm) / 2 / 48000 - frames / fps
+
 def create_test_game_video(output_path, duration=8, fps=30):
     """创建测试游戏视频"""
     width, height = 640, 480
@@ -186,6 +209,1685 @@ def test_game_video_edit():
         except:
             pass
 
+def test_analysis_backends():
+    """测试 opencv / ffmpeg 两种分析后端输出一致"""
+    from nodes.game_video_auto_edit import GameVideoAutoEditNode
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_backend_")
+    try:
+        video_path = os.path.join(test_dir, "backend_game.mp4")
+        create_test_game_video(video_path, duration=8, fps=30)
+
+        node = GameVideoAutoEditNode()
+        node.min_segment_duration = 3.0
+
+        cv_scores, cv_idle = node.detect_motion_simple(video_path, 0.020, 35, analysis_backend="opencv")
+        ff_scores, ff_idle = node.detect_motion_simple(video_path, 0.020, 35, analysis_backend="ffmpeg")
+
+        assert len(cv_scores) == len(ff_scores), f"分数长度不一致: {len(cv_scores)} vs {len(ff_scores)}"
+        max_diff = float(np.max(np.abs(np.asarray(cv_scores) - np.asarray(ff_scores))))
+        logger.info(f"后端分数最大差异: {max_diff:.6f}")
+        assert max_diff < 0.01, f"后端分数差异过大: {max_diff}"
+        assert [s['start_frame'] for s in cv_idle] == [s['start_frame'] for s in ff_idle]
+
+        logger.info("✅ 分析后端一致性测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_strided_analysis():
+    """测试按采样帧率分析时，分数长度和无操作片段时间戳与逐帧分析一致"""
+    from nodes.game_video_auto_edit import GameVideoAutoEditNode
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_stride_")
+    try:
+        video_path = os.path.join(test_dir, "stride_game.mp4")
+        create_test_game_video(video_path, duration=8, fps=30)
+
+        node = GameVideoAutoEditNode()
+        node.min_segment_duration = 3.0
+
+        full_scores, full_idle = node.detect_motion_simple(video_path, 0.020, 35)
+        for analysis_fps in (10, 5):
+            scores, idle = node.detect_motion_simple(video_path, 0.020, 35, analysis_fps=analysis_fps)
+            assert len(scores) == len(full_scores), f"采样分析分数长度不一致: {len(scores)} vs {len(full_scores)}"
+            assert len(idle) == len(full_idle)
+            for a, b in zip(idle, full_idle):
+                assert abs(a['start_time'] - b['start_time']) <= 0.5
+                assert abs(a['end_time'] - b['end_time']) <= 0.5
+            logger.info(f"analysis_fps={analysis_fps}: {[(s['start_time'], s['end_time']) for s in idle]}")
+
+        logger.info("✅ 采样分析测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def _analyze_in_pool_worker(video_path):
+    """在分析进程池的工作进程中计算运动分数，嵌套创建进程池时报错"""
+    from nodes import game_video_auto_edit as mod
+
+    original_plan = mod.plan_analysis_chunks
+    mod.plan_analysis_chunks = lambda total_frames, num_chunks, stride=1: original_plan(
+        total_frames, num_chunks, stride, min_chunk_frames=30
+    )
+    node = mod.GameVideoAutoEditNode()
+    def fail_nested(*args, **kwargs):
+        raise AssertionError("分析工作进程内不应再嵌套创建进程池")
+    node._motion_scores_parallel = fail_nested
+    scores, _ = node.compute_motion_scores(video_path, 35, analysis_workers=4)
+    return mod._IN_ANALYSIS_WORKER, len(scores)
+
+def test_parallel_chunked_analysis():
+    """测试单视频分段并行分析的结果与顺序分析完全一致"""
+    from nodes.game_video_auto_edit import GameVideoAutoEditNode, analyze_frame_range, plan_analysis_chunks
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_chunks_")
+    try:
+        video_path = os.path.join(test_dir, "chunk_game.mp4")
+        create_test_game_video(video_path, duration=10, fps=30)
+
+        node = GameVideoAutoEditNode()
+        for stride in (1, 3):
+            sequential, _ = analyze_frame_range(video_path, 35, stride=stride, total_frames=300, fps=30.0,
+                                                log_progress=False)
+            chunks = plan_analysis_chunks(300, 4, stride, min_chunk_frames=30)
+            assert len(chunks) == 4
+            parallel, _ = node._motion_scores_parallel(video_path, 35, "opencv", stride, 300, 30.0, chunks)
+            assert np.array_equal(sequential.array(), parallel.array()), f"stride={stride} 并行结果与顺序结果不一致"
+
+        # 分析进程池的工作进程内不再嵌套创建进程池，改为顺序分析
+        from concurrent.futures import ProcessPoolExecutor
+        from nodes.game_video_auto_edit import _init_analysis_worker
+        with ProcessPoolExecutor(max_workers=1, initializer=_init_analysis_worker, initargs=(1,)) as executor:
+            in_worker, num_scores = executor.submit(_analyze_in_pool_worker, video_path).result()
+        assert in_worker and num_scores == len(node.compute_motion_scores(video_path, 35)[0])
+
+        logger.info("✅ 分段并行分析测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_score_cache():
+    """测试运动分数磁盘缓存的命中、失效与 LRU 淘汰"""
+    from nodes.game_video_auto_edit import GameVideoAutoEditNode, MotionScoreCache
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_score_cache_")
+    try:
+        video_path = os.path.join(test_dir, "cache_game.mp4")
+        create_test_game_video(video_path, duration=4, fps=30)
+
+        node = GameVideoAutoEditNode()
+        node.score_cache = MotionScoreCache(cache_dir=test_dir)
+
+        params = {'pixel_threshold': 35}
+        assert node.score_cache.get(video_path, params) is None
+
+        scores, fps = node.compute_motion_scores(video_path, 35)
+        cached_scores, _ = node.compute_motion_scores(video_path, 35)
+        assert np.array_equal(scores, cached_scores)
+
+        # 分析参数不同则不命中
+        other_params = {'pixel_threshold': 50, 'analysis_size': [320, 240], 'analysis_backend': 'opencv', 'stride': 1}
+        assert node.score_cache.get(video_path, other_params) is None
+
+        # 修改时间变化后缓存失效
+        stat = os.stat(video_path)
+        os.utime(video_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        hit_params = {'pixel_threshold': 35, 'analysis_size': [320, 240], 'analysis_backend': 'opencv', 'stride': 1}
+        assert node.score_cache.get(video_path, hit_params) is None
+
+        # 超出容量时淘汰最久未访问的条目
+        small_cache = MotionScoreCache(cache_dir=os.path.join(test_dir, "small"), max_bytes=3000)
+        small_cache.put(video_path, {'n': 1}, np.zeros(200))
+        small_cache.put(video_path, {'n': 2}, np.zeros(200))
+        assert small_cache.get(video_path, {'n': 1}) is None
+        assert small_cache.get(video_path, {'n': 2}) is not None
+
+        logger.info("✅ 运动分数缓存测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_param_sweep():
+    """测试参数扫描结果与逐组调用 detect_idle_segments / create_active_segments 一致"""
+    from nodes.game_video_auto_edit import GameVideoAutoEditNode
+
+    rng = np.random.default_rng(0)
+    # 模拟交替出现的操作/停顿片段
+    pieces = []
+    for _ in range(40):
+        pieces.append(rng.uniform(0.03, 0.2, size=rng.integers(10, 200)))
+        pieces.append(rng.uniform(0.0, 0.02, size=rng.integers(10, 400)))
+    motion_scores = np.concatenate(pieces)
+    fps = 30.0
+    total_duration = (len(motion_scores) + 1) / fps
+
+    node = GameVideoAutoEditNode()
+    thresholds = [0.005, 0.01, 0.015, 0.02]
+    durations = [1.0, 3.0, 5.0]
+    buffers = [0.0, 0.5, 1.0, 2.0]
+    results = node.sweep_segmentation_params(motion_scores, fps, total_duration, thresholds, durations, buffers)
+    assert len(results) == len(thresholds) * len(durations) * len(buffers)
+
+    smoothed = node.smooth_motion_scores(motion_scores)
+    for r in results:
+        idle = node.detect_idle_segments(smoothed, fps, r['idle_threshold'], r['min_segment_duration'])
+        active = node.create_active_segments(idle, total_duration, r['preserve_buffer'])
+        assert r['idle_segments_count'] == len(idle)
+        assert abs(r['total_idle_time'] - sum(seg['duration'] for seg in idle)) < 1e-6
+        assert r['active_segments_count'] == len(active)
+        assert abs(r['output_duration'] - sum(seg['end_time'] - seg['start_time'] for seg in active)) < 1e-6
+
+    logger.info("✅ 参数扫描测试通过")
+    return True
+
+def _legacy_smooth_motion_scores(scores, window_size=3):
+    """逐帧循环的平滑实现（向量化前的版本），用于对比"""
+    if len(scores) < window_size:
+        return scores
+    smoothed = []
+    for i in range(len(scores)):
+        start = max(0, i - window_size // 2)
+        end = min(len(scores), i + window_size // 2 + 1)
+        smoothed.append(np.mean(scores[start:end]))
+    return smoothed
+
+def _legacy_detect_idle_segments(motion_scores, fps, idle_threshold, min_duration):
+    """逐帧循环的无操作检测实现（向量化前的版本），用于对比"""
+    segments = []
+    start_frame = None
+    for i, score in enumerate(motion_scores):
+        is_idle = score < idle_threshold
+        if is_idle and start_frame is None:
+            start_frame = i
+        elif not is_idle and start_frame is not None:
+            duration = (i - start_frame) / fps
+            if duration >= min_duration:
+                segments.append({'start_frame': start_frame, 'end_frame': i, 'start_time': start_frame / fps,
+                                 'end_time': i / fps, 'duration': duration})
+            start_frame = None
+    if start_frame is not None:
+        duration = (len(motion_scores) - start_frame) / fps
+        if duration >= min_duration:
+            segments.append({'start_frame': start_frame, 'end_frame': len(motion_scores),
+                             'start_time': start_frame / fps, 'end_time': len(motion_scores) / fps,
+                             'duration': duration})
+    return segments
+
+def _synthetic_motion_scores(num_frames, seed=0):
+    """生成交替出现操作/停顿的模拟运动分数"""
+    rng = np.random.default_rng(seed)
+    pieces = [np.zeros(0)]
+    total = 0
+    while total < num_frames:
+        active = rng.uniform(0.03, 0.2, size=rng.integers(10, 600))
+        idle = rng.uniform(0.0, 0.02, size=rng.integers(10, 900))
+        pieces.extend([active, idle])
+        total += len(active) + len(idle)
+    return np.concatenate(pieces)[:num_frames]
+
+def test_vectorized_segmentation():
+    """测试向量化平滑和游程编码分段与逐帧循环实现结果一致"""
+    from nodes.game_video_auto_edit import GameVideoAutoEditNode
+
+    node = GameVideoAutoEditNode()
+    for num_frames in (0, 1, 2, 3, 10, 5000):
+        scores = _synthetic_motion_scores(num_frames, seed=num_frames)
+        for window_size in (3, 5):
+            expected = _legacy_smooth_motion_scores(list(scores), window_size)
+            actual = node.smooth_motion_scores(scores, window_size)
+            assert len(actual) == len(expected)
+            assert np.allclose(actual, expected, rtol=0, atol=1e-12)
+
+        smoothed = node.smooth_motion_scores(scores)
+        for idle_threshold in (0.01, 0.02):
+            for min_duration in (0.0, 1.0, 3.0):
+                expected = _legacy_detect_idle_segments(smoothed, 30.0, idle_threshold, min_duration)
+                actual = node.detect_idle_segments(smoothed, 30.0, idle_threshold, min_duration)
+                assert actual == expected, f"分段结果不一致: frames={num_frames}, threshold={idle_threshold}"
+
+    logger.info("✅ 向量化分段测试通过")
+    return True
+
+def test_score_buffer():
+    """测试预分配分数缓冲区在容器帧数偏小时按块扩容，并支持原位平滑"""
+    from nodes.game_video_auto_edit import (
+        GameVideoAutoEditNode, ScoreBuffer, get_current_rss_mb, get_peak_rss_mb
+    )
+
+    buffer = ScoreBuffer(4, grow_frames=8)
+    buffer.append(0.5)
+    buffer.append(0.25, 3)
+    buffer.extend([0.1, 0.2])
+    buffer.pad_to(10)
+
+    scores = buffer.array()
+    assert scores.dtype == np.float32
+    assert len(scores) == 10
+    assert np.allclose(scores, [0.5, 0.25, 0.25, 0.25, 0.1, 0.2, 0.2, 0.2, 0.2, 0.2])
+
+    node = GameVideoAutoEditNode()
+    out = np.empty_like(scores)
+    smoothed = node.smooth_motion_scores(scores, out=out)
+    assert smoothed is out
+    assert np.allclose(smoothed, _legacy_smooth_motion_scores(list(scores)), atol=1e-6)
+
+    # 原位平滑（out 就是输入）分块计算，结果与新建数组逐位一致
+    rng = np.random.default_rng(1)
+    for window_size in (3, 5):
+        for block_frames in (1, 2, 7, 1000):
+            data = rng.random(103).astype(np.float32)
+            expected = node.smooth_motion_scores(data, window_size)
+            inplace = data.copy()
+            result = node.smooth_motion_scores(inplace, window_size, out=inplace, block_frames=block_frames)
+            assert result is inplace
+            assert np.array_equal(result, expected), (window_size, block_frames)
+
+    # 当前 RSS 能反映新分配的内存，进程峰值不低于当前值
+    if os.path.exists("/proc/self/statm"):
+        rss_before = get_current_rss_mb()
+        block = np.ones(64 * 1024 * 1024 // 8)
+        assert get_current_rss_mb() - rss_before > 32, block.nbytes
+        assert get_peak_rss_mb() >= get_current_rss_mb() - 1
+        del block
+
+    logger.info("✅ 分数缓冲区测试通过")
+    return True
+
+def test_online_segmenter():
+    """测试增量分段器逐帧输出的片段与整体平滑+分段的结果一致"""
+    from nodes.game_video_auto_edit import GameVideoAutoEditNode, OnlineSegmenter
+
+    node = GameVideoAutoEditNode()
+    for num_frames in (1, 2, 3, 10, 3000):
+        scores = _synthetic_motion_scores(num_frames, seed=num_frames)
+        total_duration = (num_frames + 1) / 30.0
+        smoothed = node.smooth_motion_scores(scores)
+        for idle_threshold in (0.01, 0.02):
+            for min_duration in (1.0, 3.0):
+                for preserve_buffer in (0.0, 1.0):
+                    idle = node.detect_idle_segments(smoothed, 30.0, idle_threshold, min_duration)
+                    expected = node.create_active_segments(idle, total_duration, preserve_buffer)
+
+                    segmenter = OnlineSegmenter(30.0, idle_threshold, min_duration, preserve_buffer)
+                    emitted = []
+                    for value in scores:
+                        emitted.extend(segmenter.push(value))
+                    emitted.extend(segmenter.finish(total_duration))
+
+                    assert segmenter.idle_segments == idle, f"无操作片段不一致: frames={num_frames}"
+                    assert len(emitted) == len(expected)
+                    for a, b in zip(emitted, expected):
+                        assert abs(a['start_time'] - b['start_time']) < 1e-9
+                        assert abs(a['end_time'] - b['end_time']) < 1e-9
+
+    logger.info("✅ 增量分段测试通过")
+    return True
+
+def test_streaming_edit():
+    """测试边分析边剪辑的片段划分与普通模式一致，并能输出拼接后的视频"""
+    from nodes.game_video_auto_edit import GameVideoAutoEditNode
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_streaming_")
+    try:
+        video_path = os.path.join(test_dir, "stream_game.mp4")
+        create_test_game_video(video_path, duration=10, fps=30)
+
+        node = GameVideoAutoEditNode()
+        node.min_segment_duration = 3.0
+
+        _, batch_idle = node.detect_motion_simple(video_path, 0.020, 35)
+        output_path = os.path.join(test_dir, "stream_game_edited.mp4")
+        result = node.stream_edit_video(video_path, output_path, 0.020, 35, 0.5)
+        assert result is not None
+        idle_segments, active_segments, total_duration, _, success = result
+
+        assert idle_segments == batch_idle
+        assert active_segments == node.create_active_segments(batch_idle, total_duration, 0.5)
+        assert success and os.path.exists(output_path)
+        assert not [d for d in os.listdir(test_dir) if d.startswith(".stream_parts_")], "临时片段目录未清理"
+
+        # 有音频时分段只编码视频，音频统一编码一次，分段边界不会累积 AAC 间隙
+        audio_path = os.path.join(test_dir, "stream_audio.mp4")
+        add_test_audio(video_path, audio_path, 10)
+        node.detect_audio = lambda path: True
+        audio_output = os.path.join(test_dir, "stream_audio_edited.mp4")
+        result = node.stream_edit_video(audio_path, audio_output, 0.020, 35, 0.5)
+        assert result is not None and result[4] and len(result[1]) > 1
+        assert abs(audio_video_gap(audio_output, 30)) < 0.03
+
+        logger.info("✅ 流式剪辑测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_keyframe_copy_mode():
+    """测试 copy 模式的关键帧对齐规则，并验证无损切割+拼接的输出时长"""
+    import ffmpeg
+    from nodes.game_video_auto_edit import GameVideoAutoEditNode, snap_segments_to_keyframes
+
+    keyframes = [0.0, 2.0, 4.0, 6.0, 8.0]
+    segments = [
+        {'start_time': 0.5, 'end_time': 2.5},
+        {'start_time': 3.0, 'end_time': 4.0},
+        {'start_time': 6.5, 'end_time': 8.5},
+    ]
+    snapped = snap_segments_to_keyframes(segments, keyframes, 9.0)
+    # 起点向前、终点向后对齐，重叠的片段合并；最后一个关键帧之后延伸到结尾
+    assert snapped == [{'start_time': 0.0, 'end_time': 4.0}, {'start_time': 6.0, 'end_time': 9.0}], snapped
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_copy_")
+    try:
+        # 生成每秒一个关键帧的 H.264 测试视频
+        video_path = os.path.join(test_dir, "copy_game.mp4")
+        (
+            ffmpeg
+            .input('testsrc=size=320x240:rate=30:duration=8', f='lavfi')
+            .output(video_path, vcodec='libx264', g=30, keyint_min=30, sc_threshold=0, pix_fmt='yuv420p')
+            .run(overwrite_output=True, quiet=True)
+        )
+
+        node = GameVideoAutoEditNode()
+        output_path = os.path.join(test_dir, "copy_game_edited.mp4")
+        copy_segments = [{'start_time': 1.0, 'end_time': 3.0}, {'start_time': 5.0, 'end_time': 7.0}]
+        assert node.copy_video_segments(video_path, copy_segments, output_path, fps=30.0)
+
+        cap = cv2.VideoCapture(output_path)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        assert frame_count == 120, f"无损切割输出帧数异常: {frame_count}"
+        assert not [d for d in os.listdir(test_dir) if d.startswith(".copy_parts_")], "临时片段目录未清理"
+
+        logger.info("✅ 无损切割模式测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_smart_render_mode():
+    """测试 smart 模式的分片计划，并验证输出逐帧对应源视频的精彩片段"""
+    import ffmpeg
+    from nodes.game_video_auto_edit import GameVideoAutoEditNode, plan_smart_render
+
+    keyframes = [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0]
+    pieces = plan_smart_render([{'start_time': 0.5, 'end_time': 3.4}, {'start_time': 5.2, 'end_time': 5.8}], keyframes, 30.0)
+    assert [(p['start_time'], p['end_time'], p['mode']) for p in pieces] == [
+        (0.5, 1.0, 'encode'), (1.0, 3.0, 'copy'), (3.0, 3.4, 'encode'), (5.2, 5.8, 'encode')
+    ], pieces
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_smart_")
+    try:
+        video_path = os.path.join(test_dir, "smart_game.mp4")
+        (
+            ffmpeg
+            .output(
+                ffmpeg.input('testsrc=size=320x240:rate=30:duration=8', f='lavfi'),
+                ffmpeg.input('sine=duration=8', f='lavfi'),
+                video_path, vcodec='libx264', acodec='aac', g=30, keyint_min=30, sc_threshold=0, pix_fmt='yuv420p'
+            )
+            .run(overwrite_output=True, quiet=True)
+        )
+
+        node = GameVideoAutoEditNode()
+        output_path = os.path.join(test_dir, "smart_game_edited.mp4")
+        segments = [{'start_time': 0.5, 'end_time': 3.4}, {'start_time': 5.2, 'end_time': 5.8}]
+        codec_info = {'codec_name': 'h264', 'encoder': 'libx264', 'bsf': 'h264_mp4toannexb', 'profile': 'high',
+                      'pix_fmt': 'yuv420p', 'fps': 30.0, 'timescale': None}
+        assert node.smart_render_segments(video_path, segments, output_path, keyframes, codec_info, has_audio=True)
+
+        def read_frames(path):
+            cap = cv2.VideoCapture(path)
+            frames = []
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.append(frame.astype(np.int16))
+            cap.release()
+            return frames
+
+        source_frames = read_frames(video_path)
+        output_frames = read_frames(output_path)
+        expected_indices = list(range(15, 102)) + list(range(156, 174))
+        assert len(output_frames) == len(expected_indices), f"smart输出帧数异常: {len(output_frames)}"
+        for out_frame, src_index in zip(output_frames, expected_indices):
+            assert np.abs(out_frame - source_frames[src_index]).mean() < 5, f"帧内容不匹配: 源帧 {src_index}"
+        assert not [d for d in os.listdir(test_dir) if d.startswith(".smart_parts_")], "临时片段目录未清理"
+
+        logger.info("✅ smart剪辑模式测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_single_decoder_multi_segment():
+    """测试多片段剪辑只打开一次输入，且输出帧与源视频各片段逐帧对应"""
+    import ffmpeg
+    from nodes.game_video_auto_edit import GameVideoAutoEditNode, build_segment_select_expr
+
+    segments = [{'start_time': 0.5, 'end_time': 2.0}, {'start_time': 4.0, 'end_time': 5.5}, {'start_time': 7.0, 'end_time': 8.0}]
+    assert build_segment_select_expr(segments[:1]) == "gte(t,0.500000)*lt(t,2.000000)"
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_select_")
+    try:
+        video_path = os.path.join(test_dir, "select_game.mp4")
+        (
+            ffmpeg
+            .input('testsrc=size=320x240:rate=30:duration=8', f='lavfi')
+            .output(video_path, vcodec='libx264', pix_fmt='yuv420p')
+            .run(overwrite_output=True, quiet=True)
+        )
+
+        node = GameVideoAutoEditNode()
+        output_path = os.path.join(test_dir, "select_game_edited.mp4")
+
+        # 命令行中只出现一个 -i
+        captured = []
+        original_run = ffmpeg.run
+        def capture_run(stream, **kwargs):
+            captured.append(ffmpeg.compile(stream))
+            return original_run(stream, **kwargs)
+        ffmpeg.run = capture_run
+        try:
+            assert node.edit_video_segments(video_path, segments, output_path)
+        finally:
+            ffmpeg.run = original_run
+        assert captured and captured[-1].count('-i') == 1, captured
+
+        cap = cv2.VideoCapture(video_path)
+        source_frames = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            source_frames.append(frame.astype(np.int16))
+        cap.release()
+
+        cap = cv2.VideoCapture(output_path)
+        output_frames = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            output_frames.append(frame.astype(np.int16))
+        cap.release()
+
+        expected_indices = list(range(15, 60)) + list(range(120, 165)) + list(range(210, 240))
+        assert len(output_frames) == len(expected_indices), f"输出帧数异常: {len(output_frames)}"
+        for out_frame, src_index in zip(output_frames, expected_indices):
+            assert np.abs(out_frame - source_frames[src_index]).mean() < 5, f"帧内容不匹配: 源帧 {src_index}"
+
+        logger.info("✅ 单解码器多片段剪辑测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_parallel_segment_encoding():
+    """测试精彩片段均分为工作单元并行编码，拼接结果逐帧对应源视频"""
+    import ffmpeg
+    from nodes.game_video_auto_edit import GameVideoAutoEditNode, plan_encode_units
+
+    segments = [{'start_time': 1.0, 'end_time': 13.0}, {'start_time': 15.0, 'end_time': 27.5}, {'start_time': 30.0, 'end_time': 35.0}]
+    units = plan_encode_units(segments, 3, 30.0, min_unit_duration=5.0)
+    assert len(units) == 3
+    # 单元首尾相接、覆盖全部片段，切点位于两帧之间
+    flat = [seg for unit in units for seg in unit]
+    assert flat[0]['start_time'] == 1.0 and flat[-1]['end_time'] == 35.0
+    assert abs(sum(seg['end_time'] - seg['start_time'] for seg in flat) - 29.5) < 1e-9
+    for unit in units[:-1]:
+        assert abs(unit[-1]['end_time'] * 30.0 % 1 - 0.5) < 1e-6
+    assert len(plan_encode_units(segments, 8, 30.0)) == 2
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_parallel_encode_")
+    try:
+        video_path = os.path.join(test_dir, "parallel_game.mp4")
+        (
+            ffmpeg
+            .input('testsrc=size=160x120:rate=30:duration=36', f='lavfi')
+            .output(video_path, vcodec='libx264', pix_fmt='yuv420p')
+            .run(overwrite_output=True, quiet=True)
+        )
+
+        node = GameVideoAutoEditNode()
+        output_path = os.path.join(test_dir, "parallel_game_edited.mp4")
+        assert node.edit_video_segments(video_path, segments, output_path, encode_workers=2)
+
+        def read_frames(path):
+            cap = cv2.VideoCapture(path)
+            frames = []
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.append(frame.astype(np.int16))
+            cap.release()
+            return frames
+
+        source_frames = read_frames(video_path)
+        output_frames = read_frames(output_path)
+        expected_indices = list(range(30, 390)) + list(range(450, 825)) + list(range(900, 1050))
+        assert len(output_frames) == len(expected_indices), f"输出帧数异常: {len(output_frames)}"
+        for out_frame, src_index in zip(output_frames, expected_indices):
+            assert np.abs(out_frame - source_frames[src_index]).mean() < 6, f"帧内容不匹配: 源帧 {src_index}"
+        assert not [d for d in os.listdir(test_dir) if d.startswith(".encode_parts_")], "临时片段目录未清理"
+
+        logger.info("✅ 并行分段编码测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_resource_scheduler():
+    """测试 CPU 预算在并发视频、分析线程和编码线程之间的分配不超额订阅"""
+    from nodes.game_video_auto_edit import GameVideoAutoEditNode, ResourceScheduler
+
+    budget = ResourceScheduler(cpu_count=32).plan(10, analysis_workers=1, encode_workers=1, encode_profile="throughput")
+    assert budget['video_workers'] == 8 and budget['cores_per_video'] == 4
+    assert (budget['analysis_workers'], budget['analysis_threads']) == (1, 4)
+    assert (budget['encode_workers'], budget['encode_threads']) == (1, 4)
+    assert budget['preset'] == 'veryfast'
+
+    budget = ResourceScheduler(cpu_count=4).plan(3, analysis_workers=8, encode_workers=0)
+    assert budget['video_workers'] == 1
+    assert (budget['analysis_workers'], budget['analysis_threads']) == (4, 1)
+    assert (budget['encode_workers'], budget['encode_threads']) == (4, 1)
+
+    for cpu_count in (1, 2, 4, 6, 16, 32, 64):
+        for num_videos in (1, 2, 5, 40):
+            for workers in (0, 1, 3, 16):
+                budget = ResourceScheduler(cpu_count).plan(num_videos, max(1, workers), workers)
+                analysis_total = budget['video_workers'] * budget['analysis_workers'] * budget['analysis_threads']
+                encode_total = budget['video_workers'] * budget['encode_workers'] * budget['encode_threads']
+                assert analysis_total <= cpu_count and encode_total <= cpu_count, budget
+
+    node = GameVideoAutoEditNode()
+    assert node.encode_settings() == {'preset': 'medium', 'crf': 23}
+    node.resource_budget = ResourceScheduler(cpu_count=8).plan(1, encode_profile="throughput")
+    assert node.encode_settings() == {'preset': 'veryfast', 'crf': 23, 'threads': 8}
+    assert node.encode_settings(threads=2)['threads'] == 2
+
+    logger.info("✅ 资源预算调度测试通过")
+    return True
+
+def test_two_stage_pipeline():
+    """测试分析/编码两阶段流水线的预算划分、输出文件和各阶段空闲统计"""
+    from nodes.game_video_auto_edit import GameVideoAutoEditNode, ResourceScheduler
+
+    budget = ResourceScheduler(cpu_count=32).plan_pipeline(20, analysis_workers=2, encode_workers=1)
+    assert (budget['analysis_cores'], budget['encode_cores']) == (8, 24)
+    assert budget['analysis_pool'] == 4 and budget['analysis_threads'] == 1
+    assert budget['encode_pool'] == 6 and budget['encode_threads'] == 4
+    for cpu_count in (1, 2, 4, 8, 32):
+        budget = ResourceScheduler(cpu_count).plan_pipeline(10, analysis_workers=1, encode_workers=0)
+        analysis_total = budget['analysis_pool'] * budget['analysis_workers'] * budget['analysis_threads']
+        encode_total = budget['encode_pool'] * budget['encode_workers'] * budget['encode_threads']
+        assert analysis_total + encode_total <= max(2, cpu_count), budget
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_pipeline_")
+    try:
+        input_dir = os.path.join(test_dir, "input")
+        output_dir = os.path.join(test_dir, "output")
+        os.makedirs(input_dir)
+        os.makedirs(output_dir)
+        video_files = []
+        for i in range(3):
+            video_path = os.path.join(input_dir, f"pipeline_game_{i}.mp4")
+            create_test_game_video(video_path, duration=8, fps=30)
+            video_files.append(video_path)
+
+        node = GameVideoAutoEditNode()
+        budget = ResourceScheduler(cpu_count=4).plan_pipeline(len(video_files))
+        node.resource_budget = budget
+        analysis_settings = {
+            'idle_threshold': 0.020, 'min_segment_duration': 3.0, 'pixel_threshold': 35, 'preserve_buffer': 0.5,
+            'analysis_backend': 'opencv', 'analysis_fps': 0.0, 'use_score_cache': False,
+        }
+        stats = node.run_pipeline(video_files, output_dir, analysis_settings, "encode", budget)
+
+        assert node.processed_count == 3 and len(node.analysis_results) == 3
+        assert sorted(os.listdir(output_dir)) == [f"pipeline_game_{i}_edited.mp4" for i in range(3)]
+        assert all(r['analysis_seconds'] > 0 and r['encode_seconds'] > 0 for r in node.analysis_results)
+        assert stats['analysis_busy_seconds'] > 0 and stats['encode_busy_seconds'] > 0
+        # 编码线程至少要等第一个视频分析完成
+        assert stats['encode_idle_seconds'] > 0
+
+        logger.info(f"流水线统计: {stats}")
+        logger.info("✅ 两阶段流水线测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def _exit_worker():
+    """进程池初始化时直接退出，模拟工作进程崩溃"""
+    os._exit(1)
+
+def test_spawn_fallback():
+    """测试不能 fork 时（Windows/macOS 的 spawn）分析改用线程池，进程池崩溃时单视频分析回退到顺序分析"""
+    import importlib.util
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    # 按 ComfyUI 的方式以带连字符的包名加载插件，spawn 子进程无法重新导入这样的模块
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    package_name = "comfyui-yx-easyuse"
+    spec = importlib.util.spec_from_file_location(
+        package_name, os.path.join(package_dir, "__init__.py"), submodule_search_locations=[package_dir]
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[package_name] = package
+    original_get_context = multiprocessing.get_context
+    test_dir = tempfile.mkdtemp(prefix="game_test_spawn_")
+    try:
+        spec.loader.exec_module(package)
+        mod = sys.modules[f"{package_name}.nodes.game_video_auto_edit"]
+
+        def spawn_only(method=None):
+            if method == "fork":
+                raise ValueError("cannot find context for 'fork'")
+            return original_get_context("spawn")
+        multiprocessing.get_context = spawn_only
+
+        assert mod.process_pool_context(mod._analyze_video_job) is None
+        assert isinstance(mod.analysis_executor(mod._analyze_video_job, 2), ThreadPoolExecutor)
+
+        input_dir = os.path.join(test_dir, "input")
+        output_dir = os.path.join(test_dir, "output")
+        os.makedirs(input_dir)
+        os.makedirs(output_dir)
+        video_files = []
+        for i in range(2):
+            video_path = os.path.join(input_dir, f"spawn_game_{i}.mp4")
+            create_test_game_video(video_path, duration=4, fps=30)
+            video_files.append(video_path)
+
+        node = mod.GameVideoAutoEditNode()
+        budget = mod.ResourceScheduler(cpu_count=4).plan_pipeline(len(video_files))
+        node.resource_budget = budget
+        analysis_settings = {
+            'idle_threshold': 0.020, 'min_segment_duration': 1.0, 'pixel_threshold': 35, 'preserve_buffer': 0.5,
+            'analysis_backend': 'opencv', 'analysis_fps': 0.0, 'use_score_cache': False,
+        }
+        node.run_pipeline(video_files, output_dir, analysis_settings, "encode", budget)
+        assert node.processed_count == 2
+        assert sorted(os.listdir(output_dir)) == ["spawn_game_0_edited.mp4", "spawn_game_1_edited.mp4"]
+
+        # 单视频分段并行分析同样改用线程池，结果与顺序分析一致
+        chunks = mod.plan_analysis_chunks(120, 2, 1, min_chunk_frames=30)
+        sequential, _ = mod.analyze_frame_range(video_files[0], 35, total_frames=120, fps=30.0, log_progress=False)
+        parallel, _ = node._motion_scores_parallel(video_files[0], 35, "opencv", 1, 120, 30.0, chunks)
+        assert np.array_equal(sequential.array(), parallel.array())
+        multiprocessing.get_context = original_get_context
+
+        # 进程池崩溃时回退到顺序分析，而不是让整个视频失败
+        original_executor = mod.analysis_executor
+        mod.analysis_executor = lambda func, max_workers, cv_threads=0: ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=original_get_context("fork"), initializer=_exit_worker
+        )
+        try:
+            recovered, _ = node._motion_scores_parallel(video_files[0], 35, "opencv", 1, 120, 30.0, chunks)
+        finally:
+            mod.analysis_executor = original_executor
+        assert np.array_equal(sequential.array(), recovered.array())
+
+        logger.info("✅ 无 fork 环境线程池回退测试通过")
+        return True
+    finally:
+        multiprocessing.get_context = original_get_context
+        for name in [name for name in sys.modules if name.startswith(package_name)]:
+            del sys.modules[name]
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_batch_order_planning():
+    """测试批处理顺序规划：最长优先、快速首个结果，以及计划 makespan"""
+    from nodes.game_video_auto_edit import plan_batch_order, probe_batch_jobs, simulate_makespan
+
+    jobs = [{'video_path': name, 'cost': cost} for name, cost in (("a", 1.0), ("b", 2.0), ("c", 10.0), ("d", 3.0))]
+
+    ordered, plan = plan_batch_order(jobs, 2, "as_found")
+    assert [job['video_path'] for job in ordered] == ["a", "b", "c", "d"]
+    assert plan['planned_makespan'] == 11.0
+
+    ordered, plan = plan_batch_order(jobs, 2, "longest_first")
+    assert [job['video_path'] for job in ordered] == ["c", "d", "b", "a"]
+    assert plan['planned_makespan'] == 10.0 and plan['lower_bound'] == 10.0
+
+    ordered, plan = plan_batch_order(jobs, 2, "quick_first")
+    assert [job['video_path'] for job in ordered] == ["a", "c", "d", "b"]
+    assert plan['planned_makespan'] == 10.0
+
+    assert simulate_makespan([], 3) == 0.0
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_batch_order_")
+    try:
+        short_path = os.path.join(test_dir, "short.mp4")
+        long_path = os.path.join(test_dir, "long.mp4")
+        create_test_game_video(short_path, duration=2, fps=30)
+        create_test_game_video(long_path, duration=4, fps=30)
+
+        probed = {job['video_path']: job for job in probe_batch_jobs([short_path, long_path])}
+        assert abs(probed[short_path]['duration'] - 2.0) < 0.1
+        assert abs(probed[long_path]['duration'] - 4.0) < 0.1
+        assert probed[long_path]['size'] > 0
+
+        # 计划值（视频秒）和实际耗时（墙钟秒）分开报告，实际耗时换算为处理速度
+        from nodes.game_video_auto_edit import GameVideoAutoEditNode
+        node = GameVideoAutoEditNode()
+        assert node._order_batch([short_path, long_path], 1, "longest_first") == [long_path, short_path]
+        node.analysis_results = [node.build_analysis_result(long_path, [], 4.0, 120)]
+        node.processed_count = 1
+        node.output_path = test_dir
+        node._finish_batch(test_dir, 2)
+        plan = node.batch_plan
+        assert plan['schedule_efficiency'] == 1.0
+        assert abs(plan['throughput'] * plan['actual_makespan'] - plan['total_cost']) < 1e-6
+        summary = node.generate_analysis_summary()
+        assert "计划 makespan" in summary and "视频秒" in summary and "处理速度" in summary
+
+        logger.info("✅ 批处理顺序规划测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_video_probe_cache():
+    """测试视频元数据探测：ffprobe 输出解析（含可变帧率）、进程内缓存命中与 OpenCV 降级"""
+    from nodes import game_video_auto_edit as mod
+
+    # 可变帧率：r_frame_rate 是最高帧率且没有 nb_frames，时长应取容器时长
+    info = mod.parse_probe_info({
+        'format': {'duration': '10.000000'},
+        'streams': [
+            {'codec_type': 'video', 'codec_name': 'h264', 'avg_frame_rate': '45/1', 'r_frame_rate': '60/1',
+             'time_base': '1/90000', 'width': 1280, 'height': 720, 'profile': 'High', 'pix_fmt': 'yuv420p'},
+            {'codec_type': 'audio', 'codec_name': 'aac'},
+        ],
+    })
+    assert info['fps'] == 45.0 and info['duration'] == 10.0 and info['frame_count'] == 450
+    assert info['has_audio'] and info['audio_codec'] == 'aac' and info['timescale'] == 90000
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_probe_")
+    try:
+        video_path = os.path.join(test_dir, "probe_game.mp4")
+        create_test_game_video(video_path, duration=2, fps=30)
+
+        first = mod.probe_video(video_path)
+        assert first is not None and abs(first['duration'] - 2.0) < 0.1 and first['fps'] > 0
+
+        # 第二次调用直接命中进程内缓存，不再打开文件
+        original_capture = mod.cv2.VideoCapture
+        original_probe = mod.ffmpeg.probe
+        def fail_open(*args, **kwargs):
+            raise AssertionError("缓存命中时不应再次打开视频")
+        mod.cv2.VideoCapture = fail_open
+        mod.ffmpeg.probe = fail_open
+        try:
+            assert mod.probe_video(video_path) is first
+        finally:
+            mod.cv2.VideoCapture = original_capture
+            mod.ffmpeg.probe = original_probe
+
+        # 磁盘缓存按文件内容失效
+        cache = mod.VideoProbeCache(cache_dir=test_dir)
+        key = mod.file_cache_key(video_path, {'video_probe': 1})
+        cache.put(key, video_path, info)
+        assert cache.get(key) == info
+        stat = os.stat(video_path)
+        os.utime(video_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        new_key = mod.file_cache_key(video_path, {'video_probe': 1})
+        assert cache.get(new_key) is None
+
+        # 同一路径写入新记录时删除旧记录；条目数超过上限时按最近最少使用淘汰
+        cache.put(new_key, video_path, info)
+        assert cache.get(key) is None and cache.get(new_key) == info
+        cache = mod.VideoProbeCache(cache_dir=test_dir, max_entries=2)
+        cache.put("other_a", os.path.join(test_dir, "a.mp4"), info)
+        assert cache.get(new_key) == info
+        cache.put("other_b", os.path.join(test_dir, "b.mp4"), info)
+        assert cache.get("other_a") is None
+        assert cache.get(new_key) == info and cache.get("other_b") == info
+
+        assert mod.probe_video(os.path.join(test_dir, "missing.mp4")) is None
+
+        logger.info("✅ 视频元数据探测缓存测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_keyframe_index():
+    """测试关键帧索引：持久化命中、按修改时间失效、批量并行构建，以及精彩片段按索引对齐"""
+    from nodes import game_video_auto_edit as mod
+
+    node = mod.GameVideoAutoEditNode()
+    idle_segments = [{'start_time': 3.0, 'end_time': 6.0}]
+    keyframes = np.array([0.0, 2.0, 4.0, 6.0, 8.0])
+    assert node.create_active_segments(idle_segments, 9.0, 0.5, keyframes) == [
+        {'start_time': 0.0, 'end_time': 4.0}, {'start_time': 6.0, 'end_time': 9.0}
+    ]
+    assert node.create_active_segments(idle_segments, 9.0, 0.5) == [
+        {'start_time': 0, 'end_time': 2.5}, {'start_time': 6.5, 'end_time': 9.0}
+    ]
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_keyframe_index_")
+    original_probe = mod._probe_keyframes
+    probed = []
+    def fake_probe(video_path):
+        probed.append(video_path)
+        return keyframes
+    mod._probe_keyframes = fake_probe
+    try:
+        video_files = []
+        for i in range(3):
+            video_path = os.path.join(test_dir, f"index_game_{i}.mp4")
+            with open(video_path, 'wb') as f:
+                f.write(os.urandom(1024 + i))
+            video_files.append(video_path)
+
+        indexes = mod.build_keyframe_indexes(video_files, max_workers=3)
+        assert sorted(probed) == sorted(video_files)
+        assert all(np.array_equal(indexes[path], keyframes) for path in video_files)
+
+        # 再次构建直接读取 .npy 索引，不再探测
+        indexes = mod.build_keyframe_indexes(video_files, max_workers=3)
+        assert len(probed) == 3
+        assert np.array_equal(mod.probe_keyframe_times(video_files[0]), keyframes)
+
+        # 修改时间变化后索引失效
+        stat = os.stat(video_files[0])
+        os.utime(video_files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        mod.load_keyframe_index(video_files[0])
+        assert len(probed) == 4
+
+        # 同一路径重新写入时删除旧索引；总大小超过上限时按最近最少使用淘汰
+        cache_dir = os.path.join(test_dir, "cache")
+        cache = mod.KeyframeIndexCache(cache_dir=cache_dir)
+        entry_files = lambda: [name for name in os.listdir(cache.cache_dir) if name.endswith(".npy")]
+        cache.put(video_files[0], keyframes)
+        stat = os.stat(video_files[0])
+        os.utime(video_files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        cache.put(video_files[0], keyframes)
+        assert len(entry_files()) == 1
+        assert np.array_equal(cache.get(video_files[0]), keyframes)
+
+        entry_bytes = os.path.getsize(os.path.join(cache.cache_dir, entry_files()[0]))
+        cache = mod.KeyframeIndexCache(cache_dir=cache_dir, max_bytes=entry_bytes * 2)
+        cache.put(video_files[1], keyframes)
+        assert cache.get(video_files[0]) is not None
+        cache.put(video_files[2], keyframes)
+        assert len(entry_files()) == 2
+        assert cache.get(video_files[1]) is None
+        assert cache.get(video_files[0]) is not None and cache.get(video_files[2]) is not None
+
+        logger.info("✅ 关键帧索引测试通过")
+        return True
+    finally:
+        mod._probe_keyframes = original_probe
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_edl_export():
+    """测试 edl 模式：不编码，只导出 JSON / CMX3600 EDL / concat 脚本，且 concat 脚本能渲染出对应片段"""
+    import json
+    import ffmpeg
+    from nodes.game_video_auto_edit import GameVideoAutoEditNode, format_timecode
+
+    assert format_timecode(3723.5, 30.0) == "01:02:03:15"
+    assert format_timecode(60.06, 29.97) == "00:01:00:00"
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_edl_")
+    try:
+        video_path = os.path.join(test_dir, "edl_game.mp4")
+        (
+            ffmpeg
+            .input('testsrc=size=320x240:rate=30:duration=6', f='lavfi')
+            .output(video_path, vcodec='libx264', pix_fmt='yuv420p')
+            .run(overwrite_output=True, quiet=True)
+        )
+
+        node = GameVideoAutoEditNode()
+        active_segments = [{'start_time': 1.0, 'end_time': 2.0}, {'start_time': 4.0, 'end_time': 5.5}]
+        job = {
+            'video_path': video_path,
+            'active_segments': active_segments,
+            'total_duration': 6.0,
+            'analysis_result': node.build_analysis_result(
+                video_path, [{'start_time': 2.0, 'end_time': 4.0, 'duration': 2.0}], 6.0, 180
+            ),
+        }
+        success, _ = node.encode_video_job(job, test_dir, edit_mode="edl")
+        assert success
+        assert not os.path.exists(os.path.join(test_dir, "edl_game_edited.mp4")), "edl 模式不应编码"
+
+        with open(os.path.join(test_dir, "edl_game_edited.json"), encoding='utf-8') as f:
+            decision = json.load(f)
+        assert decision['active_segments'] == active_segments and decision['output_duration'] == 2.5
+        assert decision['idle_segments'][0]['duration'] == 2.0
+
+        with open(os.path.join(test_dir, "edl_game_edited.edl"), encoding='utf-8') as f:
+            events = [line.split() for line in f if line[:3].isdigit()]
+        assert [event[-4:] for event in events] == [
+            ["00:00:01:00", "00:00:02:00", "00:00:00:00", "00:00:01:00"],
+            ["00:00:04:00", "00:00:05:15", "00:00:01:00", "00:00:02:15"],
+        ], events
+
+        rendered_path = os.path.join(test_dir, "rendered.mp4")
+        (
+            ffmpeg
+            .input(os.path.join(test_dir, "edl_game_edited.ffconcat"), format='concat', safe=0, segment_time_metadata=1)
+            .output(rendered_path, vf='select=concatdec_select', vcodec='libx264')
+            .run(overwrite_output=True, quiet=True)
+        )
+        cap = cv2.VideoCapture(rendered_path)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        assert frame_count == 75, f"concat 脚本渲染帧数异常: {frame_count}"
+
+        # 写到一半出错：不留下正式文件，也不留下临时文件
+        from nodes import game_video_auto_edit as mod
+        failed_dir = os.path.join(test_dir, "failed")
+        os.makedirs(failed_dir)
+        original_timecode = mod.format_timecode
+        def broken_timecode(seconds, fps):
+            raise RuntimeError("模拟写入中断")
+        mod.format_timecode = broken_timecode
+        try:
+            mod.write_edit_decision_list(video_path, [{'start_time': 0.0, 'end_time': 1.0}], [], 6.0, 30.0,
+                                         False, failed_dir)
+            assert False, "应抛出写入异常"
+        except RuntimeError:
+            pass
+        finally:
+            mod.format_timecode = original_timecode
+        assert os.listdir(failed_dir) == []
+
+        logger.info("✅ 剪辑决策列表导出测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+# 最小的 MP4 文件头（ftyp box），用于构造能通过内容识别的测试文件
+_MP4_HEADER = b'\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom'
+
+def test_input_scan():
+    """测试输入扫描：按文件头识别视频、递归与通配符过滤、清单复用文件身份"""
+    from nodes import game_video_auto_edit as mod
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_scan_")
+    try:
+        files = {
+            "top.mp4": _MP4_HEADER,
+            "clip.mkv": b'\x1a\x45\xdf\xa3' + b'\x00' * 60,
+            "old.avi": b'RIFF\x00\x00\x00\x00AVI LIST' + b'\x00' * 60,
+            "fake.mp4": b'not a video at all' * 4,
+            "renamed.bin": _MP4_HEADER,
+            "empty.mp4": b'',
+            os.path.join("day1", "run.mp4"): _MP4_HEADER,
+            os.path.join("day1", "backup", "run.mp4"): _MP4_HEADER,
+            os.path.join(".hidden", "secret.mp4"): _MP4_HEADER,
+        }
+        for name, content in files.items():
+            path = os.path.join(test_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content + (os.urandom(256) if content else b''))
+
+        names = lambda manifest: sorted(os.path.relpath(item['path'], test_dir).replace(os.sep, '/') for item in manifest)
+
+        # 按内容识别：扩展名不对但文件头是 MP4 的也收录，伪装成 .mp4 的非视频被跳过
+        manifest = mod.scan_video_files(test_dir)
+        assert names(manifest) == ["clip.mkv", "old.avi", "renamed.bin", "top.mp4"], names(manifest)
+        assert {item['container'] for item in manifest} == {"mp4", "matroska", "avi"}
+
+        manifest = mod.scan_video_files(test_dir, recursive=True, exclude_patterns=["backup", "*.bin"])
+        assert names(manifest) == ["clip.mkv", "day1/run.mp4", "old.avi", "top.mp4"], names(manifest)
+        assert [item['relative_dir'] for item in manifest if item['path'].endswith("run.mp4")] == ["day1"]
+
+        manifest = mod.scan_video_files(test_dir, recursive=True, include_patterns=mod._parse_pattern_list("*.mp4，*.mkv"))
+        assert names(manifest) == ["clip.mkv", "day1/backup/run.mp4", "day1/run.mp4", "top.mp4"], names(manifest)
+
+        # 登记清单后文件身份直接取自清单，不再 stat；移除登记后恢复实时 stat
+        item = manifest[0]
+        stat = os.stat(item['path'])
+        assert (item['size'], item['mtime_ns']) == (stat.st_size, stat.st_mtime_ns)
+        fake_item = dict(item, size=1, mtime_ns=2)
+        mod.remember_file_stats([fake_item])
+        assert mod.file_identity(item['path']) == (1, 2)
+        mod.forget_file_stats([fake_item])
+        assert mod.file_identity(item['path']) == (stat.st_size, stat.st_mtime_ns)
+
+        logger.info("✅ 输入扫描测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_zero_copy_staging():
+    """测试输入暂存：硬链接共享 inode，无法零拷贝时直接报错而不复制"""
+    from nodes import game_video_auto_edit as mod
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_staging_")
+    try:
+        for name in ("b.mp4", "a.MOV"):
+            with open(os.path.join(test_dir, name), 'wb') as f:
+                f.write(_MP4_HEADER + os.urandom(2048))
+
+        manifest = mod.scan_video_files(test_dir)
+        video_files = [item['path'] for item in manifest]
+        assert [os.path.basename(path) for path in video_files] == ["a.MOV", "b.mp4"]
+
+        staging_dir, staged_manifest, needs_copy = mod.stage_input_files(manifest, test_dir)
+        assert not needs_copy
+        for source, staged in zip(manifest, staged_manifest):
+            assert os.stat(source['path']).st_ino == os.stat(staged['path']).st_ino, "暂存文件应与源文件共享数据"
+            assert staged['mtime_ns'] == source['mtime_ns']
+        mod.cleanup_temp_folder(staging_dir)
+        assert all(os.path.exists(path) for path in video_files)
+
+        # 硬链接和 reflink 都不可用时不复制，整批直接报错
+        original_link = mod.os.link
+        original_reflink = mod._reflink_file
+        def refuse(*args):
+            raise OSError("跨文件系统")
+        mod.os.link = refuse
+        mod._reflink_file = refuse
+        try:
+            staging_dir, staged_manifest, needs_copy = mod.stage_input_files(manifest, test_dir)
+            mod.cleanup_temp_folder(staging_dir)
+            assert not staged_manifest and len(needs_copy) == 2
+
+            output_path, summary = mod.GameVideoAutoEditNode().auto_edit_videos(
+                test_dir, "staging_test", 0.015, 3.0, 35, input_staging="link"
+            )
+        finally:
+            mod.os.link = original_link
+            mod._reflink_file = original_reflink
+        assert output_path == "" and "输入暂存失败" in summary, summary
+        assert not [d for d in os.listdir(test_dir) if d.startswith(".yx_staging_")], "暂存目录未清理"
+
+        # 暂存目录每次不同，缓存仍按源文件命中：两次 link 模式运行只留下一份运动分数缓存
+        from contextlib import closing
+        video_dir = os.path.join(test_dir, "videos")
+        os.makedirs(video_dir)
+        create_test_game_video(os.path.join(video_dir, "game.mp4"), duration=3, fps=30)
+        source_path = os.path.abspath(os.path.join(video_dir, "game.mp4"))
+        cache = mod.MotionScoreCache()
+
+        def cached_keys():
+            with closing(cache._connect()) as conn:
+                return {row[0] for row in conn.execute(
+                    "SELECT key FROM motion_scores WHERE video_path LIKE ?", (video_dir + "%",))}
+
+        for _ in range(2):
+            output_path, summary = mod.GameVideoAutoEditNode().auto_edit_videos(
+                video_dir, "staging_cache_test", 0.015, 1.0, 35, edit_mode="edl", input_staging="link"
+            )
+            assert output_path, summary
+            keys = cached_keys()
+            assert len(keys) == 1, keys
+        with closing(cache._connect()) as conn:
+            stored_path = conn.execute("SELECT video_path FROM motion_scores WHERE key = ?", (keys.pop(),)).fetchone()[0]
+        assert stored_path == source_path
+
+        logger.info("✅ 零拷贝输入暂存测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_resumable_batch():
+    """测试可续跑批处理：固定输出目录、处理清单、跳过未变化的已完成视频、输出原子替换"""
+    import json
+    from nodes import game_video_auto_edit as mod
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_resume_")
+    original_output_directory = MockFolderPaths.get_output_directory
+    try:
+        input_dir = os.path.join(test_dir, "input")
+        output_root = os.path.join(test_dir, "output")
+        os.makedirs(input_dir)
+        os.makedirs(output_root)
+        for i in range(2):
+            create_test_game_video(os.path.join(input_dir, f"resume_game_{i}.mp4"), duration=4, fps=30)
+        MockFolderPaths.get_output_directory = staticmethod(lambda: output_root)
+
+        def run(idle_threshold=0.02):
+            node = mod.GameVideoAutoEditNode()
+            output_path, summary = node.auto_edit_videos(
+                input_dir, "resume_test", idle_threshold, 1.0, 35, preserve_buffer=0.2,
+                edit_mode="edl", resume_batch=True
+            )
+            return node, output_path, summary
+
+        node, output_path, _ = run()
+        assert output_path == os.path.join(output_root, "resume_test")
+        assert node.processed_count == 2 and node.skipped_count == 0
+        with open(os.path.join(output_path, "batch_manifest.json"), encoding='utf-8') as f:
+            entries = json.load(f)['files']
+        assert sorted(entries) == ["resume_game_0.mp4", "resume_game_1.mp4"]
+        assert all(entry['status'] == 'done' and len(entry['outputs']) == 3 for entry in entries.values())
+
+        # 全部完成后重跑不做任何处理
+        node, output_path, summary = run()
+        assert node.processed_count == 0 and "无需重新处理" in summary
+
+        # 只有变化的文件重新处理
+        video_path = os.path.join(input_dir, "resume_game_1.mp4")
+        stat = os.stat(video_path)
+        os.utime(video_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        node, _, _ = run()
+        assert node.processed_count == 1 and node.skipped_count == 1
+
+        # 输出文件被删除或参数变化时重新处理
+        os.remove(os.path.join(output_path, "resume_game_0_edited.edl"))
+        node, _, _ = run()
+        assert node.processed_count == 1 and node.skipped_count == 1
+        node, _, _ = run(idle_threshold=0.03)
+        assert node.processed_count == 2
+
+        # 分析失败也记入处理清单（状态和原因），下次续跑重新处理
+        original_detect = mod.GameVideoAutoEditNode.detect_motion_simple
+
+        def failing_detect(self, video_path, *args, **kwargs):
+            if os.path.basename(video_path) == "resume_game_1.mp4":
+                return None, None
+            return original_detect(self, video_path, *args, **kwargs)
+
+        mod.GameVideoAutoEditNode.detect_motion_simple = failing_detect
+        try:
+            node, _, _ = run(idle_threshold=0.04)
+        finally:
+            mod.GameVideoAutoEditNode.detect_motion_simple = original_detect
+        assert node.processed_count == 1
+        with open(os.path.join(output_path, "batch_manifest.json"), encoding='utf-8') as f:
+            entries = json.load(f)['files']
+        assert entries["resume_game_1.mp4"]['status'] == 'failed'
+        assert entries["resume_game_1.mp4"]['error'] == "运动检测失败"
+        assert entries["resume_game_0.mp4"]['status'] == 'done' and entries["resume_game_0.mp4"]['error'] is None
+
+        # 续跑开始时清理上次中断留下的临时输出
+        stale_paths = [
+            mod.partial_output_path(os.path.join(output_path, "resume_game_1_edited.mp4")),
+            mod.partial_output_path(os.path.join(output_path, "sub", "other_edited.mp4")),
+        ]
+        os.makedirs(os.path.join(output_path, "sub"))
+        for stale_path in stale_paths:
+            with open(stale_path, 'wb') as f:
+                f.write(b'stale')
+        node, _, _ = run(idle_threshold=0.04)
+        assert node.processed_count == 1 and node.skipped_count == 1
+        assert not any(os.path.exists(stale_path) for stale_path in stale_paths)
+
+        # 临时输出：失败时删除，成功时原子替换为正式文件
+        final_path = os.path.join(test_dir, "clip_edited.mp4")
+        partial_path = mod.partial_output_path(final_path)
+        assert os.path.basename(partial_path).startswith(".") and partial_path.endswith(".mp4")
+        with open(partial_path, 'wb') as f:
+            f.write(b'partial')
+        mod.commit_partial_output(partial_path, final_path, False)
+        assert not os.path.exists(partial_path) and not os.path.exists(final_path)
+        with open(partial_path, 'wb') as f:
+            f.write(b'done')
+        mod.commit_partial_output(partial_path, final_path, True)
+        assert os.path.exists(final_path) and not os.path.exists(partial_path)
+
+        logger.info("✅ 可续跑批处理测试通过")
+        return True
+    finally:
+        MockFolderPaths.get_output_directory = original_output_directory
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_watch_folder():
+    """测试监视文件夹：等待文件写完再处理、新文件自动处理、重启后跳过已完成的录像"""
+    import time
+    from nodes import game_video_auto_edit as mod
+
+    # 与批量剪辑节点共用剪辑参数的取值范围
+    batch_inputs = mod.GameVideoAutoEditNode.INPUT_TYPES()
+    watch_inputs = mod.GameVideoWatchFolderNode.INPUT_TYPES()
+    for name in mod.EDIT_PARAM_INPUTS:
+        assert any(name in group for group in watch_inputs.values()), name
+        batch_spec = next(group[name] for group in batch_inputs.values() if name in group)
+        watch_spec = next(group[name] for group in watch_inputs.values() if name in group)
+        assert batch_spec == watch_spec, name
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_watch_")
+    try:
+        watch_dir = os.path.join(test_dir, "watch")
+        output_dir = os.path.join(test_dir, "output")
+        os.makedirs(watch_dir)
+        os.makedirs(output_dir)
+
+        source_path = os.path.join(test_dir, "source.mp4")
+        create_test_game_video(source_path, duration=4, fps=30)
+        with open(source_path, 'rb') as f:
+            content = f.read()
+
+        process_kwargs = {'idle_threshold': 0.02, 'pixel_threshold': 35, 'preserve_buffer': 0.2, 'edit_mode': 'edl'}
+        params_hash = mod.batch_params_hash(0.02, 1.0, 35, 0.2, "opencv", 0.0, "edl", "balanced")
+
+        def make_watcher():
+            node = mod.GameVideoAutoEditNode()
+            node.min_segment_duration = 1.0
+            return mod.VideoFolderWatcher(node, watch_dir, output_dir, process_kwargs, params_hash,
+                                          max_workers=2, stable_seconds=0.5, poll_interval=0.1, use_inotify=False)
+
+        def wait_for(condition, timeout=30.0):
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                if condition():
+                    return True
+                time.sleep(0.05)
+            return False
+
+        watcher = make_watcher()
+        watcher.start()
+        try:
+            # 模拟录制中的文件：分两次写入，写入间隔短于稳定等待时间，不应提前处理
+            growing_path = os.path.join(watch_dir, "live_0.mp4")
+            with open(growing_path, 'wb') as f:
+                f.write(content[:len(content) // 2])
+            time.sleep(0.3)
+            assert watcher.stats['processed'] + watcher.stats['in_flight'] + watcher.stats['failed'] == 0
+            with open(growing_path, 'ab') as f:
+                f.write(content[len(content) // 2:])
+
+            assert wait_for(lambda: watcher.stats['processed'] == 1), watcher.status()
+
+            with open(os.path.join(watch_dir, "live_1.mp4"), 'wb') as f:
+                f.write(content)
+            assert wait_for(lambda: watcher.stats['processed'] == 2), watcher.status()
+        finally:
+            watcher.stop()
+
+        assert watcher.stats['failed'] == 0
+        assert os.path.exists(os.path.join(output_dir, "live_0_edited.json"))
+        assert os.path.exists(os.path.join(output_dir, "live_1_edited.json"))
+
+        # 重启后已完成的录像直接跳过
+        watcher = make_watcher()
+        watcher.start()
+        try:
+            assert wait_for(lambda: watcher.stats['skipped'] == 2), watcher.status()
+        finally:
+            watcher.stop()
+        assert watcher.stats['processed'] == 0
+
+        # 轮询模式：目录修改时间不变时不列目录，有新文件时只 stat 新文件
+        poll_dir = os.path.join(test_dir, "poll")
+        os.makedirs(poll_dir)
+        with open(os.path.join(poll_dir, "old.mp4"), 'wb') as f:
+            f.write(content)
+        past = time.time() - 60
+        os.utime(poll_dir, (past, past))
+        watcher = make_watcher()
+        watcher.watch_folder = poll_dir
+        watcher._scan_directory()
+        assert list(watcher.candidates) == [os.path.join(poll_dir, "old.mp4")]
+        watcher.candidates.clear()
+
+        original_scandir = mod.os.scandir
+        def forbidden_scandir(path):
+            raise AssertionError("目录未变化时不应列目录")
+        mod.os.scandir = forbidden_scandir
+        try:
+            watcher._scan_directory()
+        finally:
+            mod.os.scandir = original_scandir
+        assert not watcher.candidates
+
+        with open(os.path.join(poll_dir, "new.mp4"), 'wb') as f:
+            f.write(content)
+        os.utime(poll_dir, (past + 1, past + 1))
+        watcher._scan_directory()
+        assert list(watcher.candidates) == [os.path.join(poll_dir, "new.mp4")]
+        watcher.executor.shutdown()
+
+        # 节点每次执行都重新运行，不复用缓存的状态输出
+        changed = mod.GameVideoWatchFolderNode.IS_CHANGED(action="status")
+        assert changed != changed
+
+        # 停止时在锁外等待处理中的视频完成，等待期间其他监视节点调用不被阻塞
+        class SlowStopWatcher:
+            def stop(self):
+                assert mod._WATCHERS_LOCK.acquire(timeout=1.0), "停止等待期间不应持有监视器锁"
+                mod._WATCHERS_LOCK.release()
+
+            def status(self):
+                return "已停止"
+
+        node = mod.GameVideoWatchFolderNode()
+        mod._WATCHERS[mod.resolve_path(poll_dir)] = SlowStopWatcher()
+        assert node.watch_folder(poll_dir, "watch_stop", "stop", 0.02, 1.0, 35) == ("已停止",)
+        assert mod.resolve_path(poll_dir) not in mod._WATCHERS
+        assert node.watch_folder(poll_dir, "watch_stop", "stop", 0.02, 1.0, 35)[0].startswith("未在监视")
+
+        logger.info("✅ 监视文件夹测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_tail_edit():
+    """测试尾随剪辑：分段器状态可恢复，跟读增长中的 MKV 与离线分析结果一致，并能从进度文件续分析"""
+    import json
+    import threading
+    import time
+    import ffmpeg
+    from nodes import game_video_auto_edit as mod
+
+    # 分段器状态经 JSON 往返后继续输入，结果与不中断时一致
+    fps = 30.0
+    scores = _synthetic_motion_scores(3000)
+    reference = mod.OnlineSegmenter(fps, 0.015, 1.0, 0.5)
+    for score in scores:
+        reference.push(score)
+    reference.finish()
+    first = mod.OnlineSegmenter(fps, 0.015, 1.0, 0.5)
+    for score in scores[:1234]:
+        first.push(score)
+    resumed = mod.OnlineSegmenter.from_state(json.loads(json.dumps(first.state_dict())))
+    for score in scores[1234:]:
+        resumed.push(score)
+    resumed.finish()
+    assert resumed.idle_segments == reference.idle_segments
+    assert resumed.active_segments == reference.active_segments
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_tail_")
+    try:
+        source_mp4 = os.path.join(test_dir, "source.mp4")
+        source_mkv = os.path.join(test_dir, "source.mkv")
+        create_test_game_video(source_mp4, duration=8, fps=30)
+        ffmpeg.input(source_mp4).output(source_mkv, c='copy').run(overwrite_output=True, quiet=True)
+        assert mod.is_streamable_recording(source_mkv)
+        assert not mod.is_streamable_recording(source_mp4)
+
+        node = mod.GameVideoAutoEditNode()
+        node.min_segment_duration = 1.0
+        offline = node.stream_edit_video(source_mkv, os.path.join(test_dir, "offline.mp4"), 0.02, 35, 0.2,
+                                         analysis_backend="ffmpeg")
+        assert offline is not None and offline[4]
+
+        # 先写入四分之一，其余由后台线程分块追加，模拟录制中的文件
+        with open(source_mkv, 'rb') as f:
+            content = f.read()
+        live_dir = os.path.join(test_dir, "live")
+        out_dir = os.path.join(test_dir, "out")
+        os.makedirs(live_dir)
+        os.makedirs(out_dir)
+        live_path = os.path.join(live_dir, "rec.mkv")
+        with open(live_path, 'wb') as f:
+            f.write(content[:len(content) // 4])
+
+        def writer():
+            chunk = max(1, len(content) // 16)
+            for offset in range(len(content) // 4, len(content), chunk):
+                time.sleep(0.15)
+                with open(live_path, 'ab') as f:
+                    f.write(content[offset:offset + chunk])
+
+        writer_thread = threading.Thread(target=writer)
+        writer_thread.start()
+        output_path = os.path.join(out_dir, "rec_edited.mp4")
+        result = node.tail_edit_video(live_path, output_path, 0.02, 35, 0.2, follow_timeout=1.5)
+        writer_thread.join()
+
+        assert result is not None and result[4]
+        assert result[0] == offline[0]
+        assert result[1] == offline[1]
+        assert os.path.exists(output_path)
+        state_path = os.path.join(out_dir, "rec_live.json")
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        assert state['status'] == 'finished'
+        assert state['idle_segments'] == offline[0]
+        assert not os.path.exists(os.path.join(out_dir, ".rec_live_parts"))
+
+        # 模拟中途退出：进度文件只记录了前 4 秒的分析状态，再次调用从断点继续
+        half = mod.OnlineSegmenter(fps, 0.02, 1.0, 0.2)
+        partial_scores, _ = mod.analyze_frame_range(live_path, 35, "ffmpeg", 1, end_frame=120, fps=fps,
+                                                    log_progress=False)
+        for score in partial_scores.array():
+            half.push(score)
+        state.update(status='recording', parts=[], segmenter=half.state_dict(),
+                     idle_segments=half.idle_segments, active_segments=half.active_segments)
+        mod.write_live_state(state_path, state)
+        assert mod.load_live_state(state_path, live_path, state['params']) is not None
+
+        os.remove(output_path)
+        result = node.tail_edit_video(live_path, output_path, 0.02, 35, 0.2, follow_timeout=0.5)
+        assert result is not None and result[4]
+        assert result[0] == offline[0]
+        assert result[1] == offline[1]
+        assert os.path.exists(output_path)
+
+        # 最后一个片段编码失败一次：续分析不会重复输出结尾片段
+        os.remove(output_path)
+        os.remove(state_path)
+        failing = mod.GameVideoAutoEditNode()
+        failing.min_segment_duration = 1.0
+        original_encode = failing.encode_segment
+        calls = []
+
+        def flaky_encode(video_path, segment, part_path, has_audio):
+            calls.append(segment)
+            if len(calls) == 2:
+                raise RuntimeError("模拟编码失败")
+            return original_encode(video_path, segment, part_path, has_audio)
+
+        failing.encode_segment = flaky_encode
+        result = failing.tail_edit_video(live_path, output_path, 0.02, 35, 0.2, follow_timeout=0.5)
+        assert result is not None and not result[4]
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        assert state['status'] == 'failed'
+        assert not state['segmenter']['finished']
+
+        result = failing.tail_edit_video(live_path, output_path, 0.02, 35, 0.2, follow_timeout=0.5)
+        assert result is not None and result[4]
+        assert result[0] == offline[0]
+        assert result[1] == offline[1]
+        reference_frames = cv2.VideoCapture(os.path.join(test_dir, "offline.mp4")).get(cv2.CAP_PROP_FRAME_COUNT)
+        assert cv2.VideoCapture(output_path).get(cv2.CAP_PROP_FRAME_COUNT) == reference_frames
+
+        # 结束状态的分段器再次 finish 不会重复输出
+        assert resumed.finish() == []
+
+        # 有音频的录像：分段只含视频，结束时统一封装音频，音画不随分段数漂移
+        audio_mkv = os.path.join(live_dir, "rec_audio.mkv")
+        add_test_audio(source_mkv, audio_mkv, 8)
+        node.detect_audio = lambda path: True
+        audio_output = os.path.join(out_dir, "rec_audio_edited.mp4")
+        result = node.tail_edit_video(audio_mkv, audio_output, 0.02, 35, 0.2, follow_timeout=0.5)
+        assert result is not None and result[4] and len(result[1]) > 1
+        gap = audio_video_gap(audio_output, 30)
+        assert abs(gap) < 0.03, (gap, result[1])
+
+        logger.info("✅ 尾随剪辑测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def test_shared_job_queue():
+    """测试共享任务队列：多进程领取、工作者退出后回收任务、重复提交去重、合并报告"""
+    import multiprocessing
+    import time
+    from nodes import game_video_auto_edit as mod
+
+    test_dir = tempfile.mkdtemp(prefix="game_test_queue_")
+    try:
+        input_dir = os.path.join(test_dir, "input")
+        queue_dir = os.path.join(test_dir, "shared", "batch")
+        os.makedirs(input_dir)
+        for i in range(4):
+            create_test_game_video(os.path.join(input_dir, f"game_{i}.mp4"), duration=4, fps=30)
+
+        manifest = mod.scan_video_files(input_dir)
+        settings = {
+            'min_segment_duration': 1.0, 'use_score_cache': False,
+            'analysis_workers': 1, 'encode_workers': 1, 'encode_profile': 'balanced',
+            'process_kwargs': {'idle_threshold': 0.02, 'pixel_threshold': 35, 'preserve_buffer': 0.2,
+                               'edit_mode': 'edl'},
+        }
+        params_hash = mod.batch_params_hash(0.02, 1.0, 35, 0.2, "opencv", 0.0, "edl", "balanced")
+
+        job_queue = mod.SharedJobQueue(queue_dir, lease_seconds=1.0)
+        assert job_queue.enqueue(manifest, params_hash, settings) == (4, [])
+        # 其他机器重复提交同一批不会重复排队
+        assert job_queue.enqueue(manifest, params_hash, settings) == (0, [])
+        # 参数不同的提交不会改写已排队任务的设置
+        other_settings = dict(settings, min_segment_duration=5.0)
+        other_hash = mod.batch_params_hash(0.02, 5.0, 35, 0.2, "opencv", 0.0, "edl", "balanced")
+        added, conflicts = job_queue.enqueue(manifest, other_hash, other_settings)
+        assert added == 0 and len(conflicts) == 4
+
+        # 模拟领取任务后退出的工作者：不心跳也不提交结果
+        dead_job = job_queue.claim("dead-worker")
+        assert dead_job is not None and dead_job['attempt'] == 1
+        assert dead_job['settings'] == settings
+        assert job_queue.heartbeat(dead_job['key'], "dead-worker")
+        assert not job_queue.heartbeat(dead_job['key'], "other-worker")
+        time.sleep(1.2)
+
+        workers = [
+            multiprocessing.Process(target=mod.run_job_queue_worker, args=(queue_dir, f"worker-{i}", 1.0, 0.1))
+            for i in range(2)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=120)
+            assert worker.exitcode == 0
+
+        counts = job_queue.counts()
+        assert counts == {'pending': 0, 'running': 0, 'done': 4, 'failed': 0}, counts
+        # 过期的租约被回收，原工作者迟到的结果不会覆盖
+        assert not job_queue.complete(dead_job['key'], "dead-worker", False, None)
+        for i in range(4):
+            assert os.path.exists(os.path.join(queue_dir, f"game_{i}_edited.json"))
+
+        node = mod.GameVideoAutoEditNode()
+        summary = node.summarize_job_queue(job_queue)
+        assert "共享队列" in summary and "完成 4" in summary
+        assert len(node.analysis_results) == 4
+        assert {result['worker'] for result in node.analysis_results} <= {"worker-0", "worker-1"}
+
+        # 队列处理完后再启动的工作者直接退出；文件变化后重新排队
+        assert mod.run_job_queue_worker(queue_dir, "late-worker", 1.0, 0.1) == {'done': 0, 'failed': 0}
+        changed = dict(manifest[0], mtime_ns=manifest[0]['mtime_ns'] + 1)
+        assert job_queue.enqueue([changed], params_hash, settings) == (1, [])
+        assert job_queue.counts()['pending'] == 1
+
+        # 没有 ComfyUI 环境的独立工作进程（命令行入口）也能领取任务
+        import subprocess
+        module_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nodes", "game_video_auto_edit.py")
+        completed = subprocess.run([sys.executable, module_path, queue_dir, "--worker-id", "cli-worker",
+                                    "--poll-interval", "0.1"], cwd=test_dir, capture_output=True, text=True,
+                                   timeout=120)
+        assert completed.returncode == 0, completed.stderr[-2000:]
+        assert job_queue.counts() == {'pending': 0, 'running': 0, 'done': 4, 'failed': 0}
+
+        logger.info("✅ 共享任务队列测试通过")
+        return True
+    finally:
+        import shutil
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+def benchmark_segmentation(num_frames=60 * 60 * 60):
+    """微基准：对比逐帧循环与向量化实现的平滑+分段耗时（默认 1 小时 60fps）"""
+    import time
+    from nodes.game_video_auto_edit import GameVideoAutoEditNode
+
+    node = GameVideoAutoEditNode()
+    scores = _synthetic_motion_scores(num_frames)
+
+    start = time.perf_counter()
+    legacy_segments = _legacy_detect_idle_segments(_legacy_smooth_motion_scores(scores), 60.0, 0.015, 3.0)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    segments = node.detect_idle_segments(node.smooth_motion_scores(scores), 60.0, 0.015, 3.0)
+    vectorized_time = time.perf_counter() - start
+
+    assert len(segments) == len(legacy_segments)
+    logger.info(f"平滑+分段 {num_frames} 帧: 循环 {legacy_time:.3f}s, 向量化 {vectorized_time:.3f}s, "
+                f"加速 {legacy_time / max(vectorized_time, 1e-9):.1f}x")
+    return legacy_time, vectorized_time
+
+def _legacy_frame_change_ratio(prev_gray, frame, pixel_threshold):
+    """逐帧分配临时数组的帧差实现（内核优化前的版本），用于对比，返回 (变化比例, 当前灰度图)"""
+    small_frame = cv2.resize(frame, (320, 240))
+    gray = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
+    if prev_gray is None:
+        return None, gray.copy()
+    diff = cv2.absdiff(prev_gray, gray)
+    changed_pixels = np.sum(diff > pixel_threshold)
+    return changed_pixels / (gray.shape[0] * gray.shape[1]), gray.copy()
+
+def _synthetic_frames(num_frames, width, height, seed=0):
+    """生成带随机变化区域的 BGR 测试帧"""
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    frames = []
+    for i in range(num_frames):
+        frame = base.copy()
+        x = int(rng.integers(0, width // 2))
+        y = int(rng.integers(0, height // 2))
+        frame[y:y + height // 4, x:x + width // 4] = rng.integers(0, 256, dtype=np.uint8)
+        frames.append(frame)
+    return frames
+
+def test_frame_diff_kernel():
+    """测试无分配帧差内核与原实现结果一致"""
+    from nodes.game_video_auto_edit import FrameDiffKernel
+
+    frames = _synthetic_frames(20, 640, 480)
+    kernel = FrameDiffKernel(35)
+    prev_gray = None
+    for frame in frames:
+        expected, prev_gray = _legacy_frame_change_ratio(prev_gray, frame, 35)
+        actual = kernel.push_bgr(frame)
+        if expected is None:
+            assert actual is None
+        else:
+            assert abs(actual - expected) < 1e-12, f"帧差结果不一致: {actual} vs {expected}"
+
+    logger.info("✅ 帧差内核测试通过")
+    return True
+
+def benchmark_diff_kernel(num_frames=300, width=1920, height=1080):
+    """基准：对比原帧差实现与无分配内核的处理帧率（不含解码）"""
+    import time
+    from nodes.game_video_auto_edit import FrameDiffKernel
+
+    frames = _synthetic_frames(num_frames, width, height)
+
+    start = time.perf_counter()
+    prev_gray = None
+    for frame in frames:
+        _, prev_gray = _legacy_frame_change_ratio(prev_gray, frame, 40)
+    legacy_fps = num_frames / (time.perf_counter() - start)
+
+    kernel = FrameDiffKernel(40)
+    start = time.perf_counter()
+    for frame in frames:
+        kernel.push_bgr(frame)
+    kernel_fps = num_frames / (time.perf_counter() - start)
+
+    logger.info(f"帧差计算 {width}x{height}: 原实现 {legacy_fps:.0f} fps, 无分配内核 {kernel_fps:.0f} fps, "
+                f"加速 {kernel_fps / legacy_fps:.2f}x")
+    return legacy_fps, kernel_fps
+
 def test_node_import():
     """测试节点导入"""
     try:
@@ -214,9 +1916,41 @@ if __name__ == "__main__":
     print("🎮 游戏视频自动剪辑节点测试")
     print("=" * 50)
 
+    if "--benchmark" in sys.argv:
+        benchmark_segmentation()
+        benchmark_diff_kernel()
+        sys.exit(0)
+
     # 测试导入
     if test_node_import():
         logger.info("节点导入测试通过，开始功能测试...")
+        test_analysis_backends()
+        test_strided_analysis()
+        test_parallel_chunked_analysis()
+        test_score_cache()
+        test_param_sweep()
+        test_vectorized_segmentation()
+        test_score_buffer()
+        test_frame_diff_kernel()
+        test_online_segmenter()
+        test_streaming_edit()
+        test_keyframe_copy_mode()
+        test_smart_render_mode()
+        test_single_decoder_multi_segment()
+        test_parallel_segment_encoding()
+        test_resource_scheduler()
+        test_two_stage_pipeline()
+        test_spawn_fallback()
+        test_batch_order_planning()
+        test_video_probe_cache()
+        test_keyframe_index()
+        test_edl_export()
+        test_zero_copy_staging()
+        test_input_scan()
+        test_resumable_batch()
+        test_watch_folder()
+        test_tail_edit()
+        test_shared_job_queue()
         test_game_video_edit()
     else:
         logger.error("节点导入测试失败，跳过功能测试")
\ No newline at end of file